@@ -1,3 +1,6 @@
+import logging
+import os
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -30,7 +33,36 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*", async_mode="eventlet")
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        async_mode="eventlet",
+        # With a message queue, emits from any worker/process reach every client
+        message_queue=app.config.get("SOCKETIO_MESSAGE_QUEUE"),
+        channel=app.config.get("SOCKETIO_CHANNEL", "flask-socketio"),
+    )
+
+    # ---------------------------------------
+    # Logging and request profiling (logs/system.log, logs/access.log)
+    # ---------------------------------------
+    configure_system_log(app)
+
+    from app.utils.profiling import init_profiling
+    init_profiling(app)
+
+    # ---------------------------------------
+    # N+1 lazy-load detection (raises under testing, logs under debug)
+    # ---------------------------------------
+    from app.utils.nplusone import init_n_plus_one
+    init_n_plus_one(app)
+
+    # ---------------------------------------
+    # Green database I/O: without this, psycopg2 blocks the eventlet hub
+    # for the duration of every query
+    # ---------------------------------------
+    from app.utils.green_db import enable_green_psycopg2, running_under_eventlet
+    if app.config.get("GREEN_DB", True) and running_under_eventlet():
+        enable_green_psycopg2()
 
     # ---------------------------------------
     # Import Models
@@ -45,23 +77,83 @@ def create_app():
     from app.routes.agent_routes import agent_bp
     from app.routes.supervisor_routes import supervisor_bp
     from app.routes.broadcasts import bp as broadcasts_bp
+    from app.routes.exports import bp as exports_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(agent_bp)
     app.register_blueprint(supervisor_bp)
     app.register_blueprint(broadcasts_bp)
+    app.register_blueprint(exports_bp)
+
+    # ---------------------------------------
+    # Socket.IO handlers (join user/company rooms on connect)
+    # ---------------------------------------
+    from app import sockets  # noqa: F401
+
+    # ---------------------------------------
+    # Background export workers (started with the first request, so CLI
+    # commands like `flask db upgrade` don't spawn them)
+    # ---------------------------------------
+    from app.utils.export_jobs import start_workers
+
+    @app.before_request
+    def start_export_workers():
+        start_workers(app)
+
+    # ---------------------------------------
+    # Write-behind flush of broadcast "seen" rows
+    # ---------------------------------------
+    from app.utils.seen_buffer import start_flusher
+
+    @app.before_request
+    def start_seen_flusher():
+        start_flusher(app)
+
+    # ---------------------------------------
+    # Password hashing pool saturated (see app.utils.passwords)
+    # ---------------------------------------
+    from app.utils.passwords import PasswordHasherBusy
+
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        return "The server is busy. Please try again in a moment.", 503, {"Retry-After": "1"}
+
+    # ---------------------------------------
+    # CLI Commands (flask <command>)
+    # ---------------------------------------
+    from app.cli import register_commands
+    register_commands(app)
 
     # ---------------------------------------
     # Inject Global Variables into Templates
     # ---------------------------------------
     @app.context_processor
     def inject_globals():
-        return dict(app_name="Office Connect")
+        return dict(
+            app_name="Office Connect",
+            # Several workers without sticky sessions: skip long-polling
+            socketio_websocket_only=bool(app.config.get("SOCKETIO_MESSAGE_QUEUE")),
+        )
 
     return app
 
 
+def configure_system_log(app):
+    """Send the app's warnings and errors to SYSTEM_LOG."""
+    path = app.config.get("SYSTEM_LOG")
+    if not path:
+        return
+    path = os.path.abspath(path)
+    if any(getattr(h, "baseFilename", None) == path for h in app.logger.handlers):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setLevel(logging.WARNING)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    app.logger.addHandler(handler)
+
+
 def ensure_default_admin(app):
     """Creates default admin if not exists. Run after migrations."""
     with app.app_context():
@@ -0,0 +1,92 @@
+import click
+from flask.cli import with_appcontext
+
+
+# ---------------------------------------
+# Attendance rollup backfill
+# ---------------------------------------
+@click.command("backfill-attendance-summary")
+@with_appcontext
+def backfill_attendance_summary():
+    """Rebuild attendance_monthly_summary from existing history."""
+    from app.utils.rollups import rebuild_monthly_summaries
+
+    written = rebuild_monthly_summaries()
+    click.echo(f"✅ Attendance summary rebuilt ({written} user-month rows).")
+
+
+# ---------------------------------------
+# Query-plan regression check
+# ---------------------------------------
+@click.command("check-query-plans")
+@with_appcontext
+def check_query_plans_command():
+    """EXPLAIN the report queries; fail if any falls back to a sequential scan."""
+    from app.utils.query_plans import REPORT_QUERIES, check_query_plans
+
+    failures = check_query_plans()
+    for name in REPORT_QUERIES:
+        if name in failures:
+            click.echo(f"❌ {name}")
+            for table, step in failures[name]:
+                click.echo(f"     {table}: {step}")
+        else:
+            click.echo(f"✅ {name}")
+
+    if failures:
+        raise SystemExit(1)
+
+
+# ---------------------------------------
+# Synthetic data for benchmarks
+# ---------------------------------------
+@click.command("seed")
+@click.option("--companies", default=5, show_default=True, type=click.IntRange(min=1))
+@click.option("--users", "users_per_company", default=40, show_default=True, type=click.IntRange(min=3),
+              help="Users per company (one supervisor per shift, the rest agents).")
+@click.option("--days", default=60, show_default=True, type=click.IntRange(min=1),
+              help="Days of attendance per user.")
+@click.option("--seed", default=1, show_default=True, help="Random seed; same seed, same data.")
+@click.option("--end-date", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Last day of generated data (default: today).")
+@with_appcontext
+def seed_command(companies, users_per_company, days, seed, end_date):
+    """Generate companies, users, attendance, penalties, broadcasts ... for benchmarking."""
+    import time
+
+    from app.utils.seed import SEED_PASSWORD, seed_data
+
+    started = time.perf_counter()
+
+    def progress(table, count):
+        click.echo(f"   {table}: {count} rows ({time.perf_counter() - started:.1f}s)")
+
+    counts = seed_data(
+        companies=companies, users_per_company=users_per_company, days=days, seed=seed,
+        end_date=end_date.date() if end_date else None, progress=progress,
+    )
+    click.echo(f"✅ Seeded {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s "
+               f"(users' password: {SEED_PASSWORD}).")
+
+
+# ---------------------------------------
+# Export files housekeeping
+# ---------------------------------------
+@click.command("cleanup-exports")
+@click.option("--hours", type=float, default=None,
+              help="Delete exports older than this (default: EXPORT_RETENTION_HOURS).")
+@with_appcontext
+def cleanup_exports_command(hours):
+    """Delete old export files and their finished/failed jobs."""
+    from app.utils.export_jobs import cleanup_exports
+
+    jobs, files = cleanup_exports(hours)
+    click.echo(f"✅ Removed {jobs} export jobs and {files} files.")
+
+
+def register_commands(app):
+    """Attach the project CLI commands to the app (`flask <command>`)."""
+    app.cli.add_command(backfill_attendance_summary)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(cleanup_exports_command)
@@ -1,5 +1,5 @@
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.passwords import hash_password, verify_password
 from datetime import datetime
 from sqlalchemy.ext.hybrid import hybrid_property
 from app import db
@@ -96,11 +96,12 @@ class User(db.Model, UserMixin):
     # --------------------------------------------------
     # Password Management
     # --------------------------------------------------
+    # Hashing runs on a worker thread under eventlet (app.utils.passwords)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     # --------------------------------------------------
     # Flask-Login Compatibility
@@ -155,6 +156,13 @@ class Attendance(db.Model):
     user = db.relationship('User', foreign_keys=[user_id], backref='attendance_records', lazy=True)
     marker = db.relationship('User', foreign_keys=[marked_by], backref='marked_attendances', lazy=True)
 
+    # One attendance mark per user per day (target of the mark_attendance upsert).
+    # The unique constraint doubles as the (user_id, date) index.
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='uq_attendance_user_date'),
+        db.Index('ix_attendance_date_user', 'date', 'user_id'),
+    )
+
 
 # ==========================================================
 # INCREMENT MODEL
@@ -172,6 +180,10 @@ class Increment(db.Model):
 
     user = db.relationship('User', backref='increments', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_increments_user_date_added', 'user_id', 'date_added'),
+    )
+
     def __repr__(self):
         return f"<Increment User={self.user_id} +{self.increment_amount}>"
 
@@ -200,6 +212,12 @@ class Broadcast(db.Model):
         passive_deletes=True
     )
 
+    # Keyset pages of the inbox (created_at, id) and of a sender's broadcasts
+    __table_args__ = (
+        db.Index('ix_broadcasts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_broadcasts_sender_created_at', 'sender_id', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -239,12 +257,32 @@ class BroadcastSeen(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('broadcast_id', 'user_id', name='uq_broadcast_user_seen'),
+        db.Index('ix_broadcast_seen_broadcast_seen_at', 'broadcast_id', 'seen_at'),
+        db.Index('ix_broadcast_seen_user_broadcast', 'user_id', 'broadcast_id'),
     )
 
     def __repr__(self):
         return f"<BroadcastSeen b={self.broadcast_id} u={self.user_id}>"
 
 
+# ==========================================================
+# BROADCAST UNREAD (per-user unread counter + read watermark)
+# ==========================================================
+class BroadcastUnread(db.Model):
+    __tablename__ = 'broadcast_unread'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    # Highest broadcast id already accounted for in unread_count
+    last_broadcast_id = db.Column(db.Integer, nullable=False, default=0)
+    # "<role>:<company_id>" the count was computed for; a change forces a recount
+    audience_key = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<BroadcastUnread user={self.user_id} unread={self.unread_count}>"
+
+
 # ==========================================================
 # PENALTY MODEL
 # ==========================================================
@@ -258,6 +296,10 @@ class Penalty(db.Model):
     marked_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_penalties_user_created_at', 'user_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f"<Penalty user={self.user_id} amount={self.amount} reason={self.reason}>"
 
@@ -275,5 +317,78 @@ class Clearance(db.Model):
     marked_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_clearances_user_date_added', 'user_id', 'date_added'),
+    )
+
+    def __repr__(self):
+        return f"<Clearance user={self.user_id} amount={self.amount} reason={self.reason}>"
+
+# ==========================================================
+# ATTENDANCE MONTHLY SUMMARY (rollup maintained on every write)
+# ==========================================================
+class AttendanceMonthlySummary(db.Model):
+    __tablename__ = 'attendance_monthly_summary'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+
+    presents = db.Column(db.Integer, nullable=False, default=0)
+    lates = db.Column(db.Integer, nullable=False, default=0)
+    absents = db.Column(db.Integer, nullable=False, default=0)
+    offs = db.Column(db.Integer, nullable=False, default=0)
+
+    bonuses = db.Column(db.Float, nullable=False, default=0.0)
+    penalties = db.Column(db.Float, nullable=False, default=0.0)
+    clearances = db.Column(db.Float, nullable=False, default=0.0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = db.relationship('User', foreign_keys=[user_id], lazy=True)
+
+    @property
+    def total_days(self):
+        return self.presents + self.lates + self.absents + self.offs
+
+    def __repr__(self):
+        return f"<AttendanceMonthlySummary user={self.user_id} {self.year}-{self.month:02d}>"
+
+
+# ==========================================================
+# EXPORT JOB (background Excel/CSV exports)
+# ==========================================================
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # requester
+    kind = db.Column(db.String(40), nullable=False)       # 'attendance_report', 'all_users_csv', ...
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    dedupe_key = db.Column(db.String(255), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued/running/done/failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    filename = db.Column(db.String(255), nullable=True)
+    file_path = db.Column(db.String(512), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)    # set when a worker claims the job
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # refreshed while the worker builds
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User', foreign_keys=[user_id], lazy=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "filename": self.filename,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
     def __repr__(self):
-        return f"<Clearance user={self.user_id} amount={self.amount} reason={self.reason}>"
\ No newline at end of file
+        return f"<ExportJob id={self.id} {self.kind} {self.status}>"
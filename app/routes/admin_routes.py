@@ -1,14 +1,23 @@
+import hmac
 from collections import defaultdict
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, Response, current_app, render_template, redirect, url_for, flash, request, jsonify, stream_with_context
 from datetime import datetime
 from flask_login import login_required, current_user
-from sqlalchemy import extract
+from sqlalchemy import extract, func, tuple_
 from app import db
 from datetime import datetime, date
 import calendar
-from app.models import Penalty, User, Company, Attendance, Increment, db, Clearance, Broadcast
-from werkzeug.security import generate_password_hash
-from sqlalchemy.orm import joinedload
+from app.models import Penalty, User, Company, Attendance, AttendanceMonthlySummary, Increment, db, Clearance, Broadcast
+from sqlalchemy.orm import contains_eager, joinedload, load_only
+from app.utils.exports import (
+    ALL_USERS_HEADER, USER_ATTENDANCE_HEADER, XLSX_MIMETYPE, all_users_rows, attendance_report_filename,
+    attendance_report_rows, iter_csv, user_attendance_rows, write_attendance_report,
+)
+from app.utils.metrics import collect as collect_metrics
+from app.utils.profiling import FIELDS as PROFILE_FIELDS, endpoint_stats, prometheus_text
+from app.utils.rollups import refresh_monthly_summary_for
+from app.utils.user_cache import invalidate_user
+from app.utils.user_lists import SORT_LABELS, user_page
 
 
 
@@ -53,10 +62,31 @@ def manage_users():
         flash("Access denied: Admins only.", "danger")
         return redirect(url_for('auth.login'))
 
-    # eager-load Company to avoid N+1 queries when rendering company.name
-    users = User.query.options(joinedload(User.company)).order_by(User.id.desc()).all()
-    companies = Company.query.order_by(Company.name.asc()).all()
-    return render_template('admin/manage_users.html', users=users, companies=companies)
+    # Only the displayed columns, one keyset page at a time
+    query = User.query.options(
+        load_only(
+            User.first_name, User.last_name, User.username, User.email, User.role, User.shift,
+            User.salary, User.travel_allowance_eligible, User.travel_allowance_amount,
+            User.created_at, User.profile_locked, User.is_active_db,
+        ),
+        joinedload(User.company).load_only(Company.name),
+    )
+    try:
+        users, next_cursor, sort = user_page(query, request.args)
+    except ValueError:
+        flash("Invalid page link.", "warning")
+        return redirect(url_for('admin.manage_users'))
+
+    companies = _company_choices()
+    return render_template(
+        'admin/manage_users.html', users=users, companies=companies,
+        next_cursor=next_cursor, sort=sort, sort_labels=SORT_LABELS,
+    )
+
+
+def _company_choices():
+    """(id, name) of every company, for filter and form dropdowns."""
+    return Company.query.options(load_only(Company.name)).order_by(Company.name.asc()).all()
 
 
 # ============================================================
@@ -160,6 +190,7 @@ def save_user():
 
     db.session.add(user)
     db.session.commit()
+    invalidate_user(user.id)
 
     flash(f"User '{username}' created successfully under company '{company_obj.name}'.", "success")
     return redirect(url_for('admin.manage_users'))
@@ -200,6 +231,7 @@ def toggle_user(user_id):
     # toggle using underlying db column
     user.is_active_db = not user.is_active_db
     db.session.commit()
+    invalidate_user(user.id)
     flash(f"User '{user.username}' status updated.", "success")
     return redirect(url_for('admin.manage_users'))
 
@@ -209,9 +241,10 @@ def reset_password(user_id):
     user = User.query.get_or_404(user_id)
 
     default_password = "Default@1234"
-    user.password_hash = generate_password_hash(default_password)
+    user.set_password(default_password)
 
     db.session.commit()
+    invalidate_user(user.id)
 
     flash(f"Password for {user.first_name} {user.last_name} has been reset to Default@1234.", "success")
     return redirect(url_for('admin.manage_users'))
@@ -300,13 +333,40 @@ def delete_company():
 @login_required
 def salary_management():
     """Show salary management table with company and shift filters."""
-    users = User.query.all()
-    companies = Company.query.order_by(Company.name).all()  # ✅ Fetch all companies
+    query = User.query.options(
+        load_only(
+            User.first_name, User.last_name, User.username, User.role, User.shift,
+            User.salary, User.travel_allowance_amount,
+        ),
+        joinedload(User.company).load_only(Company.name),
+    )
+    try:
+        users, next_cursor, sort = user_page(query, request.args)
+    except ValueError:
+        flash("Invalid page link.", "warning")
+        return redirect(url_for('admin.salary_management'))
+
+    # ✅ Latest increment of each user on this page, not their whole history
+    latest_ids = (
+        db.session.query(func.max(Increment.id))
+        .filter(Increment.user_id.in_([u.id for u in users]))
+        .group_by(Increment.user_id)
+    )
+    latest_increments = {
+        inc.user_id: inc
+        for inc in Increment.query
+        .options(load_only(Increment.user_id, Increment.previous_salary, Increment.new_salary))
+        .filter(Increment.id.in_(latest_ids))
+    } if users else {}
 
     return render_template(
         'admin/salary_management.html',
         users=users,
-        companies=companies  # ✅ Pass to template
+        latest_increments=latest_increments,
+        companies=_company_choices(),
+        next_cursor=next_cursor,
+        sort=sort,
+        sort_labels=SORT_LABELS,
     )
 
 
@@ -422,10 +482,24 @@ def view_users():
         flash("Access denied.", "danger")
         return redirect(url_for('auth.login'))
 
-    users = User.query.options(joinedload(User.company)).order_by(User.id.desc()).all()
+    query = User.query.options(
+        load_only(
+            User.first_name, User.last_name, User.username, User.shift, User.created_at,
+            User.salary, User.travel_allowance_amount, User.is_active_db,
+        ),
+        joinedload(User.company).load_only(Company.name),
+    )
+    try:
+        users, next_cursor, sort = user_page(query, request.args)
+    except ValueError:
+        flash("Invalid page link.", "warning")
+        return redirect(url_for('admin.view_users'))
+
     current_time = datetime.now()
-    companies = Company.query.order_by(Company.name.asc()).all()
-    return render_template('admin/view_users.html', users=users, companies=companies, current_time=current_time)
+    return render_template(
+        'admin/view_users.html', users=users, companies=_company_choices(), current_time=current_time,
+        next_cursor=next_cursor, sort=sort, sort_labels=SORT_LABELS,
+    )
 
 
 
@@ -452,6 +526,7 @@ def view_user_details(user_id):
     # ✅ Fetch all penalties for this user (with latest first)
     penalties = (
         Penalty.query
+        .options(joinedload(Penalty.marker))
         .filter_by(user_id=user_id)
         .order_by(Penalty.created_at.desc())
         .all()
@@ -519,10 +594,6 @@ def view_user_details(user_id):
 # ============================================================
 # 🔹 Download All Users (CSV Export)
 # ============================================================
-import csv
-from io import StringIO
-from flask import Response
-
 @admin_bp.route('/download-all-users')
 @login_required
 def download_all_users():
@@ -530,26 +601,11 @@ def download_all_users():
         flash("Access denied.", "danger")
         return redirect(url_for('auth.login'))
 
-    users = User.query.options(joinedload(User.company)).order_by(User.id).all()
-
-    # Create CSV in memory
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["ID", "Name", "Username", "Email", "Role", "Company", "Shift", "Salary"])
-
-    for user in users:
-        writer.writerow([
-            user.id,
-            f"{user.first_name} {user.last_name}",
-            user.username,
-            user.email,
-            user.role,
-            user.company.name if user.company else "",
-            user.shift or "",
-            user.salary or 0
-        ])
-
-    response = Response(output.getvalue(), mimetype="text/csv")
+    # Stream CSV chunks while rows are read from a server-side cursor
+    response = Response(
+        stream_with_context(iter_csv(ALL_USERS_HEADER, all_users_rows())),
+        mimetype="text/csv"
+    )
     response.headers["Content-Disposition"] = "attachment; filename=all_users.csv"
     return response
 
@@ -565,25 +621,12 @@ def download_user(user_id):
         return redirect(url_for('auth.login'))
 
     user = User.query.get_or_404(user_id)
-    attendance = Attendance.query.filter_by(user_id=user.id).order_by(Attendance.date.desc()).all()
-
-    # Create CSV in memory
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Date", "Status", "Shift", "Late", "Penalty", "Bonus"])
-
-    for record in attendance:
-        writer.writerow([
-            record.date.strftime("%Y-%m-%d") if record.date else "",
-            record.status or "",
-            record.shift or "",
-            "Yes" if record.is_late else "No",
-            record.penalty or 0,
-            record.bonus or 0
-        ])
 
     filename = f"{user.username}_attendance.csv"
-    response = Response(output.getvalue(), mimetype="text/csv")
+    response = Response(
+        stream_with_context(iter_csv(USER_ATTENDANCE_HEADER, user_attendance_rows(user))),
+        mimetype="text/csv"
+    )
     response.headers["Content-Disposition"] = f"attachment; filename={filename}"
     return response
 
@@ -612,10 +655,13 @@ def get_company_users_json(company_id):
 @admin_bp.route('/attendance', methods=['GET'])
 @login_required
 def attendance():
+    """
+    Company → month summaries only. Days and records are fetched from
+    ``attendance_days`` / ``attendance_filter`` when a row is expanded, so the
+    first paint doesn't depend on the number of attendance rows.
+    """
     from calendar import month_name
-    from datetime import date, datetime, timedelta
-    from collections import defaultdict
-    import calendar
+    from datetime import date
 
     # Get filters
     month_filter = request.args.get('month', '')
@@ -624,113 +670,50 @@ def attendance():
     # If no month given, use current month (YYYY-MM)
     if not month_filter:
         month_filter = date.today().strftime("%Y-%m")
-
-    # Convert to actual date range for PostgreSQL
     year, month = map(int, month_filter.split('-'))
-    start_date = date(year, month, 1)
-    _, last_day = calendar.monthrange(year, month)
-    end_date = date(year, month, last_day)
-
-    # Determine visible companies
-    if current_user.role.lower() == "admin":
-        companies = Company.query.order_by(Company.name.asc()).all()
-    else:
-        companies = [current_user.company] if current_user.company else []
-
-    attendance_data = {}
 
-    for company in companies:
-        # ✅ Efficient date range filter (PostgreSQL optimized)
-        query = (
-            Attendance.query
-            .join(User, Attendance.user_id == User.id)
-            .filter(User.company_id == company.id)
-            .filter(Attendance.date >= start_date)
-            .filter(Attendance.date <= end_date)
+    # ✅ Month totals per visible company in one aggregated query over the rollup
+    S = AttendanceMonthlySummary
+    query = (
+        db.session.query(
+            Company,
+            func.sum(S.presents).label("presents"),
+            func.sum(S.lates).label("lates"),
+            func.sum(S.absents).label("absents"),
+            func.sum(S.offs).label("offs"),
+            func.sum(S.bonuses).label("bonuses"),
+            func.sum(S.penalties).label("penalties"),
         )
+        .join(User, User.company_id == Company.id)
+        .join(S, S.user_id == User.id)
+        .filter(S.year == year, S.month == month)
+    )
+    if current_user.role.lower() != "admin":
+        query = query.filter(Company.id == current_user.company_id)
+    if shift_filter:
+        query = query.filter(User.shift.ilike(shift_filter))
+    rows = query.group_by(Company.id).order_by(Company.name.asc()).all()
 
-        if shift_filter:
-            query = query.filter(User.shift.ilike(shift_filter))
-
-        records = query.order_by(Attendance.date.desc(), Attendance.time.desc()).all()
-        if not records:
-            continue
-
-        # --- Grouping ---
-        grouped_by_month = defaultdict(lambda: defaultdict(list))
-        for r in records:
-            month_key = r.date.strftime("%Y-%m")
-            grouped_by_month[month_key][r.date].append(r)
-
-        # --- Build Structure ---
+    attendance_data = {}
+    for company, presents, lates, absents, offs, bonuses, penalties in rows:
+        if not (presents or lates or absents or offs):
+            continue  # no attendance marked this month
         attendance_data[company.id] = {
             "company": company,
-            "months": {}
-        }
-
-        for month_key, date_records in grouped_by_month.items():
-            month_label = f"{month_name[int(month_key.split('-')[1])]} {month_key.split('-')[0]}"
-
-            month_summary = {
-                "label": month_label,
-                "dates": [],
-                "summary": {
-                    "presents": 0,
-                    "lates": 0,
-                    "absents": 0,
-                    "offs": 0,
-                    "bonuses": 0.0,
-                    "penalties": 0.0,
+            "months": {
+                month_filter: {
+                    "label": f"{month_name[month]} {year}",
+                    "summary": {
+                        "presents": int(presents or 0),
+                        "lates": int(lates or 0),
+                        "absents": int(absents or 0),
+                        "offs": int(offs or 0),
+                        "bonuses": float(bonuses or 0),
+                        "penalties": float(penalties or 0),
+                    },
                 },
-            }
-
-            for dt, records_for_date in sorted(date_records.items(), reverse=True):
-                day_summary = {
-                    "date": dt,
-                    "records": [],
-                    "presents": 0,
-                    "lates": 0,
-                    "absents": 0,
-                    "offs": 0,
-                    "bonuses": 0.0,
-                    "penalties": 0.0,
-                }
-
-                for r in records_for_date:
-                    record_info = {
-                        "user": r.user,
-                        "status": r.status,
-                        "is_late": r.is_late,
-                        "time": r.time.strftime("%H:%M"),
-                        "bonus": r.bonus,
-                        "penalty": r.penalty,
-                        "marked_by": r.marker.user_full_name() if r.marker else "—",
-                        "shift": r.user.shift or "-",
-                    }
-                    day_summary["records"].append(record_info)
-
-                    # Tally per day
-                    if r.status == "Present":
-                        day_summary["presents"] += 1
-                    elif r.status == "Late":
-                        day_summary["lates"] += 1
-                    elif r.status == "Absent":
-                        day_summary["absents"] += 1
-                    elif r.status == "Off":
-                        day_summary["offs"] += 1
-                    day_summary["bonuses"] += r.bonus or 0
-                    day_summary["penalties"] += r.penalty or 0
-
-                # Add to month summary
-                month_summary["dates"].append(day_summary)
-                month_summary["summary"]["presents"] += day_summary["presents"]
-                month_summary["summary"]["lates"] += day_summary["lates"]
-                month_summary["summary"]["absents"] += day_summary["absents"]
-                month_summary["summary"]["offs"] += day_summary["offs"]
-                month_summary["summary"]["bonuses"] += day_summary["bonuses"]
-                month_summary["summary"]["penalties"] += day_summary["penalties"]
-
-            attendance_data[company.id]["months"][month_key] = month_summary
+            },
+        }
 
     # Fetch recent clearances (optional)
     clearances = Clearance.query.order_by(Clearance.date_added.desc()).limit(10).all()
@@ -748,6 +731,67 @@ def attendance():
         clearances=clearances,
     )
 
+
+def _attendance_scope(company_id):
+    """Company the current user may drill into (non-admins: only their own)."""
+    if (current_user.role or "").lower() != "admin":
+        return current_user.company_id
+    return company_id
+
+
+def _month_range(month):
+    """(first, last) dates of a YYYY-MM string, or None if it doesn't parse."""
+    from app.utils.payroll import month_bounds
+    try:
+        year, month_num = map(int, month.split('-'))
+        return month_bounds(year, month_num)
+    except (AttributeError, ValueError):
+        return None
+
+
+# -------------------------------
+# ATTENDANCE DRILL-DOWN: days of a company-month (JSON)
+# -------------------------------
+@admin_bp.route('/attendance/days')
+@login_required
+def attendance_days():
+    company_id = _attendance_scope(request.args.get('company_id', type=int))
+    bounds = _month_range(request.args.get('month'))
+    shift = request.args.get('shift', '').lower().strip()
+    if company_id is None or bounds is None:
+        return jsonify({"error": "company_id and month (YYYY-MM) are required"}), 400
+
+    # ✅ One grouped query: status counts per day
+    query = (
+        db.session.query(
+            Attendance.date,
+            func.count().filter(Attendance.status == 'Present').label("presents"),
+            func.count().filter(Attendance.status == 'Late').label("lates"),
+            func.count().filter(Attendance.status == 'Absent').label("absents"),
+            func.count().filter(Attendance.status == 'Off').label("offs"),
+        )
+        .join(User, Attendance.user_id == User.id)
+        .filter(User.company_id == company_id)
+        .filter(Attendance.date >= bounds[0], Attendance.date <= bounds[1])
+    )
+    if shift:
+        query = query.filter(User.shift.ilike(shift))
+    rows = query.group_by(Attendance.date).order_by(Attendance.date.desc()).all()
+
+    return jsonify({
+        "days": [
+            {
+                "date": day.isoformat(),
+                "label": day.strftime("%b %d, %Y"),
+                "presents": presents,
+                "lates": lates,
+                "absents": absents,
+                "offs": offs,
+            }
+            for day, presents, lates, absents, offs in rows
+        ]
+    })
+
 # ==========================================================
 # 📤 DOWNLOAD ATTENDANCE REPORT (EXCEL) - company + month
 # ==========================================================
@@ -760,14 +804,8 @@ def download_attendance_report(company_id, month):
     Sr#, Full Name, Role, Shift, <date cols for month>, Presents, Lates, Absents, Offs,
     Totals, Base Salary, Salary(from days), Bonus, Penalty, Clearance, Calculated Salary
     """
-    from io import BytesIO
-    from datetime import date
-    from calendar import monthrange
-    from collections import defaultdict
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, PatternFill
+    import tempfile
     from flask import send_file, flash, redirect, url_for
-    from sqlalchemy import extract
 
     # permission checks
     role = (current_user.role or "").lower()
@@ -789,231 +827,121 @@ def download_attendance_report(company_id, month):
         flash("Invalid month format. Use YYYY-MM.", "danger")
         return redirect(url_for('admin.attendance'))
 
-    # Build list of all dates in the month
-    num_days = monthrange(year, month_num)[1]
-    date_list = [date(year, month_num, d) for d in range(1, num_days + 1)]
+    # Write-only workbook into a temp file (deleted once the response closes it)
+    header, rows = attendance_report_rows(company, year, month_num)
+    output = tempfile.TemporaryFile()
+    write_attendance_report(output, f"{company.name[:25]}_{month}", header, rows)
+    output.seek(0)
 
-    # Fetch users in company (agents + supervisors)
-    users = (
-        User.query
-        .filter(User.company_id == company.id)
-        .filter(User.role.in_(["agent", "supervisor"]))
-        .all()
+    return send_file(
+        output,
+        as_attachment=True,
+        download_name=attendance_report_filename(company, month),
+        mimetype=XLSX_MIMETYPE
     )
 
-    user_ids = [u.id for u in users] or [0]
-
-    # Attendance, penalties, clearances
-    attendances = (
-        Attendance.query
-        .filter(Attendance.user_id.in_(user_ids))
-        .filter(extract('year', Attendance.date) == year)
-        .filter(extract('month', Attendance.date) == month_num)
-        .all()
-    )
 
-    penalties = (
-        Penalty.query
-        .filter(Penalty.user_id.in_(user_ids))
-        .filter(extract('year', Penalty.created_at) == year)
-        .filter(extract('month', Penalty.created_at) == month_num)
-        .all()
-    )
 
-    clearances = (
-        Clearance.query
-        .filter(Clearance.user_id.in_(user_ids))
-        .filter(extract('year', Clearance.date_added) == year)
-        .filter(extract('month', Clearance.date_added) == month_num)
-        .all()
-    )
+# -------------------------------
+# AJAX FILTER ENDPOINTS (keyset pages)
+#   ?company_id=&date=YYYY-MM-DD | month=YYYY-MM&shift=&cursor=<next_cursor>
+# -------------------------------
+ATTENDANCE_PAGE_SIZE = 100
 
-    # Index data
-    att_by_user_date = defaultdict(list)
-    for a in attendances:
-        att_by_user_date[(a.user_id, a.date)].append(a)
 
-    penalty_by_user = defaultdict(list)
-    for p in penalties:
-        penalty_by_user[p.user_id].append(p)
-
-    clearance_by_user = defaultdict(list)
-    for c in clearances:
-        clearance_by_user[c.user_id].append(c)
-
-    # Group users by shift
-    users_by_shift = defaultdict(list)
-    for u in users:
-        users_by_shift[u.shift or "Unassigned"].append(u)
-
-    # Sort: supervisors first, then agents, with separator rows
-    ordered_users = []
-    for shift_name in sorted(users_by_shift.keys()):
-        shift_users = users_by_shift[shift_name]
-        supervisors = sorted([x for x in shift_users if x.role == "supervisor"], key=lambda y: (y.first_name or "", y.last_name or ""))
-        agents = sorted([x for x in shift_users if x.role == "agent"], key=lambda y: (y.first_name or "", y.last_name or ""))
-        ordered_users.extend([(shift_name, s) for s in supervisors])
-        ordered_users.extend([(shift_name, a) for a in agents])
-        ordered_users.append((shift_name, None))  # shift separator
-
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"{company.name[:25]}_{month}"
-
-    # Header row
-    header = ["Sr No", "Full Name", "Role", "Shift"]
-    header += [dt.strftime("%d") for dt in date_list]
-    header += [
-        "Presents", "Lates", "Absents", "Offs", "Totals",
-        "Base Salary", "Salary(from days)",
-        "Bonus", "Penalty", "Clearance", "Calculated Salary"
-    ]
-    ws.append(header)
-
-    # Styling header
-    bold_font = Font(bold=True)
-    center_align = Alignment(horizontal="center", vertical="center")
-    for cell in ws[1]:
-        cell.font = bold_font
-        cell.alignment = center_align
-
-    black_fill = PatternFill(start_color="000000", end_color="000000", fill_type="solid")
-
-    sr = 1
-    for shift_name, user in ordered_users:
-        if user is None:
-            # Separator row
-            sep_idx = ws.max_row + 1
-            ws.append([""] * len(header))
-            for c in range(1, len(header) + 1):
-                ws.cell(row=sep_idx, column=c).fill = black_fill
-            continue
-
-        row = [sr, user.full_name, user.role.capitalize(), shift_name]
-        presents = lates = absents = offs = 0
-        total_bonus = total_penalty = 0.0
-
-        # Date cells
-        for dt in date_list:
-            marks = att_by_user_date.get((user.id, dt), [])
-            if not marks:
-                row.append("")
-                continue
-
-            statuses = [m.status for m in marks]
-            if "Present" in statuses:
-                row.append("P")
-                presents += 1
-            elif "Late" in statuses:
-                row.append("L")
-                lates += 1
-            elif "Off" in statuses:
-                row.append("Off")
-                offs += 1
-            elif "Absent" in statuses:
-                row.append("A")
-                absents += 1
-            else:
-                row.append(statuses[0])
-
-            for m in marks:
-                total_bonus += (m.bonus or 0)
-                total_penalty += (m.penalty or 0)
-
-        totals = presents + lates + absents + offs
-        base_salary = user.salary or 0
-        per_day_salary = base_salary / num_days
-
-        # Updated salary logic
-        salary_from_days = (
-            (presents * per_day_salary)
-            + (lates * (per_day_salary - 400))
-            + (offs * per_day_salary)
-        )
+def encode_attendance_cursor(record):
+    return f"{record.date.isoformat()}_{record.id}"
 
-        # Monthly penalties/clearances
-        penalty_extra = sum(p.amount for p in penalty_by_user.get(user.id, []))
-        clearance_extra = sum(c.amount for c in clearance_by_user.get(user.id, []))
 
-        total_penalty_combined = total_penalty + penalty_extra
-        total_bonus_combined = total_bonus
-        total_clearance_combined = clearance_extra
+def decode_attendance_cursor(cursor):
+    day, record_id = cursor.rsplit("_", 1)
+    return date.fromisoformat(day), int(record_id)
 
-        calculated_salary = (
-            salary_from_days
-            + total_bonus_combined
-            - total_penalty_combined
-            + total_clearance_combined
-        )
 
-        row += [
-            presents, lates, absents, offs, totals,
-            round(base_salary, 2),
-            round(salary_from_days, 2),
-            round(total_bonus_combined, 2),
-            round(total_penalty_combined, 2),
-            round(total_clearance_combined, 2),
-            round(calculated_salary, 2),
-        ]
+def attendance_page(args):
+    """
+    One page of a company's attendance, newest first, continuing after
+    ``cursor`` (date, id of the last row seen). Returns (records, next_cursor);
+    raises ValueError with a message on bad parameters.
+    """
+    company_id = _attendance_scope(args.get('company_id', type=int))
+    day, month, shift = args.get('date'), args.get('month'), args.get('shift')
 
-        ws.append(row)
-        sr += 1
-
-    # Freeze header row + first 4 columns
-    ws.freeze_panes = "E2"
-
-    # Autofit columns
-    for col in ws.columns:
-        max_len = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            val = str(cell.value) if cell.value else ""
-            if len(val) > max_len:
-                max_len = len(val)
-        ws.column_dimensions[col_letter].width = max_len + 2
-
-    # Output
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    records = (
+        Attendance.query
+        .join(User, Attendance.user_id == User.id)
+        .options(contains_eager(Attendance.user), joinedload(Attendance.marker))
+        .filter(User.company_id == company_id)
+    )
 
-    safe_name = company.name.replace(" ", "_")
-    filename = f"{safe_name}_Attendance_{month}.xlsx"
+    if day:
+        try:
+            records = records.filter(Attendance.date == date.fromisoformat(day))
+        except ValueError:
+            raise ValueError("Invalid date. Use YYYY-MM-DD.")
+    if month:
+        bounds = _month_range(month)
+        if bounds is None:
+            raise ValueError("Invalid month. Use YYYY-MM.")
+        # Range on the date column itself, so ix_attendance_date_user applies
+        records = records.filter(Attendance.date >= bounds[0], Attendance.date <= bounds[1])
+    if shift:
+        records = records.filter(User.shift.ilike(shift))
 
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            records = records.filter(tuple_(Attendance.date, Attendance.id) < tuple_(*decode_attendance_cursor(cursor)))
+        except ValueError:
+            raise ValueError("Invalid cursor.")
 
+    limit = min(max(args.get('limit', ATTENDANCE_PAGE_SIZE, type=int), 1), 500)
+    items = records.order_by(Attendance.date.desc(), Attendance.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_attendance_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
 
 
-# -------------------------------
-# AJAX FILTER ENDPOINT
-# -------------------------------
 @admin_bp.route('/attendance/filter')
 @login_required
 def attendance_filter():
-    company_id = request.args.get('company_id', type=int)
-    month = request.args.get('month')
-    shift = request.args.get('shift')
+    """One page of attendance rows as a table partial (with a "Load more" link)."""
+    try:
+        records, next_cursor = attendance_page(request.args)
+    except ValueError as exc:
+        return str(exc), 400
 
-    records = (
-        Attendance.query
-        .join(User)
-        .filter(User.company_id == company_id)
-    )
+    next_url = None
+    if next_cursor:
+        next_url = url_for('admin.attendance_filter', **{**request.args.to_dict(), 'cursor': next_cursor})
 
-    if month:
-        records = records.filter(Attendance.date.like(f"{month}-%"))
-    if shift:
-        records = records.filter(User.shift == shift)
+    return render_template('admin/partials/attendance_table.html', records=records, next_url=next_url)
 
-    records = records.order_by(Attendance.date.desc()).all()
 
-    return render_template('admin/partials/attendance_table.html', records=records)
+@admin_bp.route('/attendance/records')
+@login_required
+def attendance_records():
+    """JSON variant of attendance_filter: {"items": [...], "next_cursor": ...}."""
+    try:
+        records, next_cursor = attendance_page(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    items = [
+        {
+            "id": r.id,
+            "user_id": r.user_id,
+            "user_name": r.user.user_full_name(),
+            "shift": r.user.shift,
+            "date": r.date.isoformat(),
+            "time": r.time.strftime("%H:%M"),
+            "status": r.status,
+            "bonus": r.bonus or 0,
+            "penalty": r.penalty or 0,
+            "marked_by": r.marker.user_full_name() if r.marker else None,
+        }
+        for r in records
+    ]
+    return jsonify({"items": items, "next_cursor": next_cursor})
 
 
 @admin_bp.route('/unlock_profile/<int:user_id>', methods=['POST'])
@@ -1028,6 +956,7 @@ def unlock_profile(user_id):
     # Toggle lock/unlock
     user.profile_locked = not user.profile_locked
     db.session.commit()
+    invalidate_user(user.id)
 
     status = "unlocked" if not user.profile_locked else "locked"
     flash(f"Profile for {user.username} has been {status} successfully!", "success")
@@ -1057,11 +986,11 @@ def add_penalty():
     search_name = request.args.get("search_name")
     search_username = request.args.get("search_username")
     if search_name:
-        query = query.filter(User.full_name.ilike(f"%{search_name}%"))
+        query = query.filter((User.first_name + " " + User.last_name).ilike(f"%{search_name}%"))
     if search_username:
         query = query.filter(User.username.ilike(f"%{search_username}%"))
 
-    users = query.order_by(User.full_name.asc()).all()
+    users = query.order_by(User.first_name.asc(), User.last_name.asc()).all()
 
     if request.method == "POST":
         user_id = request.form.get("user_id")
@@ -1076,9 +1005,11 @@ def add_penalty():
             user_id=int(user_id),
             amount=float(amount),
             reason=reason,
-            added_by_id=current_user.id
+            marked_by=current_user.id
         )
         db.session.add(penalty)
+        db.session.flush()
+        refresh_monthly_summary_for(penalty.user_id, penalty.created_at)
         db.session.commit()
         flash("Penalty added successfully.", "success")
         return redirect(request.url)
@@ -1088,3 +1019,48 @@ def add_penalty():
         users=users,
         current_user=current_user
     )
+
+
+# ==========================================================
+# 🔹 Process metrics: per-endpoint request profile + counters
+# ==========================================================
+@admin_bp.route('/metrics')
+@login_required
+def metrics():
+    if getattr(current_user, "role", None) != "admin":
+        flash("Access denied: Admins only.", "danger")
+        return redirect(url_for('auth.login'))
+
+    stats = endpoint_stats()
+    sort = request.args.get("sort", "wall_ms")
+    if sort not in PROFILE_FIELDS:
+        sort = "wall_ms"
+    rows = sorted(stats.items(), key=lambda item: item[1][sort]["p95"], reverse=True)
+
+    return render_template(
+        "admin/metrics.html",
+        endpoints=rows,
+        sort=sort,
+        counters=collect_metrics(),
+        window=current_app.config.get("PROFILE_WINDOW", 500),
+    )
+
+
+@admin_bp.route('/metrics.json')
+@login_required
+def metrics_json():
+    if getattr(current_user, "role", None) != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify(dict(collect_metrics(), endpoints=endpoint_stats()))
+
+
+# Prometheus scrape target: admin session or "Authorization: Bearer <METRICS_TOKEN>"
+@admin_bp.route('/metrics/prometheus')
+def metrics_prometheus():
+    token = current_app.config.get("METRICS_TOKEN")
+    authorized = bool(token) and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not authorized and getattr(current_user, "role", None) != "admin":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+
+    return Response(prometheus_text(collect_metrics()), mimetype="text/plain; version=0.0.4")
@@ -3,6 +3,8 @@ from flask_login import login_user, logout_user, login_required, current_user
 from app.forms import LoginForm
 from app.models import User
 from app import db, login_manager
+from app.utils.passwords import PasswordHasherBusy
+from app.utils.user_cache import load_principal
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -31,7 +33,12 @@ def login():
         user = User.query.filter_by(username=username).first()
 
         # Invalid credentials
-        if not user or not user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordHasherBusy:
+            flash("⚠️ The server is busy. Please try again in a moment.", "warning")
+            return redirect(url_for('auth.login'))
+        if not valid:
             flash("❌ Invalid username or password", "danger")
             return redirect(url_for('auth.login'))
 
@@ -75,5 +82,5 @@ def logout():
 # --------------------------------------
 @login_manager.user_loader
 def load_user(user_id):
-    """Reload user from session using database."""
-    return User.query.get(int(user_id))
+    """Reload the session user as a slim, cached principal (see app.utils.user_cache)."""
+    return load_principal(user_id)
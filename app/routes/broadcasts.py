@@ -2,8 +2,12 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app import db, socketio
 from app.models import Broadcast, BroadcastSeen, User, Company
+from app.sockets import ALL_USERS_ROOM, broadcast_rooms
+from app.utils.inbox import audience_filter, note_deleted, unread_count
+from app.utils.seen_buffer import pending_seen, record_seen
 from datetime import datetime, timezone
-from sqlalchemy import or_
+from sqlalchemy import extract, func, tuple_
+from sqlalchemy.orm import joinedload
 from collections import defaultdict
 from flask_socketio import emit
 import pytz
@@ -47,32 +51,70 @@ def create_broadcast():
 
     payload = b.to_dict()
 
-    # ✅ Determine recipients
-    if target == "all":
-        recipients_query = User.query
-    elif target == "company" and company_id:
-        recipients_query = User.query.filter(User.company_id == int(company_id))
-    elif target == "supervisors":
-        recipients_query = User.query.filter(User.role == "supervisor")
-    elif target == "supervisors_company" and company_id:
-        recipients_query = User.query.filter(
-            User.role == "supervisor",
-            User.company_id == int(company_id)
-        )
-    else:
-        recipients_query = User.query
-
-    recipient_ids = [r.id for r in recipients_query.with_entities(User.id).all()]
-
-    # ✅ Emit to each recipient via Socket.IO
-    for uid in recipient_ids:
-        socketio.emit("new_broadcast", payload, room=f"user_{uid}")
+    # ✅ One emit to the target's room (clients join rooms on connect)
+    socketio.emit("new_broadcast", payload, to=broadcast_rooms(target, company_id))
 
     socketio.emit("admin_broadcast_update", payload)
     flash("Broadcast sent successfully!", "success")
 
     return redirect(url_for("broadcasts.view_broadcasts"))
 
+# ==========================================================
+# 🔹 Helpers: keyset pages (audience rules: app.utils.inbox)
+# ==========================================================
+INBOX_PAGE_SIZE = 20
+
+
+def encode_cursor(broadcast):
+    return f"{broadcast.created_at.isoformat()}_{broadcast.id}"
+
+
+def decode_cursor(cursor):
+    created_at, broadcast_id = cursor.rsplit("_", 1)
+    return datetime.fromisoformat(created_at), int(broadcast_id)
+
+
+def month_filter(month):
+    """Condition for broadcasts created in ``month`` ("YYYY-MM")."""
+    year, month_num = (int(part) for part in month.split("-"))
+    start = datetime(year, month_num, 1)
+    end = datetime(year + month_num // 12, month_num % 12 + 1, 1)
+    return (Broadcast.created_at >= start) & (Broadcast.created_at < end)
+
+
+def keyset_page(query, cursor=None, limit=INBOX_PAGE_SIZE):
+    """
+    One page of ``query`` newest first, continuing after ``cursor``
+    (created_at, id of the last item seen). Returns (items, next_cursor).
+    """
+    query = query.order_by(Broadcast.created_at.desc(), Broadcast.id.desc())
+    if cursor:
+        query = query.filter(tuple_(Broadcast.created_at, Broadcast.id) < tuple_(*decode_cursor(cursor)))
+    items = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def broadcast_months(query):
+    """[("YYYY-MM", count), ...] newest first, for the archive month list."""
+    year = extract("year", Broadcast.created_at)
+    month = extract("month", Broadcast.created_at)
+    rows = (
+        query.with_entities(year, month, func.count(Broadcast.id))
+        .group_by(year, month)
+        .order_by(year.desc(), month.desc())
+        .all()
+    )
+    return [(f"{int(y):04d}-{int(m):02d}", count) for y, m, count in rows]
+
+
+def inbox_query(user, box="inbox"):
+    """Broadcasts received by ``user`` (inbox) or sent by them (sent)."""
+    if box == "sent":
+        return Broadcast.query.filter(Broadcast.sender_id == user.id)
+    return Broadcast.query.filter(audience_filter(user))
+
+
 # ==========================================================
 # 🔹 API: Fetch unread broadcasts
 # ==========================================================
@@ -81,41 +123,127 @@ def create_broadcast():
 def unread_broadcasts():
     seen_ids = db.session.query(BroadcastSeen.broadcast_id).filter(BroadcastSeen.user_id == current_user.id)
 
-    q = Broadcast.query.filter(~Broadcast.id.in_(seen_ids)).order_by(Broadcast.created_at.desc())
-
-    q = q.filter(
-        or_(
-            Broadcast.target == "all",
-            (Broadcast.target == "supervisors") & (current_user.role == "supervisor"),
-            (Broadcast.target == "company") & (Broadcast.company_id == current_user.company_id),
-            (Broadcast.target == "supervisors_company")
-            & (current_user.role == "supervisor")
-            & (Broadcast.company_id == current_user.company_id)
-        )
+    q = (
+        Broadcast.query
+        .options(joinedload(Broadcast.sender), joinedload(Broadcast.company))
+        .filter(~Broadcast.id.in_(seen_ids))
+        .order_by(Broadcast.created_at.desc())
     )
+    q = q.filter(audience_filter(current_user))
+    # Marked seen in this process but not flushed yet
+    pending = pending_seen(current_user.id)
+    if pending:
+        q = q.filter(~Broadcast.id.in_(pending))
 
     items = [b.to_dict() for b in q.all()]
     return jsonify(items)
 
 
 # ==========================================================
-# 🔹 API: Mark broadcast as seen
+# 🔹 API: Unread count (counter table, no anti-join)
 # ==========================================================
+@bp.route("/unread/count", methods=["GET"])
+@login_required
+def unread_broadcast_count():
+    count = unread_count(current_user, pending_seen(current_user.id))
+    db.session.commit()
+    return jsonify({"unread": count})
+
+
+# ==========================================================
+# 🔹 API: Inbox / sent broadcasts, one keyset page at a time
+#    ?cursor=<from next_cursor>&month=YYYY-MM&box=inbox|sent
+# ==========================================================
+@bp.route("/inbox", methods=["GET"])
+@login_required
+def inbox():
+    box = request.args.get("box", "inbox")
+    query = inbox_query(current_user, box).options(
+        joinedload(Broadcast.sender), joinedload(Broadcast.company)
+    )
+
+    month = request.args.get("month")
+    if month:
+        try:
+            query = query.filter(month_filter(month))
+        except ValueError:
+            return jsonify({"error": "Invalid month format. Use YYYY-MM."}), 400
+
+    try:
+        limit = min(max(request.args.get("limit", INBOX_PAGE_SIZE, type=int), 1), 100)
+        items, next_cursor = keyset_page(query, request.args.get("cursor"), limit)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor."}), 400
+
+    ids = [b.id for b in items]
+    seen_at = dict(
+        db.session.query(BroadcastSeen.broadcast_id, BroadcastSeen.seen_at)
+        .filter(BroadcastSeen.user_id == current_user.id, BroadcastSeen.broadcast_id.in_(ids))
+        .all()
+    ) if ids else {}
+    for b_id, when in pending_seen(current_user.id).items():
+        seen_at.setdefault(b_id, when)
+    view_counts = get_broadcast_view_counts(ids) if box == "sent" else {}
+
+    now = datetime.utcnow()
+    data = []
+    for b in items:
+        item = b.to_dict()
+        item["seen_at"] = seen_at[b.id].isoformat() if b.id in seen_at else None
+        if box == "sent":
+            item["view_count"] = view_counts.get(b.id, 0)
+            item["deletable"] = (now - b.created_at).total_seconds() <= 600
+        data.append(item)
+
+    return jsonify({"items": data, "next_cursor": next_cursor})
+
+
+# ==========================================================
+# 🔹 API: Archive months with broadcast counts
+# ==========================================================
+@bp.route("/inbox/months", methods=["GET"])
+@login_required
+def inbox_months():
+    query = inbox_query(current_user, request.args.get("box", "inbox"))
+    return jsonify([{"month": m, "count": c} for m, c in broadcast_months(query)])
+
+
+# ==========================================================
+# 🔹 API: Mark broadcast(s) as seen (buffered, written in batches)
+# ==========================================================
+MARK_SEEN_MAX_IDS = 500
+
+
 @bp.route("/mark_seen", methods=["POST"])
 @login_required
 def mark_seen():
-    b_id = request.json.get("broadcast_id")
-    if not b_id:
+    b_id = (request.get_json(silent=True) or {}).get("broadcast_id")
+    try:
+        b_id = int(b_id)
+    except (TypeError, ValueError):
         return jsonify({"error": "broadcast_id required"}), 400
 
-    exists = BroadcastSeen.query.filter_by(broadcast_id=b_id, user_id=current_user.id).first()
-    if not exists:
-        db.session.add(BroadcastSeen(broadcast_id=b_id, user_id=current_user.id))
-        db.session.commit()
-
+    record_seen(current_user.id, [b_id])
     return jsonify({"ok": True})
 
 
+@bp.route("/mark_seen/bulk", methods=["POST"])
+@login_required
+def mark_seen_bulk():
+    ids = (request.get_json(silent=True) or {}).get("broadcast_ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "broadcast_ids must be a non-empty list"}), 400
+    if len(ids) > MARK_SEEN_MAX_IDS:
+        return jsonify({"error": f"At most {MARK_SEEN_MAX_IDS} broadcast_ids per request"}), 400
+    try:
+        ids = {int(b_id) for b_id in ids}
+    except (TypeError, ValueError):
+        return jsonify({"error": "broadcast_ids must be integers"}), 400
+
+    record_seen(current_user.id, ids)
+    return jsonify({"ok": True, "count": len(ids)})
+
+
 # ==========================================================
 # 🔹 ADMIN: View Broadcasts Page
 # ==========================================================
@@ -130,12 +258,17 @@ def view_broadcasts():
     if request.method == "POST":
         message = request.form.get("message")
         if message:
-            socketio.emit("new_broadcast", {"message": message}, broadcast=True)
+            socketio.emit("new_broadcast", {"message": message}, to=ALL_USERS_ROOM)
             flash("Broadcast sent to all connected users!", "success")
         return redirect(url_for("broadcasts.view_broadcasts"))
 
     # ✅ Get all broadcasts
-    broadcasts = Broadcast.query.order_by(Broadcast.created_at.desc()).all()
+    broadcasts = (
+        Broadcast.query
+        .options(joinedload(Broadcast.sender), joinedload(Broadcast.company))
+        .order_by(Broadcast.created_at.desc())
+        .all()
+    )
 
     # ✅ Group by Month > Date
     grouped = defaultdict(lambda: defaultdict(list))
@@ -153,11 +286,8 @@ def view_broadcasts():
             "created_at_display": b.created_at.strftime("%H:%M")
         })
 
-    # ✅ Flatten list for view lookup
-    all_broadcasts_flat = [b for month in grouped.values() for date in month.values() for b in date]
-    broadcast_ids = [b["id"] for b in all_broadcasts_flat]
-    db_broadcasts = Broadcast.query.filter(Broadcast.id.in_(broadcast_ids)).all()
-    view_summary = get_broadcast_view_data(db_broadcasts)
+    # ✅ Seen counts; viewer details are fetched when a broadcast is expanded
+    view_counts = get_broadcast_view_counts(b.id for b in broadcasts)
 
     companies = Company.query.order_by(Company.name.asc()).all()
 
@@ -166,7 +296,7 @@ def view_broadcasts():
         broadcasts=grouped,
         companies=companies,
         current_time=datetime.utcnow(),
-        view_summary=view_summary
+        view_counts=view_counts
     )
 
 
@@ -190,6 +320,7 @@ def delete_broadcast(id):
 
     if time_diff <= 600:  # 600 seconds = 10 minutes
         # ✅ Delete broadcast; all BroadcastSeen entries will be removed automatically via cascade
+        note_deleted(broadcast)
         db.session.delete(broadcast)
         db.session.commit()
 
@@ -202,41 +333,54 @@ def delete_broadcast(id):
 
     return redirect(url_for("broadcasts.view_broadcasts"))
 # ==========================================================
-# 🔹 Helper: View details per broadcast
+# 🔹 Helper: View counts per broadcast (one grouped query)
 # ==========================================================
-def get_broadcast_view_data(broadcasts):
-    view_summary = {}
+def get_broadcast_view_counts(broadcast_ids):
+    broadcast_ids = list(broadcast_ids)
+    if not broadcast_ids:
+        return {}
+    return dict(
+        db.session.query(BroadcastSeen.broadcast_id, func.count(BroadcastSeen.id))
+        .filter(BroadcastSeen.broadcast_id.in_(broadcast_ids))
+        .group_by(BroadcastSeen.broadcast_id)
+        .all()
+    )
 
-    for b in broadcasts:
-        views = (
-            BroadcastSeen.query
-            .filter_by(broadcast_id=b.id)
-            .join(User, BroadcastSeen.user_id == User.id)
-            .join(Company, isouter=True)
-            .with_entities(
-                User.first_name,
-                User.last_name,
-                User.username,
-                User.role,
-                Company.name.label("company_name"),
-                BroadcastSeen.seen_at.label("seen_at")
-            )
-            .order_by(BroadcastSeen.seen_at.desc())
-            .all()
+
+# ==========================================================
+# 🔹 API: Viewer details of one broadcast (loaded when expanded)
+# ==========================================================
+@bp.route("/<int:id>/viewers", methods=["GET"])
+@login_required
+def broadcast_viewers(id):
+    broadcast = Broadcast.query.get_or_404(id)
+    if current_user.role != "admin" and broadcast.sender_id != current_user.id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    views = (
+        BroadcastSeen.query
+        .filter_by(broadcast_id=broadcast.id)
+        .join(User, BroadcastSeen.user_id == User.id)
+        .join(Company, isouter=True)
+        .with_entities(
+            User.first_name,
+            User.last_name,
+            User.username,
+            User.role,
+            Company.name.label("company_name"),
+            BroadcastSeen.seen_at.label("seen_at")
         )
+        .order_by(BroadcastSeen.seen_at.desc())
+        .all()
+    )
 
-        view_summary[b.id] = {
-            "count": len(views),
-            "details": [
-                {
-                    "full_name": f"{v.first_name or ''} {v.last_name or ''}".strip(),
-                    "username": v.username,
-                    "role": v.role,
-                    "company": v.company_name or "—",
-                    "seen_at": v.seen_at.strftime("%d %b %Y, %H:%M")
-                }
-                for v in views
-            ]
+    return jsonify([
+        {
+            "full_name": f"{v.first_name or ''} {v.last_name or ''}".strip(),
+            "username": v.username,
+            "role": v.role,
+            "company": v.company_name or "—",
+            "seen_at": v.seen_at.strftime("%d %b %Y, %H:%M")
         }
-
-    return view_summary
+        for v in views
+    ])
@@ -0,0 +1,94 @@
+from flask import Blueprint, jsonify, request, send_file, url_for
+from flask_login import login_required, current_user
+from app.models import Company, ExportJob, User
+from app.utils.export_jobs import DONE, job_status, submit_export
+
+bp = Blueprint("exports", __name__, url_prefix="/exports")
+
+
+def _job_payload(job):
+    data = job_status(job)
+    data["status_url"] = url_for("exports.export_status", job_id=job.id)
+    if job.status == DONE:
+        data["download_url"] = url_for("exports.download_export", job_id=job.id)
+    return data
+
+
+def _export_params(kind, data):
+    """
+    Validate a request for ``kind`` against the current user's permissions.
+    Returns (params, error, status code); same rules as the synchronous download routes.
+    """
+    role = (current_user.role or "").lower()
+
+    if kind == "attendance_report":
+        if role not in ("admin", "supervisor"):
+            return None, "Only admins or supervisors can download reports.", 403
+        company = Company.query.get(data.get("company_id") or 0)
+        if company is None:
+            return None, "Company not found.", 404
+        if role == "supervisor" and company.id != current_user.company_id:
+            return None, "You can only download your own company's report.", 403
+        month = str(data.get("month") or "")
+        try:
+            year_str, month_str = month.split("-")
+            month = f"{int(year_str):04d}-{int(month_str):02d}"
+        except ValueError:
+            return None, "Invalid month format. Use YYYY-MM.", 400
+        return {"company_id": company.id, "month": month}, None, 200
+
+    if kind in ("all_users_csv", "user_attendance_csv"):
+        if role != "admin":
+            return None, "Access denied.", 403
+        if kind == "all_users_csv":
+            return {}, None, 200
+        user = User.query.get(data.get("user_id") or 0)
+        if user is None:
+            return None, "User not found.", 404
+        return {"user_id": user.id}, None, 200
+
+    return None, "Unknown export kind.", 400
+
+
+# ==========================================================
+# 🔹 Submit an export job (JSON or form POST)
+# ==========================================================
+@bp.route("/", methods=["POST"])
+@login_required
+def submit():
+    data = request.get_json(silent=True) or request.form
+    kind = data.get("kind", "")
+    params, error, code = _export_params(kind, data)
+    if error:
+        return jsonify({"error": error}), code
+
+    # ✅ Identical in-flight job of this user is returned instead of queued again
+    job = submit_export(current_user.id, kind, params)
+    return jsonify(_job_payload(job)), 202
+
+
+# ==========================================================
+# 🔹 Job status (polling fallback for the socket events)
+# ==========================================================
+@bp.route("/<int:job_id>")
+@login_required
+def export_status(job_id):
+    job = ExportJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id and current_user.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(_job_payload(job))
+
+
+# ==========================================================
+# 🔹 Download the finished file
+# ==========================================================
+@bp.route("/<int:job_id>/download")
+@login_required
+def download_export(job_id):
+    job = ExportJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id and current_user.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    if job.status != DONE or not job.file_path:
+        return jsonify({"error": "Export is not ready.", "status": job.status}), 409
+
+    return send_file(job.file_path, as_attachment=True, download_name=job.filename)
@@ -1,17 +1,21 @@
 from flask import Blueprint, render_template, redirect, url_for, abort, request, flash, current_app
-from collections import defaultdict
 from flask import jsonify
 from flask_login import login_required, current_user
-import socketio
-from sqlalchemy import or_
+from app import socketio
+from sqlalchemy import func, or_
 from app.models import Broadcast, Penalty, User, Attendance, Increment, db, Clearance
 from datetime import datetime, date
 import calendar
 from werkzeug.utils import secure_filename
 import os
 from werkzeug.security import check_password_hash, generate_password_hash
-from app.routes.broadcasts import get_broadcast_view_data
+from app.routes.broadcasts import broadcast_months, inbox_query
+from app.sockets import company_room, company_shift_room, user_room
+from app.utils.user_cache import invalidate_user
 from app.utils.uploads import ALLOWED_DOC_EXT, ALLOWED_IMAGE_EXT, remove_user_file, save_user_file
+from app.utils.payroll import monthly_salary_reports
+from app.utils.rollups import refresh_monthly_summary, refresh_monthly_summary_for, team_totals
+from app.utils.bulk import bulk_upsert
 from datetime import datetime, date
 import pytz
 
@@ -25,24 +29,27 @@ def dashboard():
     today = date.today()
     shift = current_user.shift
 
-    # All users in supervisor's company with same shift
-    team_members = User.query.filter_by(company_id=current_user.company_id, shift=shift).all()
-
-    # Attendance details for today
-    today_records = Attendance.query.filter(
-        Attendance.date == today,
-        Attendance.user_id.in_([u.id for u in team_members])
-    ).all()
-
-    presents = sum(1 for a in today_records if a.status == 'Present')
-    lates = sum(1 for a in today_records if a.is_late)
-    absents = sum(1 for a in today_records if a.status == 'Absent')
-    offs = sum(1 for a in today_records if a.status == 'Off')
+    # ✅ Team size and today's status counts in one grouped query
+    # (users of the supervisor's company + shift, left-joined to today's marks)
+    counts = (
+        db.session.query(
+            func.count(User.id).label("team_members"),
+            func.count(Attendance.id).filter(Attendance.status == 'Present').label("presents"),
+            func.count(Attendance.id).filter(Attendance.is_late.is_(True)).label("lates"),
+            func.count(Attendance.id).filter(Attendance.status == 'Absent').label("absents"),
+            func.count(Attendance.id).filter(Attendance.status == 'Off').label("offs"),
+        )
+        .select_from(User)
+        .outerjoin(Attendance, (Attendance.user_id == User.id) & (Attendance.date == today))
+        .filter(User.company_id == current_user.company_id, User.shift == shift)
+        .one()
+    )
+    team_size, presents, lates, absents, offs = counts
 
-    performance = round((presents / len(team_members) * 100), 1) if team_members else 0
+    performance = round((presents / team_size * 100), 1) if team_size else 0
 
     stats = {
-        "team_members": len(team_members),
+        "team_members": team_size,
         "presents": presents,
         "lates": lates,
         "absents": absents,
@@ -72,42 +79,39 @@ def team_members():
     if current_user.role != 'supervisor':
         abort(403)
 
-    # Fetch all users in same company and shift
-    users = User.query.filter_by(
-        company_id=current_user.company_id,
-        shift=current_user.shift
-    ).all()
-
-    # --- Build attendance summary for each user ---
-    attendance_summary = {}
-    for user in users:
-        records = Attendance.query.filter_by(user_id=user.id).all()
+    # Optional date window (?start=YYYY-MM-DD&end=YYYY-MM-DD); whole history otherwise
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        flash("Invalid date. Use YYYY-MM-DD.", "warning")
+        start = end = None
 
-        presents = sum(1 for r in records if r.status == 'Present')
-        lates = sum(1 for r in records if r.status == 'Late')
-        offs = sum(1 for r in records if r.status == 'Off')
-        absents = sum(1 for r in records if r.status == 'Absent')
-        penalties = sum((r.penalty or 0) for r in records)
-        bonuses = sum((r.bonus or 0) for r in records)
+    # ✅ Users of the same company and shift with their totals, in one grouped query
+    rows = team_totals(
+        User.company_id == current_user.company_id,
+        User.shift == current_user.shift,
+        start=start,
+        end=end,
+    )
 
+    users = []
+    attendance_summary = {}
+    for user, totals in rows:
+        users.append(user)
         per_day_salary = (user.salary or 0) / 30  # Assume 30 days in a month
-        calculated_salary = (presents + offs) * per_day_salary + bonuses - penalties
-
-        attendance_summary[user.id] = {
-            'presents': presents,
-            'lates': lates,
-            'offs': offs,
-            'absents': absents,
-            'penalties': penalties,
-            'bonuses': bonuses,
-            'calculated_salary': calculated_salary
-        }
+        calculated_salary = (
+            (totals['presents'] + totals['offs']) * per_day_salary + totals['bonuses'] - totals['penalties']
+        )
+        attendance_summary[user.id] = dict(totals, calculated_salary=calculated_salary)
 
     # ✅ Pass both users and attendance_summary to the template
     return render_template(
         'supervisor/team_members.html',
         users=users,
-        attendance_summary=attendance_summary
+        attendance_summary=attendance_summary,
+        start=start,
+        end=end,
     )
 
 
@@ -234,27 +238,31 @@ def user_details(user_id):
 @login_required
 def attendance_dashboard():
     from collections import defaultdict
-    from datetime import date, datetime
-    from sqlalchemy import extract
+    from datetime import date, datetime, time, timedelta
+    from sqlalchemy.orm import contains_eager, joinedload
+    from app.utils.payroll import month_bounds
 
     month = request.args.get('month', date.today().strftime('%Y-%m'))
     shift = request.args.get('shift', current_user.shift)
 
-    # Extract numeric year/month for filtering
+    # Month as a date range (index-friendly, unlike extract() on the column)
     year, month_num = map(int, month.split('-'))
+    first_day, last_day = month_bounds(year, month_num)
+    range_start = datetime.combine(first_day, time.min)
+    range_end = datetime.combine(last_day + timedelta(days=1), time.min)
 
     # Fetch all users in this supervisor's company + shift
     users = User.query.filter_by(company_id=current_user.company_id, shift=shift).all()
     user_ids = [u.id for u in users]
 
-    # --- Attendance Records (for selected month) ---
+    # --- Attendance Records (for selected month), newest first ---
     records = (
         Attendance.query
         .join(User, Attendance.user_id == User.id)
+        .options(contains_eager(Attendance.user), joinedload(Attendance.marker))
         .filter(User.company_id == current_user.company_id)
         .filter(User.shift == shift)
-        .filter(extract('year', Attendance.date) == year)
-        .filter(extract('month', Attendance.date) == month_num)
+        .filter(Attendance.date >= first_day, Attendance.date <= last_day)
         .order_by(Attendance.date.desc(), Attendance.time.desc())
         .all()
     )
@@ -262,107 +270,99 @@ def attendance_dashboard():
     # --- Penalties (for same users and month) ---
     penalties = (
         Penalty.query
+        .options(joinedload(Penalty.marker))
         .filter(Penalty.user_id.in_(user_ids))
-        .filter(extract('year', Penalty.created_at) == year)
-        .filter(extract('month', Penalty.created_at) == month_num)
+        .filter(Penalty.created_at >= range_start, Penalty.created_at < range_end)
         .order_by(Penalty.created_at.desc())
         .all()
     )
 
-    # Group penalties by (user_id, date)
+    # ✅ One pass over the penalties: details per (user, date), totals per user
     penalties_by_user_date = defaultdict(list)
+    penalty_totals = defaultdict(lambda: [0.0, 0])  # user_id -> [amount, count]
     for p in penalties:
-        p_date = p.created_at.date()
-        penalties_by_user_date[(p.user_id, p_date)].append({
+        penalties_by_user_date[(p.user_id, p.created_at.date())].append({
             "amount": p.amount,
             "reason": p.reason or "No reason given",
             "marked_by": f"{p.marker.first_name} {p.marker.last_name}" if p.marker else "Unknown"
         })
-
-    # --- Group attendance by date ---
-    grouped = defaultdict(list)
+        totals = penalty_totals[p.user_id]
+        totals[0] += p.amount
+        totals[1] += 1
+
+    # ✅ One pass over the records: grouped by date and by user, tallies included
+    # (records come newest first, so both groupings stay in that order)
+    status_keys = {'Present': 'presents', 'Late': 'lates', 'Off': 'offs', 'Absent': 'absents'}
+    by_date = {}
+    by_user = defaultdict(lambda: {"records": [], "presents": 0, "lates": 0, "offs": 0, "absents": 0, "bonuses": 0})
     for r in records:
-        grouped[r.date].append(r)
-
-    attendance_by_date = []
-    for dt in sorted(grouped.keys(), reverse=True):
-        day_records = grouped[dt]
-        presents = sum(1 for r in day_records if r.status == 'Present')
-        lates = sum(1 for r in day_records if r.status == 'Late')
-        offs = sum(1 for r in day_records if r.status == 'Off')
-        absents = sum(1 for r in day_records if r.status == 'Absent')
-        bonuses = sum((r.bonus or 0) for r in day_records)
-
-        # --- Calculate penalties per date ---
-        total_penalty_amount = 0
-        total_penalty_count = 0
-
-        for r in day_records:
-            penalty_details = penalties_by_user_date.get((r.user_id, dt), [])
-            r.penalty_details = penalty_details
-            if penalty_details:
-                total_penalty_count += len(penalty_details)
-                total_penalty_amount += sum(p["amount"] for p in penalty_details)
-
-        markers = sorted({r.marker.user_full_name() if r.marker else "—" for r in day_records})
-
-        attendance_by_date.append({
+        r.penalty_details = penalties_by_user_date.get((r.user_id, r.date), [])
+        key = status_keys.get(r.status)
+
+        day = by_date.get(r.date)
+        if day is None:
+            day = by_date[r.date] = {
+                "records": [], "markers": set(), "presents": 0, "lates": 0, "offs": 0, "absents": 0,
+                "bonuses": 0, "penalties": 0, "penalty_count": 0,
+            }
+        day["records"].append(r)
+        day["markers"].add(r.marker.user_full_name() if r.marker else "—")
+        day["bonuses"] += r.bonus or 0
+        day["penalties"] += sum(p["amount"] for p in r.penalty_details)
+        day["penalty_count"] += len(r.penalty_details)
+
+        mine = by_user[r.user_id]
+        mine["records"].append(r)
+        mine["bonuses"] += r.bonus or 0
+        if key:
+            day[key] += 1
+            mine[key] += 1
+
+    attendance_by_date = [
+        {
             "date": dt,
             "display_date": dt.strftime("%Y-%m-%d"),
-            "records": day_records,
+            "records": day["records"],
             "counts": {
-                "presents": presents,
-                "lates": lates,
-                "offs": offs,
-                "absents": absents,
-                "bonuses": bonuses,
-                "penalties": total_penalty_amount,
-                "penalty_count": total_penalty_count,  # ✅ new field
+                "presents": day["presents"],
+                "lates": day["lates"],
+                "offs": day["offs"],
+                "absents": day["absents"],
+                "bonuses": day["bonuses"],
+                "penalties": day["penalties"],
+                "penalty_count": day["penalty_count"],  # ✅ new field
             },
-            "marked_by": ", ".join(markers),
+            "marked_by": ", ".join(sorted(day["markers"])),
             "shift": shift,
-        })
+        }
+        for dt, day in by_date.items()
+    ]
 
-    # --- Monthly summary per user ---
+    # --- Monthly summary per user (lookups into the groups above) ---
     monthly_summary = []
     for u in users:
-        user_records = [r for r in records if r.user_id == u.id]
-
-        total_present = sum(1 for r in user_records if r.status == 'Present')
-        total_late = sum(1 for r in user_records if r.status == 'Late')
-        total_absent = sum(1 for r in user_records if r.status == 'Absent')
-        total_off = sum(1 for r in user_records if r.status == 'Off')
-        total_bonus = sum((r.bonus or 0) for r in user_records)
-
-        # --- Calculate penalties for this user (from grouped penalties) ---
-        user_penalties = [
-            p for key, plist in penalties_by_user_date.items()
-            if key[0] == u.id for p in plist
-        ]
-        total_penalty = sum(p["amount"] for p in user_penalties)
-
-        calculated_salary = (u.salary or 0) + total_bonus - total_penalty
-
-        user_daily_records = sorted(user_records, key=lambda r: r.date, reverse=True)
+        mine = by_user.get(u.id) or by_user.default_factory()
+        total_penalty, penalty_count = penalty_totals.get(u.id, (0.0, 0))
+        calculated_salary = (u.salary or 0) + mine["bonuses"] - total_penalty
 
         monthly_summary.append({
             "user": u,
-            "present": total_present,
-            "late": total_late,
-            "absent": total_absent,
-            "off": total_off,
-            "bonus": total_bonus,
+            "present": mine["presents"],
+            "late": mine["lates"],
+            "absent": mine["absents"],
+            "off": mine["offs"],
+            "bonus": mine["bonuses"],
             "penalty": total_penalty,
-            "penalty_count": len(user_penalties),  # ✅ new field
+            "penalty_count": penalty_count,  # ✅ new field
             "base_salary": u.salary or 0,
             "final_salary": calculated_salary,
-            "attendance_records": user_daily_records,
+            "attendance_records": mine["records"],
         })
 
     monthly_summary.sort(key=lambda x: x["user"].user_full_name().lower())
 
     # --- Recent Clearances ---
-    clearances = Clearance.query.filter(
+    clearances = Clearance.query.options(joinedload(Clearance.user)).filter(
         Clearance.user.has(company_id=current_user.company_id)
     ).order_by(Clearance.date_added.desc()).limit(10).all()
 
@@ -411,24 +411,39 @@ def mark_attendance():
     users = query.all()
 
     if request.method == 'POST':
+        submitted = {}
         for user in users:
             status = request.form.get(f'status_{user.id}')
-            if not status:
-                continue
-
-            attendance = Attendance.query.filter_by(user_id=user.id, date=today).first()
-            if not attendance:
-                attendance = Attendance(
-                    user_id=user.id,
-                    date=today,
-                    time=now_pk.time(),
-                    marked_by=current_user.id
-                )
-                db.session.add(attendance)
-
-            attendance.status = status
-            attendance.is_late = (status == 'Late')
+            if status:
+                submitted[user.id] = status
+
+        # ✅ One query for today's existing rows of every submitted user
+        existing = dict(
+            db.session.query(Attendance.user_id, Attendance.status)
+            .filter(Attendance.date == today, Attendance.user_id.in_(list(submitted) or [0]))
+            .all()
+        )
+
+        # ✅ Only new or changed rows are written, in a single upsert
+        rows = [
+            {
+                "user_id": user_id,
+                "date": today,
+                "time": now_pk.time(),
+                "status": status,
+                "is_late": status == 'Late',
+                "bonus": 0.0,
+                "penalty": 0.0,
+                "marked_by": current_user.id,
+            }
+            for user_id, status in submitted.items()
+            if existing.get(user_id) != status
+        ]
+        bulk_upsert(Attendance, rows, index_elements=("user_id", "date"), update_columns=("status", "is_late"))
+        marked_ids = [row["user_id"] for row in rows]
 
+        # Keep the monthly rollup in the same transaction
+        refresh_monthly_summary(marked_ids, today.year, today.month)
         db.session.commit()
         flash("Attendance saved successfully!", "success")
         return redirect(url_for('supervisor.mark_attendance', shift=shift, search=search))
@@ -442,7 +457,7 @@ def mark_attendance():
 @supervisor_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    user = current_user
+    user = current_user.record
 
     if request.method == "POST":
         # Check lock status
@@ -487,6 +502,7 @@ def profile():
         # ✅ Lock profile after save
         user.profile_locked = True
         db.session.commit()
+        invalidate_user(user.id)
         flash("Profile updated and locked successfully.", "success")
         return redirect(url_for('supervisor.profile'))
 
@@ -525,7 +541,7 @@ def profile_pass():
             return redirect(url_for('supervisor.profile_pass'))
 
         # Prevent using same password again
-        if current_user.check_password(new_password):
+        if new_password == current_password:  # current_password was just verified: no second hash
             flash("New password cannot be the same as your current one.", "warning")
             return redirect(url_for('supervisor.profile_pass'))
 
@@ -534,6 +550,7 @@ def profile_pass():
             current_user.set_password(new_password)
             db.session.flush()   # ensures SQLAlchemy detects change
             db.session.commit()
+            invalidate_user(current_user.id)
             flash("✅ Password updated successfully!", "success")
         except Exception as e:
             db.session.rollback()
@@ -549,101 +566,15 @@ def profile_pass():
 @login_required
 def supervisor_reports():
     user = current_user
-    monthly_reports = []
-    totals = {
-        "total_presents": 0,
-        "total_lates": 0,
-        "total_offs": 0,
-        "total_absents": 0,
-        "total_bonus": 0,
-        "total_penalty": 0,
-        "final_salary": 0
-    }
+    monthly_reports, totals = monthly_salary_reports(user)
 
-    #1 group attendance by month
-    records = Attendance.query.filter_by(user_id=user.id).all()
-    from collections import defaultdict
-    from calendar import month_name
-    grouped = defaultdict(list)
-
-    for r in records:
-        grouped[(r.date.year, r.date.month)].append(r)
-     # ==========================================================
-    # 2️⃣ Fetch penalties and group them by DATE only
-    # ==========================================================
-    penalties = (
-        Penalty.query
-        .filter_by(user_id=user.id)
-        .order_by(Penalty.created_at.desc())
-        .all()
+    return render_template(
+        "supervisor/reports.html",
+        user=user,
+        monthly_reports=monthly_reports,
+        totals=totals
     )
 
-    penalties_by_date = defaultdict(list)
-    for p in penalties:
-        penalties_by_date[p.created_at.date()].append(p)
-
-    for (year, month), recs in grouped.items():
-        total_presents = sum(1 for r in recs if r.status == "Present")
-        total_lates = sum(1 for r in recs if r.status == "Late")
-        total_offs = sum(1 for r in recs if r.status == "Off")
-        total_absents = sum(1 for r in recs if r.status == "Absent")
-        total_bonus = sum(r.bonus for r in recs)
-        total_penalty = 0 # we'll accumulate dynamically
-
-        # ----------------------------------------------------------
-        # 🔍 Attach all penalties that match the same date
-        # ----------------------------------------------------------
-        for r in recs:
-            same_day_penalties = penalties_by_date.get(r.date, [])
-            if same_day_penalties:
-                r.penalty_details = [
-                    {
-                        "amount": p.amount,
-                        "reason": p.reason,
-                        "added_by": f"{p.marker.first_name} {p.marker.last_name}" if p.marker else "Unknown"
-                    }
-                    for p in same_day_penalties
-                ]
-                # calculate daily penalty total
-                r.penalty = sum(p.amount for p in same_day_penalties)
-                total_penalty += r.penalty
-            else:
-                r.penalty_details = []
-                r.penalty = 0
-                
-        # salary calc
-        final_salary = (
-            user.salary
-            + (user.travel_allowance_amount or 0)
-            + total_bonus
-            - total_penalty
-            - (total_lates * 400)
-            - ((max(total_absents - 4, 0)) * (user.salary / 30))
-        )
-
-        monthly_reports.append({
-            "month_name": f"{month_name[month]} {year}",
-            "total_presents": total_presents,
-            "total_lates": total_lates,
-            "total_offs": total_offs,
-            "total_absents": total_absents,
-            "total_bonus": total_bonus,
-            "total_penalty": total_penalty,
-            "final_salary": round(final_salary, 2),
-            "daily_records": recs
-        })
-
-        # accumulate totals
-        totals["total_presents"] = total_presents
-        totals["total_lates"] = total_lates
-        totals["total_offs"] = total_offs
-        totals["total_absents"] = total_absents
-        totals["total_bonus"] = total_bonus
-        totals["total_penalty"] = total_penalty
-        totals["final_salary"] = final_salary
-
-    return render_template("supervisor/reports.html", user=user, monthly_reports=monthly_reports, totals=totals)
-
 
 @supervisor_bp.route('/salaries')
 @login_required
@@ -675,13 +606,13 @@ def supervisor_create_broadcast():
 
     if not message:
         flash("Message is required.", "danger")
-        return redirect(request.referrer or url_for("supervisor.broadcasts"))
+        return redirect(request.referrer or url_for("supervisor.supervisor_broadcasts"))
 
     # ✅ Determine company context
     company_id = current_user.company_id
     if not company_id:
         flash("No associated company found.", "danger")
-        return redirect(request.referrer or url_for("supervisor.broadcasts"))
+        return redirect(request.referrer or url_for("supervisor.supervisor_broadcasts"))
 
     # ✅ Create broadcast entry
     b = Broadcast(
@@ -696,29 +627,22 @@ def supervisor_create_broadcast():
 
     payload = b.to_dict()
 
-    # ✅ Determine recipients
+    # ✅ One emit to the target's room(s) (clients join rooms on connect)
     if send_to_all_shifts:
-        recipients_query = User.query.filter(User.company_id == company_id)
+        rooms = [company_room(company_id)]
     elif target_type == "shift" and shift:
-        recipients_query = User.query.filter(
-            User.company_id == company_id,
-            User.shift == shift
-        )
+        rooms = [company_shift_room(company_id, shift)]
     elif target_type == "agent" and agent_ids:
-        recipients_query = User.query.filter(User.id.in_(agent_ids))
+        rooms = [user_room(uid) for uid in agent_ids]
     else:
-        recipients_query = User.query.filter(User.company_id == company_id)
+        rooms = [company_room(company_id)]
 
-    recipient_ids = [r.id for r in recipients_query.with_entities(User.id).all()]
-
-    # ✅ Emit broadcast to recipients
-    for uid in recipient_ids:
-        socketio.emit("new_broadcast", payload, room=f"user_{uid}")
+    socketio.emit("new_broadcast", payload, to=rooms)
 
     socketio.emit("admin_broadcast_update", payload)
     flash("Broadcast sent successfully!", "success")
 
-    return redirect(url_for("supervisor.broadcasts"))
+    return redirect(url_for("supervisor.supervisor_broadcasts"))
 
 
 # ==========================================================
@@ -731,31 +655,12 @@ def supervisor_broadcasts():
         flash("Access denied.", "danger")
         return redirect(url_for("auth.login"))
 
-    # ✅ Fetch broadcasts created by this supervisor or within their company
-    broadcasts = (
-        Broadcast.query
-        .filter(
-            Broadcast.company_id == current_user.company_id,
-            Broadcast.sender_id == current_user.id
-        )
-        .order_by(Broadcast.created_at.desc())
-        .all()
-    )
-
-    grouped = defaultdict(lambda: defaultdict(list))
-    for b in broadcasts:
-        month_key = b.created_at.strftime("%B %Y")
-        date_key = b.created_at.strftime("%d %b %Y")
-        grouped[month_key][date_key].append(b)
-
-    db_broadcasts = broadcasts
-    view_summary = get_broadcast_view_data(db_broadcasts)
+    # ✅ Only the archive months here; sent broadcasts are paged in from /broadcasts/inbox?box=sent
+    months = broadcast_months(inbox_query(current_user, "sent"))
 
     return render_template(
         "supervisor/broadcasts.html",
-        broadcasts=grouped,
-        current_time=datetime.utcnow(),
-        view_summary=view_summary
+        months=months
     )
 
 
@@ -793,6 +698,8 @@ def add_penalty():
         marked_by=current_user.id
     )
     db.session.add(penalty)
+    db.session.flush()
+    refresh_monthly_summary_for(agent.id, penalty.created_at)
     db.session.commit()
 
     return jsonify({"message": f"Penalty of {amount} added to {agent.full_name}."}), 200
@@ -829,6 +736,8 @@ def add_clearance():
         marked_by=current_user.id
     )
     db.session.add(clearance)
+    db.session.flush()
+    refresh_monthly_summary_for(agent.id, clearance.date_added)
     db.session.commit()
 
     return jsonify({"message": f"Clearance of {amount} added for {agent.full_name}."}), 200
@@ -1,21 +1,77 @@
 from flask_socketio import emit, join_room, leave_room
 from flask_login import current_user
-from app import socketio
+from app import db, socketio
+from app.utils.inbox import unread_count
+from app.utils.seen_buffer import pending_seen
+
+# ==========================================================
+# Rooms: every authenticated client joins its user, role, company,
+# company+role and company+shift rooms, so a broadcast target maps to
+# one emit instead of one emit per recipient.
+# ==========================================================
+ALL_USERS_ROOM = "all_users"
+
+
+def user_room(user_id):
+    return f"user_{user_id}"
+
+
+def role_room(role):
+    return f"role_{role}"
+
+
+def company_room(company_id):
+    return f"company_{company_id}"
+
+
+def company_role_room(company_id, role):
+    return f"company_{company_id}_role_{role}"
+
+
+def company_shift_room(company_id, shift):
+    return f"company_{company_id}_shift_{shift}"
+
+
+def rooms_for(user):
+    rooms = [ALL_USERS_ROOM, user_room(user.id)]
+    role = (user.role or "").lower()
+    if role:
+        rooms.append(role_room(role))
+    if user.company_id:
+        rooms.append(company_room(user.company_id))
+        if role:
+            rooms.append(company_role_room(user.company_id, role))
+        if user.shift:
+            rooms.append(company_shift_room(user.company_id, user.shift))
+    return rooms
+
+
+def broadcast_rooms(target, company_id=None):
+    """Rooms that receive an admin broadcast with ``target`` (same audience as /broadcasts/unread)."""
+    if target == "company" and company_id:
+        return [company_room(company_id)]
+    if target == "supervisors":
+        return [role_room("supervisor")]
+    if target == "supervisors_company" and company_id:
+        return [company_role_room(company_id, "supervisor")]
+    return [ALL_USERS_ROOM]
+
 
 @socketio.on('connect')
 def handle_connect():
-    # When a client connects, if logged-in, join user and company rooms
+    # When a client connects, if logged-in, join user/role/company rooms
     try:
         if current_user and getattr(current_user, "is_authenticated", False):
             uid = current_user.id
-            join_room(f"user_{uid}")
-            if getattr(current_user, "company_id", None):
-                join_room(f"company_{current_user.company_id}")
-            # Optionally: emit an acknowledgement
-            emit('connected', {"msg": "connected", "user_id": uid})
+            for room in rooms_for(current_user):
+                join_room(room)
+            # Acknowledge with the unread counter; bodies are fetched when the inbox is opened
+            unread = unread_count(current_user, pending_seen(uid))
+            db.session.commit()
+            emit('connected', {"msg": "connected", "user_id": uid, "unread": unread})
     except Exception:
         # unauthenticated clients will not join rooms
-        pass
+        db.session.rollback()
 
 @socketio.on('disconnect')
 def handle_disconnect():
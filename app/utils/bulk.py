@@ -0,0 +1,159 @@
+"""
+Set-based write helpers.
+
+``bulk_upsert`` and ``bulk_insert_ignore`` issue one ``INSERT ... ON
+CONFLICT`` per chunk of rows on PostgreSQL and SQLite, and fall back to a
+select-then-write loop elsewhere. ``bulk_copy`` loads large volumes of new
+rows with ``COPY`` on PostgreSQL and chunked executemany elsewhere.
+Statements run on the current session so they share the caller's
+transaction; the caller commits.
+"""
+import csv
+import io
+from itertools import islice
+
+from sqlalchemy import tuple_
+
+from app import db
+
+CHUNK_SIZE = 500
+
+
+def _dialect_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def bulk_upsert(model, rows, index_elements, update_columns=()):
+    """
+    Insert ``rows`` (list of dicts) into ``model``'s table.
+
+    Rows that collide on ``index_elements`` (which must be covered by a unique
+    constraint) get ``update_columns`` overwritten from the new row, or are
+    skipped when ``update_columns`` is empty (ON CONFLICT DO NOTHING).
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    insert = _dialect_insert()
+    if insert is None:
+        _upsert_fallback(model, rows, index_elements, update_columns)
+        return
+
+    table = model.__table__
+    for i in range(0, len(rows), CHUNK_SIZE):
+        stmt = insert(table).values(rows[i:i + CHUNK_SIZE])
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(index_elements),
+                set_={col: stmt.excluded[col] for col in update_columns},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+        db.session.execute(stmt)
+
+
+def _upsert_fallback(model, rows, index_elements, update_columns):
+    """Portable equivalent for databases without ON CONFLICT support."""
+    key_cols = [getattr(model, col) for col in index_elements]
+    for i in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[i:i + CHUNK_SIZE]
+        keys = [tuple(r[col] for col in index_elements) for r in chunk]
+        existing = {
+            tuple(getattr(obj, col) for col in index_elements): obj
+            for obj in model.query.filter(tuple_(*key_cols).in_(keys))
+        }
+        for key, row in zip(keys, chunk):
+            obj = existing.get(key)
+            if obj is None:
+                obj = model(**row)
+                db.session.add(obj)
+                existing[key] = obj
+            else:
+                for col in update_columns:
+                    setattr(obj, col, row[col])
+    db.session.flush()
+
+
+def bulk_insert_ignore(model, rows, index_elements):
+    """
+    Insert ``rows`` into ``model``'s table, skipping rows that collide on
+    ``index_elements`` (ON CONFLICT DO NOTHING). Returns the
+    ``index_elements`` tuples of the rows that were actually inserted.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    insert = _dialect_insert()
+    if insert is None:
+        return _insert_ignore_fallback(model, rows, index_elements)
+
+    table = model.__table__
+    key_cols = [table.c[col] for col in index_elements]
+    inserted = []
+    for i in range(0, len(rows), CHUNK_SIZE):
+        stmt = (
+            insert(table).values(rows[i:i + CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=list(index_elements))
+            .returning(*key_cols)
+        )
+        inserted.extend(tuple(r) for r in db.session.execute(stmt))
+    return inserted
+
+
+def _insert_ignore_fallback(model, rows, index_elements):
+    key_cols = [getattr(model, col) for col in index_elements]
+    inserted = []
+    for i in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[i:i + CHUNK_SIZE]
+        keys = [tuple(r[col] for col in index_elements) for r in chunk]
+        existing = {tuple(k) for k in model.query.filter(tuple_(*key_cols).in_(keys)).with_entities(*key_cols)}
+        for key, row in zip(keys, chunk):
+            if key not in existing:
+                db.session.add(model(**row))
+                existing.add(key)
+                inserted.append(key)
+    db.session.flush()
+    return inserted
+
+
+def bulk_copy(model, columns, rows, chunk_rows=100_000):
+    """
+    Append ``rows`` (an iterable of tuples in ``columns`` order) to
+    ``model``'s table and return how many were written. On PostgreSQL each
+    chunk is streamed through ``COPY ... FROM STDIN`` (None becomes NULL);
+    elsewhere it is one executemany INSERT. ``rows`` is consumed lazily, so
+    it can be a generator far larger than memory.
+    """
+    table = model.__table__
+    columns = list(columns)
+    rows = iter(rows)
+    is_postgres = db.session.get_bind().dialect.name == "postgresql"
+    cursor = db.session.connection().connection.cursor() if is_postgres else None
+    copy_sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    written = 0
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                return written
+            if cursor is not None:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(chunk)
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+            else:
+                db.session.execute(table.insert(), [dict(zip(columns, row)) for row in chunk])
+            written += len(chunk)
+    finally:
+        if cursor is not None:
+            cursor.close()
@@ -0,0 +1,412 @@
+"""
+Background export jobs.
+
+An export request is stored as an ``ExportJob`` row and its id is put on an
+in-process queue. ``EXPORT_WORKERS`` background tasks (green threads under
+eventlet) take jobs off the queue, write the file to ``EXPORT_DIR`` and push
+``export_progress`` events to the requester's ``user_<id>`` room. Database
+reads stay on the hub (they yield while waiting on the server); the CPU-bound
+xlsx write runs on eventlet's OS thread pool so it doesn't stall requests and
+WebSockets. Files and rows of finished jobs are deleted after
+``EXPORT_RETENTION_HOURS``.
+
+Jobs live in the database. A worker claims a job by moving it from queued to
+running, then refreshes ``heartbeat_at`` while it builds. Queued jobs, and
+running jobs whose heartbeat is older than ``EXPORT_STALE_AFTER``, are queued
+again when the workers start and on every sweep. A job still being built by
+another live process is left alone. Each build writes a file of its own and
+renames it into place when complete, and only the worker that holds the claim
+records the outcome.
+"""
+import json
+import os
+import queue
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import load_only
+
+from app import db, socketio
+from app.models import Attendance, Company, ExportJob, User
+from app.utils.green_db import running_under_eventlet
+from app.utils.exports import (
+    ALL_USERS_HEADER, USER_ATTENDANCE_HEADER, all_users_rows, attendance_report_filename,
+    attendance_report_rows, iter_csv, user_attendance_rows, write_attendance_report,
+)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+IN_FLIGHT = (QUEUED, RUNNING)
+
+PROGRESS_STEP = 5        # percent between progress events
+REPORT_INTERVAL = 0.5    # seconds between progress checks of a running job
+
+_jobs = queue.Queue()
+_progress = {}  # job id -> percent of the running jobs
+_started = False
+
+
+# ==========================================================
+# Builders: kind -> (params, path, progress) -> download filename
+# ==========================================================
+class _Progress:
+    """Percent done of one build; read by the job's reporter green thread."""
+
+    def __init__(self):
+        self.percent = 0
+
+    def record(self, done, total):
+        """Safe to call from any thread."""
+        self.percent = max(self.percent, min(99, done * 100 // total) if total else 0)
+
+    def tick(self, done, total):
+        """``record`` from code running on the hub, then let other green threads run."""
+        self.record(done, total)
+        socketio.sleep(0)
+
+
+def _off_hub(fn, *args, **kwargs):
+    """Run CPU-bound ``fn`` on eventlet's OS thread pool (inline without eventlet)."""
+    if not running_under_eventlet():
+        return fn(*args, **kwargs)
+    from eventlet import tpool
+    return tpool.execute(fn, *args, **kwargs)
+
+
+def _tracked(rows, total, tick):
+    """Pass rows through, reporting each data row (``None`` separators aren't counted)."""
+    done = 0
+    for row in rows:
+        yield row
+        if row is not None:
+            done += 1
+            tick(done, total)
+
+
+def _build_attendance_report(params, path, progress):
+    company = Company.query.get(params["company_id"])
+    if company is None:
+        raise ValueError("Company not found.")
+    month = params["month"]
+    year, month_num = (int(part) for part in month.split("-"))
+
+    # Queries and ORM attribute access on the hub; the rows are plain values
+    header, rows = attendance_report_rows(company, year, month_num)
+    rows = list(rows)
+    title = f"{company.name[:25]}_{month}"
+    with open(path, "wb") as fh:
+        _off_hub(write_attendance_report, fh, title, header, rows, progress=progress.record)
+    return attendance_report_filename(company, month)
+
+
+def _write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        for chunk in iter_csv(header, rows):
+            fh.write(chunk)
+
+
+def _build_all_users_csv(params, path, progress):
+    total = User.query.count()
+    _write_csv(path, ALL_USERS_HEADER, _tracked(all_users_rows(), total, progress.tick))
+    return "all_users.csv"
+
+
+def _build_user_attendance_csv(params, path, progress):
+    user = User.query.get(params["user_id"])
+    if user is None:
+        raise ValueError("User not found.")
+    total = Attendance.query.filter_by(user_id=user.id).count()
+    _write_csv(path, USER_ATTENDANCE_HEADER, _tracked(user_attendance_rows(user), total, progress.tick))
+    return f"{user.username}_attendance.csv"
+
+
+BUILDERS = {
+    "attendance_report": _build_attendance_report,
+    "all_users_csv": _build_all_users_csv,
+    "user_attendance_csv": _build_user_attendance_csv,
+}
+
+
+# ==========================================================
+# Submitting and running jobs
+# ==========================================================
+def export_dir():
+    path = current_app.config.get("EXPORT_DIR") or os.path.join(current_app.instance_path, "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def dedupe_key(user_id, kind, params):
+    return f"{user_id}:{kind}:{json.dumps(params, sort_keys=True)}"
+
+
+def submit_export(user_id, kind, params):
+    """
+    Queue an export for ``user_id``. An identical job of the same user that is
+    still queued or running is returned instead of creating a new one.
+    """
+    if kind not in BUILDERS:
+        raise ValueError(f"Unknown export kind: {kind}")
+
+    start_workers(current_app._get_current_object())
+
+    key = dedupe_key(user_id, kind, params)
+    job = (
+        ExportJob.query
+        .filter(ExportJob.dedupe_key == key, ExportJob.status.in_(IN_FLIGHT))
+        .order_by(ExportJob.id.desc())
+        .first()
+    )
+    if job is not None:
+        return job
+
+    job = ExportJob(
+        user_id=user_id, kind=kind, params=json.dumps(params, sort_keys=True),
+        dedupe_key=key, status=QUEUED, progress=0,
+    )
+    db.session.add(job)
+    db.session.commit()
+    _jobs.put(job.id)
+    return job
+
+
+def job_status(job):
+    """``job.to_dict()`` with the live progress of a running job."""
+    data = job.to_dict()
+    if job.status == RUNNING:
+        data["progress"] = _progress.get(job.id, job.progress)
+    return data
+
+
+def _notify(payload, user_id):
+    socketio.emit("export_progress", payload, room=f"user_{user_id}")
+
+
+def _heartbeat(job_id, started_at, percent):
+    """
+    Refresh the heartbeat (and stored progress) of a running job.
+
+    Written on a connection of its own: committing the worker's session would
+    close the server-side cursor the rows are being read from.
+    """
+    table = ExportJob.__table__
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.started_at == started_at)
+                .values(heartbeat_at=datetime.utcnow(), progress=percent)
+            )
+    except Exception:
+        # e.g. SQLite refusing a write while the export's read is open; the
+        # next heartbeat tries again
+        current_app.logger.warning("Export job %s: heartbeat not recorded", job_id, exc_info=True)
+
+
+def _report_progress(app, payload, user_id, started_at, progress, building):
+    """
+    While a job builds: emit its progress every PROGRESS_STEP percent and
+    refresh its heartbeat. Runs as a green thread of its own, so progress
+    recorded from the thread pool reaches clients too. ``payload`` is the
+    job's dict at claim time (the job row belongs to the worker's session).
+    """
+    job_id = payload["id"]
+    heartbeat_every = app.config.get("EXPORT_HEARTBEAT_INTERVAL", 30)
+    reported, last_beat = 0, time.monotonic()
+    with app.app_context():
+        while True:
+            socketio.sleep(REPORT_INTERVAL)
+            if not building["running"]:
+                break
+            percent = progress.percent
+            if percent - reported >= PROGRESS_STEP:
+                reported = percent
+                _progress[job_id] = percent
+                _notify(dict(payload, progress=percent), user_id)
+            if time.monotonic() - last_beat >= heartbeat_every:
+                last_beat = time.monotonic()
+                _heartbeat(job_id, started_at, percent)
+
+
+def run_export_job(job_id):
+    """Build the file of one job, recording progress and the outcome."""
+    # Claim the job atomically: queued jobs can be on the queues of several
+    # processes (see SOCKETIO_MESSAGE_QUEUE), only one of them gets to run it
+    started_at = datetime.utcnow()
+    claimed = (
+        ExportJob.query
+        .filter(ExportJob.id == job_id, ExportJob.status == QUEUED)
+        .update(
+            {"status": RUNNING, "progress": 0, "error": None, "started_at": started_at, "heartbeat_at": started_at},
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    job = ExportJob.query.get(job_id)
+    if not claimed:
+        return job
+    _notify(job.to_dict(), job.user_id)
+
+    progress = _Progress()
+    building = {"running": True}
+    app = current_app._get_current_object()
+    socketio.start_background_task(
+        _report_progress, app, job.to_dict(), job.user_id, started_at, progress, building,
+    )
+
+    # Built under a name of its own, renamed into place once complete
+    path = os.path.join(export_dir(), f"export_{job.id}")
+    part = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        filename = BUILDERS[job.kind](json.loads(job.params), part, progress)
+        os.replace(part, path)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Export job %s failed", job_id)
+        if os.path.exists(part):
+            os.remove(part)
+        outcome = {"status": FAILED, "error": str(e)}
+    else:
+        outcome = {"status": DONE, "progress": 100, "filename": filename, "file_path": path}
+    finally:
+        building["running"] = False
+    outcome["finished_at"] = datetime.utcnow()
+
+    # Only while the claim is still ours: a job given up as stale and
+    # claimed again belongs to the newer worker
+    recorded = (
+        ExportJob.query
+        .filter(ExportJob.id == job_id, ExportJob.status == RUNNING, ExportJob.started_at == started_at)
+        .update(outcome, synchronize_session=False)
+    )
+    db.session.commit()
+    _progress.pop(job_id, None)
+    job = ExportJob.query.get(job_id)
+    if not recorded:
+        current_app.logger.warning("Export job %s was claimed again while it ran; outcome dropped", job_id)
+        return job
+    _notify(job.to_dict(), job.user_id)
+    return job
+
+
+def requeue_jobs(all_queued=True):
+    """
+    Queue the jobs no live worker is taking care of: queued jobs (only those
+    waiting longer than ``EXPORT_STALE_AFTER`` unless ``all_queued``), and
+    running jobs whose heartbeat is older than that. Returns their ids.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get("EXPORT_STALE_AFTER", 300))
+    last_seen = func.coalesce(ExportJob.heartbeat_at, ExportJob.started_at, ExportJob.created_at)
+    stale = [
+        job_id for (job_id,) in
+        db.session.query(ExportJob.id).filter(ExportJob.status == RUNNING, last_seen < cutoff)
+    ]
+    for job_id in stale:
+        # Conditional, so a job whose worker checks in meanwhile keeps running
+        (
+            ExportJob.query
+            .filter(ExportJob.id == job_id, ExportJob.status == RUNNING, last_seen < cutoff)
+            .update({"status": QUEUED, "progress": 0}, synchronize_session=False)
+        )
+    db.session.commit()
+
+    pending = db.session.query(ExportJob.id).filter(ExportJob.status == QUEUED)
+    if not all_queued:
+        pending = pending.filter(or_(ExportJob.id.in_(stale), ExportJob.created_at < cutoff))
+    pending = [job_id for (job_id,) in pending.order_by(ExportJob.id)]
+    for job_id in pending:
+        _jobs.put(job_id)
+    return pending
+
+
+def cleanup_exports(max_age_hours=None):
+    """
+    Delete finished and failed jobs older than ``EXPORT_RETENTION_HOURS``
+    with their files, plus ``export_*`` files of that age no job refers to
+    (leftovers of crashed builds). Returns (jobs deleted, files deleted).
+    """
+    if max_age_hours is None:
+        max_age_hours = current_app.config.get("EXPORT_RETENTION_HOURS", 24)
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    directory = export_dir()
+    files_deleted = 0
+
+    expired = (
+        ExportJob.query
+        .options(load_only(ExportJob.id, ExportJob.file_path))
+        .filter(
+            ExportJob.status.in_([DONE, FAILED]),
+            func.coalesce(ExportJob.finished_at, ExportJob.created_at) < cutoff,
+        )
+        .all()
+    )
+    for job in expired:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+            files_deleted += 1
+    if expired:
+        ExportJob.query.filter(ExportJob.id.in_([job.id for job in expired])).delete(synchronize_session=False)
+    db.session.commit()
+
+    # Files of jobs still queued, running or done (within retention) are kept
+    kept = {
+        job_id for (job_id,) in
+        db.session.query(ExportJob.id).filter(ExportJob.status.in_([QUEUED, RUNNING, DONE]))
+    }
+    for name in os.listdir(directory):
+        match = re.match(r"export_(\d+)(\.|$)", name)
+        path = os.path.join(directory, name)
+        if not match or int(match.group(1)) in kept:
+            continue
+        if datetime.utcfromtimestamp(os.path.getmtime(path)) < cutoff:
+            os.remove(path)
+            files_deleted += 1
+    return len(expired), files_deleted
+
+
+def _worker(app):
+    while True:
+        job_id = _jobs.get()
+        with app.app_context():
+            try:
+                run_export_job(job_id)
+            except Exception:
+                app.logger.exception("Export worker error on job %s", job_id)
+            finally:
+                db.session.remove()
+
+
+def _sweeper(app):
+    """Pick up jobs left behind by workers that died and clear out old exports."""
+    while True:
+        socketio.sleep(app.config.get("EXPORT_STALE_AFTER", 300) / 2)
+        with app.app_context():
+            try:
+                requeue_jobs(all_queued=False)
+                cleanup_exports()
+            except Exception:
+                app.logger.exception("Export sweep failed")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def start_workers(app):
+    """
+    Start the worker pool once per process and queue the jobs no live worker
+    is taking care of.
+    """
+    global _started
+    if _started:
+        return
+    _started = True
+
+    with app.app_context():
+        requeue_jobs()
+
+    for _ in range(max(1, app.config.get("EXPORT_WORKERS", 2))):
+        socketio.start_background_task(_worker, app)
+    socketio.start_background_task(_sweeper, app)
@@ -0,0 +1,227 @@
+"""
+Row sources and writers for file exports.
+
+Row sources pull from the database with ``yield_per`` (a server-side cursor
+on PostgreSQL), so memory stays flat no matter how many rows an export has.
+``iter_csv`` turns any header + rows pair into CSV text chunks that can be
+streamed as a response body or written to a file.
+"""
+import csv
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date
+from io import StringIO
+
+from app import db
+from app.models import Attendance, Company, User
+from app.utils.payroll import load_month
+
+YIELD_PER = 1000       # rows fetched per round trip
+CSV_CHUNK_ROWS = 500   # rows per emitted chunk
+
+ALL_USERS_HEADER = ["ID", "Name", "Username", "Email", "Role", "Company", "Shift", "Salary"]
+USER_ATTENDANCE_HEADER = ["Date", "Status", "Shift", "Late", "Penalty", "Bonus"]
+
+
+def iter_csv(header, rows, chunk_rows=CSV_CHUNK_ROWS):
+    """Yield CSV text in chunks of ``chunk_rows`` rows, header first."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def all_users_rows():
+    """Rows of the all-users export, ordered by id."""
+    query = (
+        db.session.query(
+            User.id, User.first_name, User.last_name, User.username, User.email,
+            User.role, Company.name.label("company_name"), User.shift, User.salary,
+        )
+        .outerjoin(Company, User.company_id == Company.id)
+        .order_by(User.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    for u in query:
+        yield [
+            u.id,
+            f"{u.first_name} {u.last_name}",
+            u.username,
+            u.email,
+            u.role,
+            u.company_name or "",
+            u.shift or "",
+            u.salary or 0,
+        ]
+
+
+def user_attendance_rows(user):
+    """Rows of one user's attendance export, newest first."""
+    query = (
+        db.session.query(
+            Attendance.date, Attendance.status, Attendance.is_late,
+            Attendance.penalty, Attendance.bonus,
+        )
+        .filter(Attendance.user_id == user.id)
+        .order_by(Attendance.date.desc())
+        .execution_options(yield_per=YIELD_PER)
+    )
+    shift = user.shift or ""
+    for record in query:
+        yield [
+            record.date.strftime("%Y-%m-%d") if record.date else "",
+            record.status or "",
+            shift,
+            "Yes" if record.is_late else "No",
+            record.penalty or 0,
+            record.bonus or 0,
+        ]
+
+
+# ==========================================================
+# Attendance report (Excel) - company + month
+# ==========================================================
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+SUMMARY_COLUMNS = [
+    "Presents", "Lates", "Absents", "Offs", "Totals",
+    "Base Salary", "Salary(from days)",
+    "Bonus", "Penalty", "Clearance", "Calculated Salary"
+]
+
+
+def attendance_report_filename(company, month):
+    return f"{company.name.replace(' ', '_')}_Attendance_{month}.xlsx"
+
+
+def attendance_report_rows(company, year, month_num):
+    """
+    Header and rows of the company-month attendance sheet.
+
+    Users are grouped by shift (supervisors first, then agents); a ``None``
+    row marks the separator after each shift.
+    """
+    num_days = monthrange(year, month_num)[1]
+    header = ["Sr No", "Full Name", "Role", "Shift"]
+    header += [date(year, month_num, d).strftime("%d") for d in range(1, num_days + 1)]
+    header += SUMMARY_COLUMNS
+
+    # Fetch users in company (agents + supervisors)
+    users = (
+        User.query
+        .filter(User.company_id == company.id)
+        .filter(User.role.in_(["agent", "supervisor"]))
+        .all()
+    )
+
+    # Attendance, penalties and clearances as users x days arrays
+    payroll = load_month(users, year, month_num)
+    labels = payroll.status_labels()
+    presents, lates, absents, offs = payroll.presents, payroll.lates, payroll.absents, payroll.offs
+    totals = payroll.totals
+    salary_from_days = payroll.salary_from_days()
+    bonuses = payroll.sheet_bonus()
+    penalties = payroll.sheet_penalty()
+    clearances = payroll.sheet_clearance()
+    calculated = payroll.sheet_salary()
+
+    # Group users by shift
+    users_by_shift = defaultdict(list)
+    for u in users:
+        users_by_shift[u.shift or "Unassigned"].append(u)
+
+    def rows():
+        sr = 1
+        for shift_name in sorted(users_by_shift.keys()):
+            shift_users = users_by_shift[shift_name]
+            supervisors = sorted([x for x in shift_users if x.role == "supervisor"], key=lambda y: (y.first_name or "", y.last_name or ""))
+            agents = sorted([x for x in shift_users if x.role == "agent"], key=lambda y: (y.first_name or "", y.last_name or ""))
+            for user in supervisors + agents:
+                i = payroll.row(user.id)
+                row = [sr, user.full_name, user.role.capitalize(), shift_name]
+                row += labels[i].tolist()
+                row += [
+                    int(presents[i]), int(lates[i]), int(absents[i]), int(offs[i]), int(totals[i]),
+                    round(float(payroll.salary[i]), 2),
+                    round(float(salary_from_days[i]), 2),
+                    round(float(bonuses[i]), 2),
+                    round(float(penalties[i]), 2),
+                    round(float(clearances[i]), 2),
+                    round(float(calculated[i]), 2),
+                ]
+                yield row
+                sr += 1
+            yield None  # shift separator
+
+    return header, rows()
+
+
+def write_attendance_report(fileobj, title, header, rows, progress=None):
+    """
+    Write the attendance sheet with a write-only workbook.
+
+    Rows are kept as plain values (no cell objects) while column widths are
+    measured, then streamed into the xlsx written to ``fileobj``.
+    ``progress(done, total)`` is called as data rows are written. Touches no
+    database, so it can run on a thread of its own.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    widths = [len(str(h)) if h else 0 for h in header]
+    buffered = []
+    for row in rows:
+        if row is not None:
+            for c, value in enumerate(row):
+                if value and len(str(value)) > widths[c]:
+                    widths[c] = len(str(value))
+        buffered.append(row)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+
+    # Widths and frozen panes must be set before the first row is written
+    for c, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(c)].width = width + 2
+    ws.freeze_panes = "E2"  # header row + first 4 columns
+
+    bold_font = Font(bold=True)
+    center_align = Alignment(horizontal="center", vertical="center")
+    header_cells = []
+    for value in header:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = bold_font
+        cell.alignment = center_align
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    black_fill = PatternFill(start_color="000000", end_color="000000", fill_type="solid")
+    total = sum(1 for row in buffered if row is not None)
+    done = 0
+    for row in buffered:
+        if row is None:
+            separator = []
+            for _ in header:
+                cell = WriteOnlyCell(ws, value="")
+                cell.fill = black_fill
+                separator.append(cell)
+            ws.append(separator)
+        else:
+            ws.append(row)
+            done += 1
+            if progress:
+                progress(done, total)
+
+    wb.save(fileobj)
@@ -0,0 +1,53 @@
+"""
+Cooperative psycopg2 under eventlet.
+
+psycopg2 talks to the server from C, so monkey patching does not reach it and
+every query blocks the whole hub: one slow report would stall all requests and
+Socket.IO heartbeats. Installing a wait callback switches psycopg2 to its
+asynchronous protocol and parks the calling green thread on the connection's
+socket until the server answers (the same approach as ``psycogreen``).
+"""
+
+
+def eventlet_wait_callback(conn, timeout=-1):
+    """psycopg2 wait callback that yields to the eventlet hub while waiting."""
+    from eventlet.hubs import trampoline
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            trampoline(conn.fileno(), read=True)
+        elif state == extensions.POLL_WRITE:
+            trampoline(conn.fileno(), write=True)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
+
+
+def running_under_eventlet():
+    """True once ``eventlet.monkey_patch()`` has run (main.py / gunicorn -k eventlet)."""
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched("socket")
+
+
+def enable_green_psycopg2():
+    """
+    Install the eventlet wait callback for every psycopg2 connection.
+    Returns True when it was installed.
+    """
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    extensions.set_wait_callback(eventlet_wait_callback)
+    return True
+
+
+def disable_green_psycopg2():
+    from psycopg2 import extensions
+    extensions.set_wait_callback(None)
@@ -0,0 +1,172 @@
+"""
+Broadcast audience rules and the per-user unread counter.
+
+``broadcast_unread`` keeps, per user, the number of unread broadcasts and a
+watermark (the highest broadcast id already counted). Reading the counter
+only counts broadcasts above the watermark, so the socket handshake no
+longer runs the full "not seen" anti-join on every page load. New
+broadcasts need no write at creation time; seen and deleted broadcasts
+decrement the counters they were part of (seen rows are written in
+batches by ``app.utils.seen_buffer``). Helpers run on the current
+session; the caller commits.
+"""
+from sqlalchemy import bindparam, case, false, func, or_, true, tuple_
+
+from app import db
+from app.models import Broadcast, BroadcastSeen, BroadcastUnread, User
+from app.utils.bulk import bulk_upsert
+
+
+def audience_filter(user):
+    """SQL condition for the broadcasts ``user`` is meant to receive."""
+    is_supervisor = (user.role or "").lower() == "supervisor"
+    rules = [Broadcast.target == "all"]
+    if is_supervisor:
+        rules.append(Broadcast.target == "supervisors")
+    if user.company_id:
+        # Supervisor "shift" broadcasts don't store their shift or agents; they
+        # only reach recipients live (company_shift_room / user rooms)
+        rules.append((Broadcast.target == "company") & (Broadcast.company_id == user.company_id))
+        if is_supervisor:
+            rules.append((Broadcast.target == "supervisors_company") & (Broadcast.company_id == user.company_id))
+    return or_(*rules)
+
+
+def recipients_filter(broadcast):
+    """SQL condition for the users ``broadcast`` is meant for (inverse of ``audience_filter``)."""
+    is_supervisor = func.lower(User.role) == "supervisor"
+    if broadcast.target == "all":
+        return true()
+    if broadcast.target == "supervisors":
+        return is_supervisor
+    if broadcast.company_id is None:
+        return false()
+    if broadcast.target == "company":
+        return User.company_id == broadcast.company_id
+    if broadcast.target == "supervisors_company":
+        return is_supervisor & (User.company_id == broadcast.company_id)
+    return false()
+
+
+def recipient_condition():
+    """``audience_filter`` as a condition between User and Broadcast rows."""
+    is_supervisor = func.lower(User.role) == "supervisor"
+    same_company = Broadcast.company_id == User.company_id
+    return or_(
+        Broadcast.target == "all",
+        (Broadcast.target == "supervisors") & is_supervisor,
+        (Broadcast.target == "company") & same_company,
+        (Broadcast.target == "supervisors_company") & is_supervisor & same_company,
+    )
+
+
+# Bump when the audience rules change, so stored counters are recounted
+AUDIENCE_RULES_VERSION = 2
+
+
+def audience_key(user):
+    return f"v{AUDIENCE_RULES_VERSION}:{(user.role or '').lower()}:{user.company_id or ''}"
+
+
+def _count_unread(user, after_id, up_to_id, ids=None):
+    seen_ids = db.session.query(BroadcastSeen.broadcast_id).filter(BroadcastSeen.user_id == user.id)
+    query = db.session.query(func.count(Broadcast.id)).filter(
+        Broadcast.id > after_id,
+        Broadcast.id <= up_to_id,
+        audience_filter(user),
+        ~Broadcast.id.in_(seen_ids),
+    )
+    if ids is not None:
+        query = query.filter(Broadcast.id.in_(ids))
+    return query.scalar()
+
+
+def unread_count(user, pending=()):
+    """
+    Number of unread broadcasts for ``user``.
+
+    Counts only broadcasts created since the last call; recounts from
+    scratch the first time and whenever the user's role or company changed.
+    ``pending`` are broadcast ids already marked seen but not written yet
+    (``seen_buffer.pending_seen``); they don't count as unread.
+    """
+    latest = db.session.query(func.max(Broadcast.id)).scalar() or 0
+    key = audience_key(user)
+    row = db.session.get(BroadcastUnread, user.id)
+    pending = list(pending)
+    not_written = _count_unread(user, 0, latest, ids=pending) if pending else 0
+
+    if row is None or row.audience_key != key:
+        count = _count_unread(user, 0, latest)
+        bulk_upsert(
+            BroadcastUnread,
+            [{"user_id": user.id, "unread_count": count, "last_broadcast_id": latest, "audience_key": key}],
+            ["user_id"],
+            ["unread_count", "last_broadcast_id", "audience_key"],
+        )
+        return max(count - not_written, 0)
+
+    if latest > row.last_broadcast_id:
+        added = _count_unread(user, row.last_broadcast_id, latest)
+        # Only advance from the watermark we counted from; a concurrent
+        # catch-up that got there first already added these broadcasts.
+        (
+            BroadcastUnread.query
+            .filter(BroadcastUnread.user_id == user.id, BroadcastUnread.last_broadcast_id == row.last_broadcast_id)
+            .update(
+                {
+                    BroadcastUnread.unread_count: BroadcastUnread.unread_count + added,
+                    BroadcastUnread.last_broadcast_id: latest,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.session.expire(row)
+    return max(row.unread_count - not_written, 0)
+
+
+def note_seen(pairs):
+    """
+    Decrement the counters for newly recorded seen rows, given as
+    (user_id, broadcast_id) pairs. Pairs outside the user's audience or
+    above their watermark weren't counted and are ignored.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return
+    decrements = (
+        db.session.query(BroadcastUnread.user_id, func.count(Broadcast.id))
+        .join(User, User.id == BroadcastUnread.user_id)
+        .join(Broadcast, Broadcast.id <= BroadcastUnread.last_broadcast_id)
+        .filter(tuple_(User.id, Broadcast.id).in_(pairs), recipient_condition())
+        .group_by(BroadcastUnread.user_id)
+        .all()
+    )
+    if not decrements:
+        return
+    table = BroadcastUnread.__table__
+    stmt = (
+        table.update()
+        .where(table.c.user_id == bindparam("uid"))
+        .values(unread_count=case(
+            (table.c.unread_count > bindparam("n"), table.c.unread_count - bindparam("n")),
+            else_=0,
+        ))
+    )
+    db.session.execute(stmt, [{"uid": uid, "n": n} for uid, n in decrements])
+
+
+def note_deleted(broadcast):
+    """Decrement the counters that include ``broadcast``; call before deleting it."""
+    recipient_ids = db.session.query(User.id).filter(recipients_filter(broadcast))
+    seen_by = db.session.query(BroadcastSeen.user_id).filter(BroadcastSeen.broadcast_id == broadcast.id)
+    (
+        BroadcastUnread.query
+        .filter(
+            BroadcastUnread.last_broadcast_id >= broadcast.id,
+            BroadcastUnread.unread_count > 0,
+            BroadcastUnread.user_id.in_(recipient_ids),
+            ~BroadcastUnread.user_id.in_(seen_by),
+        )
+        .update({BroadcastUnread.unread_count: BroadcastUnread.unread_count - 1}, synchronize_session=False)
+    )
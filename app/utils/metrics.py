@@ -0,0 +1,18 @@
+"""
+Process-local metrics registry.
+
+Modules register a callable returning a flat dict of numbers under a name;
+``collect()`` gathers every source into one snapshot for the admin metrics
+endpoint. Values are per process: with several workers each one reports
+its own.
+"""
+_sources = {}
+
+
+def register_metrics(name, source):
+    """Expose ``source()`` (-> {metric: number}) under ``name``."""
+    _sources[name] = source
+
+
+def collect():
+    return {name: source() for name, source in sorted(_sources.items())}
@@ -0,0 +1,134 @@
+"""
+N+1 query detector.
+
+Hooks the ORM's ``do_orm_execute`` event and counts lazy relationship loads
+per request, keyed by relationship (``Attendance.marker``, ``User.increments``
+...). Once one relationship has been lazy-loaded ``N_PLUS_ONE_THRESHOLD``
+times in the same request, the request is iterating rows and loading that
+relationship row by row. Fix it with ``joinedload``/``selectinload`` on the
+query that fetched the rows.
+
+What happens on detection is set by ``N_PLUS_ONE``:
+
+- ``"raise"``: raise ``NPlusOneError`` from the offending line (default when
+  ``app.testing``)
+- ``"log"``: log a warning once per relationship and request (default when
+  ``app.debug``)
+- ``"off"``: don't track (default otherwise)
+
+Outside a request (scripts, Socket.IO handlers) wrap the code in
+``detect_n_plus_one(mode)``.
+"""
+import os
+import threading
+import traceback
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.utils.metrics import register_metrics
+
+MODES = ("raise", "log", "off")
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_lock = threading.Lock()
+_stats = {"detections": 0}
+_session_hook = False
+
+
+class NPlusOneError(RuntimeError):
+    """A relationship was lazy-loaded row by row within one request."""
+
+
+class _Tracker:
+    __slots__ = ("mode", "threshold", "counts", "flagged")
+
+    def __init__(self, mode, threshold):
+        self.mode = mode
+        self.threshold = threshold
+        self.counts = {}
+        self.flagged = set()
+
+
+def _call_site():
+    """Innermost app frame outside this module, as ``path:line``."""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(_APP_DIR) and filename != os.path.abspath(__file__):
+            return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.lineno}"
+    return "unknown"
+
+
+def _on_orm_execute(orm_execute_state):
+    if not orm_execute_state.is_relationship_load or not has_app_context():
+        return
+    tracker = g.get("_nplusone")
+    if tracker is None:
+        return
+
+    key = str(orm_execute_state.loader_strategy_path[-1])
+    count = tracker.counts[key] = tracker.counts.get(key, 0) + 1
+    if count < tracker.threshold or key in tracker.flagged:
+        return
+
+    tracker.flagged.add(key)
+    with _lock:
+        _stats["detections"] += 1
+    where = request.endpoint if has_request_context() else None
+    message = f"N+1: {key} lazy-loaded {count} times in {where or 'this block'} (at {_call_site()})"
+    if tracker.mode == "raise":
+        raise NPlusOneError(message)
+    current_app.logger.warning(message)
+
+
+def _install_session_hook():
+    global _session_hook
+    if not _session_hook:
+        event.listen(Session, "do_orm_execute", _on_orm_execute)
+        _session_hook = True
+
+
+def detection_mode(app):
+    """The configured N_PLUS_ONE mode, or the default for ``app``."""
+    mode = (app.config.get("N_PLUS_ONE") or "").lower()
+    if mode in MODES:
+        return mode
+    if app.testing:
+        return "raise"
+    return "log" if app.debug else "off"
+
+
+@contextmanager
+def detect_n_plus_one(mode="raise", threshold=None):
+    """Track lazy loads inside the block (needs an app context)."""
+    _install_session_hook()
+    previous = g.pop("_nplusone", None)
+    if mode != "off":
+        g._nplusone = _Tracker(mode, threshold or current_app.config.get("N_PLUS_ONE_THRESHOLD", 3))
+    try:
+        yield
+    finally:
+        g.pop("_nplusone", None)
+        if previous is not None:
+            g._nplusone = previous
+
+
+def n_plus_one_stats():
+    with _lock:
+        return dict(_stats)
+
+
+def init_n_plus_one(app):
+    """Track lazy loads in every request of ``app`` unless the mode is "off"."""
+    _install_session_hook()
+
+    @app.before_request
+    def _start_n_plus_one():
+        mode = detection_mode(current_app)
+        if mode != "off":
+            g._nplusone = _Tracker(mode, current_app.config.get("N_PLUS_ONE_THRESHOLD", 3))
+
+
+register_metrics("n_plus_one", n_plus_one_stats)
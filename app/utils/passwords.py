@@ -0,0 +1,65 @@
+"""
+Password hashing off the eventlet hub.
+
+Werkzeug's KDF (scrypt by default) takes tens of milliseconds of CPU. Run
+in a request greenlet it stalls the whole hub, every other request and the
+Socket.IO heartbeats included, for the duration of each hash. Under eventlet
+the hash runs on eventlet's OS thread pool (``tpool``) instead. hashlib
+releases the GIL while it hashes, so the hub keeps serving in the meantime.
+
+At most ``PASSWORD_HASH_THREADS`` hashes run at once. At most
+``PASSWORD_HASH_QUEUE`` more may wait for a slot; beyond that
+``PasswordHasherBusy`` is raised instead of queueing without bound (the
+login page turns it into a "try again" message).
+Without eventlet the hash simply runs inline.
+"""
+import threading
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.utils.green_db import running_under_eventlet
+
+_state_lock = threading.Lock()
+_slots = None  # semaphore sized from PASSWORD_HASH_THREADS on first use
+_waiting = 0
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Too many password hashes are already waiting for a thread."""
+
+
+def _config(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def _offloaded(fn, *args):
+    global _slots, _waiting
+    if not running_under_eventlet() or not _config("PASSWORD_HASH_OFFLOAD", True):
+        return fn(*args)
+
+    from eventlet import tpool
+
+    with _state_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(_config("PASSWORD_HASH_THREADS", 4))
+        if _waiting >= _config("PASSWORD_HASH_QUEUE", 200):
+            raise PasswordHasherBusy("Too many password checks in progress.")
+        _waiting += 1
+    try:
+        _slots.acquire()
+    finally:
+        with _state_lock:
+            _waiting -= 1
+    try:
+        return tpool.execute(fn, *args)
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    return _offloaded(generate_password_hash, password)
+
+
+def verify_password(password_hash, password):
+    return _offloaded(check_password_hash, password_hash, password)
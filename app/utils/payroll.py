@@ -0,0 +1,371 @@
+"""
+Payroll engine shared by every salary report.
+
+Attendance for a group of users over a date window is loaded into compact
+NumPy arrays (users x days) so that the monthly counts and salary figures are
+computed with array operations instead of per-row Python loops.
+"""
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+from app.models import Attendance, Penalty, Clearance
+
+# Status codes double as priority: when a user has several marks on the same
+# day the lowest code wins (Present > Late > Off > Absent). 0 means unmarked.
+UNMARKED, PRESENT, LATE, OFF, ABSENT = 0, 1, 2, 3, 4
+STATUS_CODES = {"Present": PRESENT, "Late": LATE, "Off": OFF, "Absent": ABSENT}
+STATUS_LABELS = {UNMARKED: "", PRESENT: "P", LATE: "L", OFF: "Off", ABSENT: "A"}
+
+LATE_DEDUCTION = 400   # Rs. deducted for every late day
+PAID_ABSENCES = 4      # absences per month that are not deducted
+REPORT_MONTH_DAYS = 30  # per-day rate used by the monthly salary reports
+
+_NO_MARK = np.int8(127)
+
+
+def month_bounds(year, month):
+    """Return the first and last date of a month."""
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def _ordinals(values):
+    """Convert dates/datetimes to an int array of proleptic ordinals."""
+    return np.fromiter(
+        ((v.date() if isinstance(v, datetime) else v).toordinal() for v in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+
+
+class Payroll:
+    """
+    Attendance, bonus, penalty and clearance matrices for a set of users.
+
+    Rows follow ``user_ids`` (sorted), columns are consecutive days starting at
+    ``start``. Use ``month()`` to narrow the window before computing salaries.
+    """
+
+    def __init__(self, user_ids, salary, travel_allowance, start,
+                 status, bonus, attendance_penalty, penalty, clearance, num_days=None):
+        self.user_ids = user_ids
+        self.salary = salary
+        self.travel_allowance = travel_allowance
+        self.start = start
+        self.status = status
+        self.bonus = bonus
+        self.attendance_penalty = attendance_penalty
+        self.penalty = penalty
+        self.clearance = clearance
+        self.num_days = num_days or status.shape[1]
+
+    # --------------------------------------------------
+    # Construction
+    # --------------------------------------------------
+    @classmethod
+    def from_rows(cls, users, start, end, attendance=(), penalties=(), clearances=()):
+        """
+        Build the matrices from already fetched rows.
+
+        - users: objects with ``id``, ``salary`` and ``travel_allowance_amount``
+        - attendance: rows with ``user_id``, ``date``, ``status``, ``bonus``, ``penalty``
+        - penalties: rows with ``user_id``, ``created_at``, ``amount``
+        - clearances: rows with ``user_id``, ``date_added``, ``amount``
+        """
+        users = sorted(users, key=lambda u: u.id)
+        user_ids = np.array([u.id for u in users], dtype=np.int64)
+        salary = np.array([u.salary or 0.0 for u in users], dtype=np.float64)
+        travel = np.array([u.travel_allowance_amount or 0 for u in users], dtype=np.float64)
+
+        shape = (len(users), (end - start).days + 1)
+        origin = start.toordinal()
+
+        def locate(rows, when):
+            # Map (user_id, timestamp) pairs onto matrix coordinates, dropping
+            # anything that falls outside the users or the date window.
+            if not rows or not len(user_ids):
+                return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=bool)
+            uids = np.fromiter((r.user_id for r in rows), dtype=np.int64, count=len(rows))
+            cols = _ordinals([getattr(r, when) for r in rows]) - origin
+            idx = np.minimum(np.searchsorted(user_ids, uids), len(user_ids) - 1)
+            keep = (user_ids[idx] == uids) & (cols >= 0) & (cols < shape[1])
+            return idx[keep], cols[keep], keep
+
+        def amounts(rows, attr, keep):
+            values = np.fromiter((getattr(r, attr) or 0.0 for r in rows), dtype=np.float64, count=len(rows))
+            return values[keep]
+
+        attendance = list(attendance)
+        status = np.full(shape, _NO_MARK, dtype=np.int8)
+        bonus = np.zeros(shape)
+        attendance_penalty = np.zeros(shape)
+        rows, cols, keep = locate(attendance, "date")
+        if len(rows):
+            codes = np.fromiter(
+                (STATUS_CODES.get(a.status, _NO_MARK) for a in attendance),
+                dtype=np.int8, count=len(attendance),
+            )[keep]
+            np.minimum.at(status, (rows, cols), codes)
+            np.add.at(bonus, (rows, cols), amounts(attendance, "bonus", keep))
+            np.add.at(attendance_penalty, (rows, cols), amounts(attendance, "penalty", keep))
+        status[status == _NO_MARK] = UNMARKED
+
+        penalties = list(penalties)
+        penalty = np.zeros(shape)
+        rows, cols, keep = locate(penalties, "created_at")
+        if len(rows):
+            np.add.at(penalty, (rows, cols), amounts(penalties, "amount", keep))
+
+        clearances = list(clearances)
+        clearance = np.zeros(shape)
+        rows, cols, keep = locate(clearances, "date_added")
+        if len(rows):
+            np.add.at(clearance, (rows, cols), amounts(clearances, "amount", keep))
+
+        return cls(user_ids, salary, travel, start, status, bonus,
+                   attendance_penalty, penalty, clearance)
+
+    def month(self, year, month):
+        """Return a view of the payroll narrowed to one calendar month."""
+        first, last = month_bounds(year, month)
+        lo = max((first - self.start).days, 0)
+        hi = max((last - self.start).days + 1, 0)
+        window = slice(lo, hi)
+        return Payroll(
+            self.user_ids, self.salary, self.travel_allowance,
+            self.start + timedelta(days=lo),
+            self.status[:, window], self.bonus[:, window],
+            self.attendance_penalty[:, window], self.penalty[:, window],
+            self.clearance[:, window], num_days=last.day,
+        )
+
+    def months(self):
+        """(year, month) pairs that contain at least one attendance mark, oldest first."""
+        marked_days = np.flatnonzero(self.marked.any(axis=0))
+        seen = []
+        for offset in marked_days.tolist():
+            d = self.start + timedelta(days=offset)
+            if not seen or seen[-1] != (d.year, d.month):
+                seen.append((d.year, d.month))
+        return seen
+
+    def row(self, user_id):
+        """Matrix row of a user id."""
+        return int(np.searchsorted(self.user_ids, user_id))
+
+    # --------------------------------------------------
+    # Attendance counts
+    # --------------------------------------------------
+    @property
+    def marked(self):
+        return self.status != UNMARKED
+
+    @property
+    def presents(self):
+        return (self.status == PRESENT).sum(axis=1)
+
+    @property
+    def lates(self):
+        return (self.status == LATE).sum(axis=1)
+
+    @property
+    def offs(self):
+        return (self.status == OFF).sum(axis=1)
+
+    @property
+    def absents(self):
+        return (self.status == ABSENT).sum(axis=1)
+
+    @property
+    def totals(self):
+        return self.presents + self.lates + self.offs + self.absents
+
+    def status_labels(self):
+        """Short status labels (P/L/Off/A) for every user and day."""
+        labels = np.array([STATUS_LABELS[c] for c in range(ABSENT + 1)], dtype=object)
+        return labels[self.status]
+
+    # --------------------------------------------------
+    # Attendance sheet (admin Excel export)
+    # --------------------------------------------------
+    @property
+    def per_day_salary(self):
+        return self.salary / self.num_days
+
+    def salary_from_days(self):
+        """Presents and offs are paid a full day, lates a day minus the late deduction."""
+        per_day = self.per_day_salary
+        return (
+            self.presents * per_day
+            + self.lates * (per_day - LATE_DEDUCTION)
+            + self.offs * per_day
+        )
+
+    def sheet_bonus(self):
+        return self.bonus.sum(axis=1)
+
+    def sheet_penalty(self):
+        """Penalties stored on attendance rows plus penalties added during the month."""
+        return self.attendance_penalty.sum(axis=1) + self.penalty.sum(axis=1)
+
+    def sheet_clearance(self):
+        return self.clearance.sum(axis=1)
+
+    def sheet_salary(self):
+        return (
+            self.salary_from_days()
+            + self.sheet_bonus()
+            - self.sheet_penalty()
+            + self.sheet_clearance()
+        )
+
+    # --------------------------------------------------
+    # Monthly salary report (agent / supervisor reports)
+    # --------------------------------------------------
+    def report_penalty(self):
+        """Penalties that fall on a day the user has an attendance mark."""
+        return np.where(self.marked, self.penalty, 0.0).sum(axis=1)
+
+    def report_salary(self):
+        """Base salary + allowance + bonuses, minus penalties, lates and unpaid absences."""
+        unpaid_absences = np.maximum(self.absents - PAID_ABSENCES, 0)
+        return (
+            self.salary
+            + self.travel_allowance
+            + self.bonus.sum(axis=1)
+            - self.report_penalty()
+            - self.lates * LATE_DEDUCTION
+            - unpaid_absences * (self.salary / REPORT_MONTH_DAYS)
+        )
+
+
+def load_payroll(users, start, end):
+    """
+    Load attendance, penalties and clearances for ``users`` between ``start``
+    and ``end`` (inclusive dates) as a Payroll. Only the needed columns are
+    fetched, never full ORM objects.
+    """
+    user_ids = [u.id for u in users] or [0]
+    range_start = datetime.combine(start, time.min)
+    range_end = datetime.combine(end + timedelta(days=1), time.min)
+
+    attendance = (
+        Attendance.query
+        .with_entities(Attendance.user_id, Attendance.date, Attendance.status,
+                       Attendance.bonus, Attendance.penalty)
+        .filter(Attendance.user_id.in_(user_ids))
+        .filter(Attendance.date >= start, Attendance.date <= end)
+        .all()
+    )
+    penalties = (
+        Penalty.query
+        .with_entities(Penalty.user_id, Penalty.created_at, Penalty.amount)
+        .filter(Penalty.user_id.in_(user_ids))
+        .filter(Penalty.created_at >= range_start, Penalty.created_at < range_end)
+        .all()
+    )
+    clearances = (
+        Clearance.query
+        .with_entities(Clearance.user_id, Clearance.date_added, Clearance.amount)
+        .filter(Clearance.user_id.in_(user_ids))
+        .filter(Clearance.date_added >= range_start, Clearance.date_added < range_end)
+        .all()
+    )
+    return Payroll.from_rows(users, start, end, attendance, penalties, clearances)
+
+
+def load_month(users, year, month):
+    """Load a company-month (or any group of users) for one calendar month."""
+    first, last = month_bounds(year, month)
+    return load_payroll(users, first, last).month(year, month)
+
+
+def monthly_salary_reports(user):
+    """
+    Month-by-month attendance and salary report for one user.
+
+    Returns ``(monthly_reports, totals)`` as rendered by the agent and
+    supervisor report pages; ``totals`` holds the most recent month.
+    """
+    from collections import defaultdict
+    from calendar import month_name
+    from sqlalchemy.orm import joinedload
+
+    totals = {
+        "total_presents": 0,
+        "total_lates": 0,
+        "total_offs": 0,
+        "total_absents": 0,
+        "total_bonus": 0,
+        "total_penalty": 0,
+        "final_salary": 0
+    }
+
+    records = (
+        Attendance.query
+        .options(joinedload(Attendance.marker))
+        .filter_by(user_id=user.id)
+        .order_by(Attendance.date.asc(), Attendance.id.asc())
+        .all()
+    )
+    if not records:
+        return [], totals
+
+    penalties = (
+        Penalty.query
+        .options(joinedload(Penalty.marker))
+        .filter_by(user_id=user.id)
+        .order_by(Penalty.created_at.desc())
+        .all()
+    )
+
+    first = month_bounds(records[0].date.year, records[0].date.month)[0]
+    last = month_bounds(records[-1].date.year, records[-1].date.month)[1]
+    payroll = Payroll.from_rows([user], first, last, records, penalties)
+
+    # Penalties are shown against the attendance row of the same date
+    penalties_by_date = defaultdict(list)
+    for p in penalties:
+        penalties_by_date[p.created_at.date()].append(p)
+
+    grouped = defaultdict(list)
+    for r in records:
+        same_day_penalties = penalties_by_date.get(r.date, [])
+        grouped[(r.date.year, r.date.month)].append({
+            "date": r.date,
+            "status": r.status,
+            "bonus": r.bonus,
+            "marker": r.marker,
+            "penalty": sum(p.amount for p in same_day_penalties),
+            "penalty_details": [
+                {
+                    "amount": p.amount,
+                    "reason": p.reason,
+                    "added_by": f"{p.marker.first_name} {p.marker.last_name}" if p.marker else "Unknown"
+                }
+                for p in same_day_penalties
+            ],
+        })
+
+    monthly_reports = []
+    for year, month in sorted(grouped):
+        window = payroll.month(year, month)
+        summary = {
+            "total_presents": int(window.presents[0]),
+            "total_lates": int(window.lates[0]),
+            "total_offs": int(window.offs[0]),
+            "total_absents": int(window.absents[0]),
+            "total_bonus": float(window.bonus.sum()),
+            "total_penalty": float(window.report_penalty()[0]),
+            "final_salary": float(window.report_salary()[0]),
+        }
+        monthly_reports.append({
+            "month_name": f"{month_name[month]} {year}",
+            **summary,
+            "final_salary": round(summary["final_salary"], 2),
+            "daily_records": grouped[(year, month)],
+        })
+        totals.update(summary)
+
+    return monthly_reports, totals
@@ -0,0 +1,229 @@
+"""
+Per-request profiling.
+
+``init_profiling(app)`` (called from ``create_app``) measures every request:
+
+- wall time
+- SQL statement count and SQL time, from SQLAlchemy engine events
+- rows written, from the DB-API ``cursor.rowcount`` of INSERT/UPDATE/DELETE
+  statements (drivers don't report rows read by a SELECT consistently)
+- template render time, from Flask's template signals
+
+Each request writes one JSON line to ``ACCESS_LOG`` (default
+``logs/access.log``) and adds a sample to a rolling window of the last
+``PROFILE_WINDOW`` requests per endpoint. The admin ``/admin/metrics`` page
+and the Prometheus endpoint read their percentiles from that window.
+Windows are per process: with several workers, each reports its own.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+FIELDS = ("wall_ms", "sql_count", "sql_ms", "rows_written", "template_ms")
+QUANTILES = (0.5, 0.95, 0.99)
+
+_windows = {}  # endpoint -> deque of sample tuples (FIELDS order)
+_totals = {}  # endpoint -> [count, *sums in FIELDS order]
+_lock = threading.Lock()
+_window_size = 500
+_engine_hooks = False
+
+access_logger = logging.getLogger("officeconnect.access")
+
+
+# ==========================================================
+# Collection
+# ==========================================================
+def _profile():
+    return g.get("_profile") if has_request_context() else None
+
+
+# The start time lives on the statement's execution context, so a statement
+# that raises (and never reaches after_cursor_execute) leaves nothing behind
+# on the pooled connection.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_profile_started", None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    profile = _profile()
+    if profile is None:
+        return
+    profile["sql_count"] += 1
+    profile["sql_ms"] += elapsed * 1000
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete) and cursor.rowcount > 0:
+        profile["rows_written"] += cursor.rowcount
+
+
+def _before_render(app, template, context, **extra):
+    profile = _profile()
+    if profile is not None:
+        profile["_template_started"].append(time.perf_counter())
+
+
+def _after_render(app, template, context, **extra):
+    profile = _profile()
+    if profile is not None and profile["_template_started"]:
+        profile["template_ms"] += (time.perf_counter() - profile["_template_started"].pop()) * 1000
+
+
+def _start_request():
+    g._profile = {
+        "started": time.perf_counter(),
+        "sql_count": 0, "sql_ms": 0.0, "rows_written": 0, "template_ms": 0.0,
+        "_template_started": [],
+    }
+
+
+def _finish_request(response):
+    profile = g.pop("_profile", None)
+    if profile is None:
+        return response
+
+    endpoint = request.endpoint or "<unmatched>"
+    sample = (
+        (time.perf_counter() - profile["started"]) * 1000,
+        profile["sql_count"], profile["sql_ms"], profile["rows_written"], profile["template_ms"],
+    )
+    record(endpoint, sample)
+
+    user_id = current_user.get_id() if getattr(current_user, "is_authenticated", False) else None
+    access_logger.info(json.dumps({
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "method": request.method,
+        "path": request.path,
+        "endpoint": endpoint,
+        "status": response.status_code,
+        "user_id": user_id,
+        **{name: round(value, 2) if isinstance(value, float) else value for name, value in zip(FIELDS, sample)},
+    }))
+    return response
+
+
+def record(endpoint, sample):
+    with _lock:
+        window = _windows.get(endpoint)
+        if window is None:
+            window = _windows[endpoint] = deque(maxlen=_window_size)
+            _totals[endpoint] = [0] + [0.0] * len(FIELDS)
+        window.append(sample)
+        totals = _totals[endpoint]
+        totals[0] += 1
+        for i, value in enumerate(sample, start=1):
+            totals[i] += value
+
+
+# ==========================================================
+# Reporting
+# ==========================================================
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (q in 0..1)."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))]
+
+
+def endpoint_stats():
+    """
+    {endpoint: {"count": n, "window": k, "<field>": {"p50": .., "p95": .., "p99": .., "sum": ..}}}
+    with percentiles over the rolling window and counts/sums since start.
+    """
+    with _lock:
+        snapshot = {endpoint: (list(window), list(_totals[endpoint])) for endpoint, window in _windows.items()}
+
+    stats = {}
+    for endpoint, (samples, totals) in sorted(snapshot.items()):
+        entry = {"count": totals[0], "window": len(samples)}
+        for i, name in enumerate(FIELDS):
+            values = [sample[i] for sample in samples]
+            entry[name] = {f"p{int(q * 100)}": round(percentile(values, q), 2) for q in QUANTILES}
+            entry[name]["sum"] = round(totals[i + 1], 2)
+        stats[endpoint] = entry
+    return stats
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(extra_metrics=None):
+    """
+    Prometheus text exposition of the endpoint summaries, plus the flat
+    ``{source: {metric: number}}`` dict from ``app.utils.metrics.collect``
+    as gauges.
+    """
+    metrics = {
+        "wall_ms": ("officeconnect_request_duration_seconds", 0.001, "Request wall time."),
+        "sql_count": ("officeconnect_request_sql_queries", 1, "SQL statements per request."),
+        "sql_ms": ("officeconnect_request_sql_duration_seconds", 0.001, "SQL time per request."),
+        "rows_written": ("officeconnect_request_sql_rows_written", 1, "Rows inserted, updated or deleted per request."),
+        "template_ms": ("officeconnect_request_template_seconds", 0.001, "Template render time per request."),
+    }
+    stats = endpoint_stats()
+    lines = []
+    for field, (name, scale, help_text) in metrics.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} summary")
+        for endpoint, entry in stats.items():
+            label = f'endpoint="{_label(endpoint)}"'
+            for q in QUANTILES:
+                value = entry[field][f"p{int(q * 100)}"] * scale
+                lines.append(f'{name}{{{label},quantile="{q}"}} {value:.6g}')
+            lines.append(f"{name}_sum{{{label}}} {entry[field]['sum'] * scale:.6g}")
+            lines.append(f"{name}_count{{{label}}} {entry['count']}")
+
+    for source, values in (extra_metrics or {}).items():
+        for metric, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"officeconnect_{source}_{metric}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value:.6g}")
+    return "\n".join(lines) + "\n"
+
+
+# ==========================================================
+# Setup
+# ==========================================================
+def _configure_access_log(path):
+    if path is None or any(getattr(h, "_profiling", False) for h in access_logger.handlers):
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler._profiling = True
+    access_logger.addHandler(handler)
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+
+
+def init_profiling(app):
+    """Register the profiling hooks on ``app`` (no-op when PROFILING is off)."""
+    global _engine_hooks, _window_size
+    if not app.config.get("PROFILING", True):
+        return
+
+    _window_size = app.config.get("PROFILE_WINDOW", 500)
+    _configure_access_log(app.config.get("ACCESS_LOG"))
+
+    if not _engine_hooks:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _engine_hooks = True
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,152 @@
+"""
+Query-plan regression checks for the report queries.
+
+Each entry in ``REPORT_QUERIES`` builds one of the hot report queries. The
+``check_query_plans`` runner EXPLAINs them against the configured database and
+reports any sequential scan over the large tables. On PostgreSQL sequential
+scans are disabled for the check, so a ``Seq Scan`` in the plan means no usable
+index exists, whatever the table size.
+"""
+from datetime import date, datetime, time, timedelta
+
+from app import db
+from app.models import (
+    Attendance, AttendanceMonthlySummary, BroadcastSeen, Clearance, Increment, Penalty, User,
+)
+
+HOT_TABLES = {
+    "attendance", "penalties", "clearances", "increments",
+    "broadcast_seen", "attendance_monthly_summary",
+}
+
+
+def _sample_window():
+    today = date.today()
+    first = today.replace(day=1)
+    return first, today, datetime.combine(first, time.min), datetime.combine(today + timedelta(days=1), time.min)
+
+
+def _sample_user_ids():
+    ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id).limit(50)]
+    return ids or [1]
+
+
+def _sample_company_id():
+    return db.session.query(User.company_id).filter(User.company_id.isnot(None)).limit(1).scalar() or 1
+
+
+def _sample_broadcast_id():
+    return db.session.query(BroadcastSeen.broadcast_id).limit(1).scalar() or 1
+
+
+# name -> callable returning a Query
+REPORT_QUERIES = {
+    "attendance by users and month": lambda: (
+        Attendance.query
+        .filter(Attendance.user_id.in_(_sample_user_ids()))
+        .filter(Attendance.date >= _sample_window()[0], Attendance.date <= _sample_window()[1])
+    ),
+    "attendance of one day": lambda: (
+        Attendance.query
+        .filter(Attendance.date == date.today(), Attendance.user_id.in_(_sample_user_ids()))
+    ),
+    "admin attendance page by company and month": lambda: (
+        Attendance.query
+        .join(User, Attendance.user_id == User.id)
+        .filter(User.company_id == _sample_company_id())
+        .filter(Attendance.date >= _sample_window()[0], Attendance.date <= _sample_window()[1])
+        .order_by(Attendance.date.desc(), Attendance.id.desc())
+        .limit(101)
+    ),
+    "penalties by users and month": lambda: (
+        Penalty.query
+        .filter(Penalty.user_id.in_(_sample_user_ids()))
+        .filter(Penalty.created_at >= _sample_window()[2], Penalty.created_at < _sample_window()[3])
+    ),
+    "clearances by users and month": lambda: (
+        Clearance.query
+        .filter(Clearance.user_id.in_(_sample_user_ids()))
+        .filter(Clearance.date_added >= _sample_window()[2], Clearance.date_added < _sample_window()[3])
+    ),
+    "increment history": lambda: (
+        Increment.query
+        .filter_by(user_id=_sample_user_ids()[0])
+        .order_by(Increment.date_added.desc())
+    ),
+    "broadcast viewers": lambda: (
+        BroadcastSeen.query
+        .filter_by(broadcast_id=_sample_broadcast_id())
+        .order_by(BroadcastSeen.seen_at.desc())
+    ),
+    "monthly summary by users": lambda: (
+        AttendanceMonthlySummary.query
+        .filter(AttendanceMonthlySummary.user_id.in_(_sample_user_ids()))
+        .filter(AttendanceMonthlySummary.year == date.today().year,
+                AttendanceMonthlySummary.month == date.today().month)
+    ),
+}
+
+
+def explain(query):
+    """Return the plan of a Query as a list of (table, step) pairs."""
+    conn = db.session.connection()
+    dialect = conn.dialect
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    sql = str(compiled)
+    if compiled.positiontup:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    if dialect.name == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        try:
+            plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql, params).scalar()
+        finally:
+            conn.exec_driver_sql("RESET enable_seqscan")
+        steps = []
+
+        def walk(node):
+            steps.append((node.get("Relation Name"), node["Node Type"]))
+            for child in node.get("Plans", []):
+                walk(child)
+
+        walk(plan[0]["Plan"])
+        return steps
+
+    if dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        steps = []
+        for row in rows:
+            detail = row[-1]
+            words = detail.split()
+            table = words[1] if len(words) > 1 and words[0] in ("SCAN", "SEARCH") else None
+            steps.append((table, detail))
+        return steps
+
+    raise RuntimeError(f"Query plans are not supported on {dialect.name}.")
+
+
+def is_sequential(step):
+    table, detail = step
+    if table not in HOT_TABLES:
+        return False
+    # PostgreSQL node type, or an SQLite full table scan ("SCAN t USING
+    # [COVERING] INDEX ix" walks an index in order and isn't one)
+    if detail == "Seq Scan":
+        return True
+    return detail.startswith("SCAN ") and "USING INDEX" not in detail and "USING COVERING INDEX" not in detail
+
+
+def check_query_plans(queries=None):
+    """
+    EXPLAIN every report query. Returns ``{name: [offending steps]}`` for the
+    queries that fall back to a sequential scan (empty when all pass).
+    """
+    failures = {}
+    for name, build in (queries or REPORT_QUERIES).items():
+        offending = [step for step in explain(build()) if is_sequential(step)]
+        if offending:
+            failures[name] = offending
+    db.session.rollback()
+    return failures
@@ -0,0 +1,266 @@
+"""
+Maintenance of the attendance_monthly_summary rollup.
+
+Write paths (mark attendance, penalties, clearances) call
+``refresh_monthly_summary`` before committing so the rollup changes in the
+same transaction as the raw rows. Dashboards read the rollup instead of
+counting raw Attendance rows; ``team_totals`` serves per-user totals from
+it, or from one grouped query over the raw rows for an arbitrary date window.
+"""
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import case, extract, func, select
+
+from app import db
+from app.models import Attendance, AttendanceMonthlySummary, Clearance, Penalty, User
+from app.utils.payroll import month_bounds
+
+
+def _status_count(status):
+    return func.coalesce(func.sum(case((Attendance.status == status, 1), else_=0)), 0)
+
+
+def _attendance_totals(*filters, group_by=()):
+    return (
+        db.session.query(
+            *group_by,
+            _status_count("Present").label("presents"),
+            _status_count("Late").label("lates"),
+            _status_count("Absent").label("absents"),
+            _status_count("Off").label("offs"),
+            func.coalesce(func.sum(Attendance.bonus), 0).label("bonuses"),
+            func.coalesce(func.sum(Attendance.penalty), 0).label("penalties"),
+        )
+        .filter(*filters)
+        .group_by(*group_by)
+        .all()
+    )
+
+
+def _amount_totals(amount, *filters, group_by=()):
+    return (
+        db.session.query(*group_by, func.coalesce(func.sum(amount), 0).label("total"))
+        .filter(*filters)
+        .group_by(*group_by)
+        .all()
+    )
+
+
+def refresh_monthly_summary(user_ids, year, month):
+    """
+    Recompute the summary rows of ``user_ids`` for one month from the raw
+    tables. ``penalties`` is the per-day ``Attendance.penalty`` plus the
+    Penalty rows created that month, the total the salary pages deduct.
+    Pending changes are flushed first; the caller commits.
+    """
+    user_ids = sorted({int(uid) for uid in user_ids})
+    if not user_ids:
+        return {}
+
+    db.session.flush()
+
+    first, last = month_bounds(year, month)
+    range_start = datetime.combine(first, time.min)
+    range_end = datetime.combine(last + timedelta(days=1), time.min)
+
+    attendance = {
+        row.user_id: row
+        for row in _attendance_totals(
+            Attendance.user_id.in_(user_ids),
+            Attendance.date >= first,
+            Attendance.date <= last,
+            group_by=(Attendance.user_id,),
+        )
+    }
+    penalties = dict(_amount_totals(
+        Penalty.amount,
+        Penalty.user_id.in_(user_ids),
+        Penalty.created_at >= range_start,
+        Penalty.created_at < range_end,
+        group_by=(Penalty.user_id,),
+    ))
+    clearances = dict(_amount_totals(
+        Clearance.amount,
+        Clearance.user_id.in_(user_ids),
+        Clearance.date_added >= range_start,
+        Clearance.date_added < range_end,
+        group_by=(Clearance.user_id,),
+    ))
+
+    existing = {
+        s.user_id: s
+        for s in AttendanceMonthlySummary.query.filter(
+            AttendanceMonthlySummary.user_id.in_(user_ids),
+            AttendanceMonthlySummary.year == year,
+            AttendanceMonthlySummary.month == month,
+        )
+    }
+
+    summaries = {}
+    for uid in user_ids:
+        summary = existing.get(uid)
+        if summary is None:
+            summary = AttendanceMonthlySummary(user_id=uid, year=year, month=month)
+            db.session.add(summary)
+
+        counts = attendance.get(uid)
+        summary.presents = int(counts.presents) if counts else 0
+        summary.lates = int(counts.lates) if counts else 0
+        summary.absents = int(counts.absents) if counts else 0
+        summary.offs = int(counts.offs) if counts else 0
+        summary.bonuses = float(counts.bonuses) if counts else 0.0
+        summary.penalties = (float(counts.penalties) if counts else 0.0) + float(penalties.get(uid, 0))
+        summary.clearances = float(clearances.get(uid, 0))
+        summaries[uid] = summary
+
+    return summaries
+
+
+def refresh_monthly_summary_for(user_id, when):
+    """Refresh one user's summary for the month containing ``when`` (date or datetime)."""
+    when = when or datetime.utcnow()
+    return refresh_monthly_summary([user_id], when.year, when.month).get(int(user_id))
+
+
+def rebuild_monthly_summaries():
+    """
+    Rebuild the whole rollup from history. Used by the backfill command;
+    returns the number of summary rows written.
+    """
+    keyed = {}
+
+    def entry(uid, year, month):
+        key = (int(uid), int(year), int(month))
+        if key not in keyed:
+            keyed[key] = dict(
+                user_id=key[0], year=key[1], month=key[2],
+                presents=0, lates=0, absents=0, offs=0,
+                bonuses=0.0, penalties=0.0, clearances=0.0,
+            )
+        return keyed[key]
+
+    att_year = extract('year', Attendance.date)
+    att_month = extract('month', Attendance.date)
+    for row in _attendance_totals(group_by=(Attendance.user_id, att_year, att_month)):
+        e = entry(*row[:3])
+        e.update(
+            presents=int(row.presents), lates=int(row.lates),
+            absents=int(row.absents), offs=int(row.offs),
+            bonuses=float(row.bonuses),
+        )
+        e["penalties"] += float(row.penalties)
+
+    pen_year = extract('year', Penalty.created_at)
+    pen_month = extract('month', Penalty.created_at)
+    for uid, year, month, total in _amount_totals(
+        Penalty.amount,
+        group_by=(Penalty.user_id, pen_year, pen_month),
+    ):
+        entry(uid, year, month)["penalties"] += float(total)
+
+    clr_year = extract('year', Clearance.date_added)
+    clr_month = extract('month', Clearance.date_added)
+    for uid, year, month, total in _amount_totals(
+        Clearance.amount,
+        group_by=(Clearance.user_id, clr_year, clr_month),
+    ):
+        entry(uid, year, month)["clearances"] += float(total)
+
+    AttendanceMonthlySummary.query.delete()
+    if keyed:
+        db.session.bulk_insert_mappings(AttendanceMonthlySummary, list(keyed.values()))
+    db.session.commit()
+    return len(keyed)
+
+
+# ==========================================================
+# Per-user totals for team pages
+# ==========================================================
+TEAM_TOTALS = ("presents", "lates", "offs", "absents", "bonuses", "penalties")
+
+
+def _status_filter_count(status):
+    return func.count().filter(Attendance.status == status)
+
+
+def team_totals(*user_filters, start=None, end=None):
+    """
+    ``[(user, {presents, lates, offs, absents, bonuses, penalties})]`` for the
+    users matching ``user_filters``, ordered by id, in one statement.
+
+    Without a window the totals are summed from the monthly rollup (whole
+    history). With ``start``/``end`` (dates, inclusive) attendance is counted
+    from the raw rows with ``COUNT(*) FILTER (WHERE status = ...)`` grouped
+    by user, and penalties created in the window are added, as the rollup
+    does.
+    """
+    team_ids = select(User.id).where(*user_filters)
+
+    if start is None and end is None:
+        S = AttendanceMonthlySummary
+        totals = (
+            select(
+                S.user_id,
+                func.sum(S.presents).label("presents"),
+                func.sum(S.lates).label("lates"),
+                func.sum(S.offs).label("offs"),
+                func.sum(S.absents).label("absents"),
+                func.sum(S.bonuses).label("bonuses"),
+                func.sum(S.penalties).label("penalties"),
+            )
+            .where(S.user_id.in_(team_ids))
+            .group_by(S.user_id)
+            .subquery()
+        )
+        columns = [totals.c[name] for name in TEAM_TOTALS]
+        query = db.session.query(User, *columns).outerjoin(totals, totals.c.user_id == User.id)
+    else:
+        window = [Attendance.user_id.in_(team_ids)]
+        penalty_window = [Penalty.user_id.in_(team_ids)]
+        if start is not None:
+            window.append(Attendance.date >= start)
+            penalty_window.append(Penalty.created_at >= datetime.combine(start, time.min))
+        if end is not None:
+            window.append(Attendance.date <= end)
+            penalty_window.append(Penalty.created_at < datetime.combine(end + timedelta(days=1), time.min))
+
+        counts = (
+            select(
+                Attendance.user_id,
+                _status_filter_count("Present").label("presents"),
+                _status_filter_count("Late").label("lates"),
+                _status_filter_count("Off").label("offs"),
+                _status_filter_count("Absent").label("absents"),
+                func.sum(Attendance.bonus).label("bonuses"),
+                func.sum(Attendance.penalty).label("penalties"),
+            )
+            .where(*window)
+            .group_by(Attendance.user_id)
+            .subquery()
+        )
+        penalties = (
+            select(Penalty.user_id, func.sum(Penalty.amount).label("amount"))
+            .where(*penalty_window)
+            .group_by(Penalty.user_id)
+            .subquery()
+        )
+        columns = [counts.c[name] for name in TEAM_TOTALS[:-1]] + [
+            func.coalesce(counts.c.penalties, 0) + func.coalesce(penalties.c.amount, 0),
+        ]
+        query = (
+            db.session.query(User, *columns)
+            .outerjoin(counts, counts.c.user_id == User.id)
+            .outerjoin(penalties, penalties.c.user_id == User.id)
+        )
+
+    rows = query.filter(*user_filters).order_by(User.id).all()
+    return [
+        (
+            user,
+            {
+                name: (float(value or 0) if name in ("bonuses", "penalties") else int(value or 0))
+                for name, value in zip(TEAM_TOTALS, values)
+            },
+        )
+        for user, *values in rows
+    ]
@@ -0,0 +1,220 @@
+"""
+Synthetic data for benchmarks (``flask seed``).
+
+Generates companies, users across the three shifts, ``days`` of attendance
+per user, and the penalties, clearances, increments, broadcasts and seen
+rows that go with them. Everything comes from one ``random.Random(seed)``
+drawn in a fixed order, so the same arguments produce the same rows
+(``end_date`` pins the calendar; by default the data ends today). New rows
+are appended after the highest existing ids. The tables are loaded with
+``bulk_copy`` (COPY on PostgreSQL), so tens of millions of attendance rows
+take minutes: ``--companies 100 --users 300 --days 365`` is about 11M.
+
+Seeded users share the password ``SEED_PASSWORD``.
+"""
+import hashlib
+import random
+import string
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, text
+
+from app import db
+from app.models import (
+    Attendance, Broadcast, BroadcastSeen, Clearance, Company, Increment, Penalty, User,
+)
+from app.utils.bulk import bulk_copy
+from app.utils.rollups import rebuild_monthly_summaries
+
+SEED_PASSWORD = "Seed@1234"
+
+SHIFTS = (("morning", 0.5, time(9, 0)), ("evening", 0.3, time(17, 0)), ("night", 0.2, time(1, 0)))
+STATUS_WEIGHTS = (("Present", 0.84), ("Late", 0.08), ("Absent", 0.04), ("Off", 0.04))
+
+FIRST_NAMES = (
+    "Ali", "Ahmed", "Sara", "Ayesha", "Usman", "Fatima", "Hassan", "Zainab", "Bilal", "Hina",
+    "Omar", "Maryam", "Hamza", "Sana", "Imran", "Nida", "Faisal", "Amna", "Kamran", "Rabia",
+)
+LAST_NAMES = (
+    "Khan", "Ahmed", "Malik", "Hussain", "Sheikh", "Butt", "Qureshi", "Chaudhry", "Raza", "Iqbal",
+    "Javed", "Siddiqui", "Abbasi", "Mirza", "Baig", "Akhtar",
+)
+BROADCAST_MESSAGES = (
+    "Team meeting at the start of the shift.",
+    "Please update your profile details before the end of the week.",
+    "Salaries for this month have been processed.",
+    "Reminder: late arrivals are penalised as per policy.",
+    "Great work on last week's targets, keep it up!",
+    "The office will be closed on the upcoming public holiday.",
+)
+
+
+def _password_hash(rng):
+    """Werkzeug-compatible pbkdf2 hash of SEED_PASSWORD with a seeded salt."""
+    iterations = 600_000
+    salt = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(16))
+    digest = hashlib.pbkdf2_hmac("sha256", SEED_PASSWORD.encode(), salt.encode(), iterations).hex()
+    return f"pbkdf2:sha256:{iterations}${salt}${digest}"
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _sync_sequence(model):
+    """Move a PostgreSQL id sequence past ids that were inserted explicitly."""
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+    table = model.__tablename__
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+    ))
+
+
+def _at(day, clock, minutes=0):
+    return datetime.combine(day, clock) + timedelta(minutes=minutes)
+
+
+def seed_data(companies=5, users_per_company=40, days=60, seed=1, end_date=None, progress=None):
+    """Generate the dataset and commit it; returns {table: rows written}."""
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+    dates = [start_date + timedelta(days=d) for d in range(days)]
+    created_at = datetime.combine(start_date, time(8, 0))
+    password_hash = _password_hash(rng)
+    progress = progress or (lambda table, count: None)
+    counts = {}
+
+    def copy(model, columns, rows):
+        counts[model.__tablename__] = bulk_copy(model, columns, rows)
+        progress(model.__tablename__, counts[model.__tablename__])
+
+    # ---- Companies
+    first_company = _next_id(Company)
+    company_ids = list(range(first_company, first_company + companies))
+    copy(Company, ("id", "name", "created_by", "created_at"), [
+        (cid, f"Seed Company {cid}", "seed", created_at) for cid in company_ids
+    ])
+
+    # ---- Users: one supervisor per company and shift, the rest agents
+    users = []  # (id, company_id, shift, role, salary)
+    increments = []
+    next_user = _next_id(User)
+    for cid in company_ids:
+        shifts = [name for name, _, _ in SHIFTS]
+        shifts += rng.choices(shifts, weights=[w for _, w, _ in SHIFTS], k=max(0, users_per_company - len(shifts)))
+        for i, shift in enumerate(shifts[:users_per_company]):
+            role = "supervisor" if i < len(SHIFTS) else "agent"
+            salary = round(rng.gauss(85000 if role == "supervisor" else 45000, 6000) / 500) * 500
+            # Up to two raises during the period, applied to the current salary
+            for _ in range(rng.choice((0, 0, 1, 1, 2))):
+                raise_by = round(salary * rng.uniform(0.05, 0.15) / 500) * 500
+                increments.append((next_user, salary, raise_by, salary + raise_by, "Annual review",
+                                   _at(rng.choice(dates), time(12, 0))))
+                salary += raise_by
+            users.append((next_user, cid, shift, role, salary))
+            next_user += 1
+
+    def user_rows():
+        for uid, cid, shift, role, salary in users:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            username = f"{first.lower()}.{last.lower()}{uid}"
+            yield (
+                uid, first, last, username, f"{username}@seed.local", password_hash, shift, role,
+                cid, float(salary), True, created_at,
+            )
+
+    copy(User, (
+        "id", "first_name", "last_name", "username", "email", "password_hash", "shift", "role",
+        "company_id", "salary", "is_active_db", "created_at",
+    ), user_rows())
+    copy(Increment, (
+        "user_id", "previous_salary", "increment_amount", "new_salary", "reason", "date_added",
+    ), sorted(increments, key=lambda row: row[-1]))
+
+    supervisor_of = {(cid, shift): uid for uid, cid, shift, role, _ in users if role == "supervisor"}
+    shift_start = {name: clock for name, _, clock in SHIFTS}
+
+    # ---- Attendance (streamed), collecting the penalties it implies
+    penalties = []
+    statuses, weights = zip(*STATUS_WEIGHTS)
+
+    def attendance_rows():
+        for uid, cid, shift, role, _ in users:
+            marker = supervisor_of[(cid, shift)]
+            start = shift_start[shift]
+            for day in dates:
+                status = "Off" if day.weekday() == 6 and rng.random() < 0.9 else rng.choices(statuses, weights)[0]
+                minutes = rng.randint(16, 90) if status == "Late" else rng.randint(-15, 15)
+                clock = _at(day, start, minutes if status in ("Present", "Late") else 0)
+                bonus = 500.0 if status == "Present" and rng.random() < 0.01 else 0.0
+                if status == "Late" and rng.random() < 0.5:
+                    penalties.append((uid, float(rng.choice((200, 300, 500))), "Late arrival", marker,
+                                      clock + timedelta(hours=1)))
+                elif status == "Absent" and rng.random() < 0.7:
+                    penalties.append((uid, 1000.0, "Unapproved absence", marker, clock + timedelta(hours=1)))
+                yield (uid, day, clock.time(), status, status == "Late", bonus, 0.0, marker)
+
+    copy(Attendance, (
+        "user_id", "date", "time", "status", "is_late", "bonus", "penalty", "marked_by",
+    ), attendance_rows())
+    copy(Penalty, ("user_id", "amount", "reason", "marked_by", "created_at"), penalties)
+
+    # ---- Clearances: roughly one in ten users per month
+    months = sorted({(d.year, d.month) for d in dates})
+    clearances = [
+        (uid, float(rng.randint(1, 10) * 100), "Penalty cleared", supervisor_of[(cid, shift)],
+         _at(rng.choice([d for d in dates if (d.year, d.month) == ym]), time(15, 0)))
+        for ym in months
+        for uid, cid, shift, role, _ in users
+        if rng.random() < 0.1
+    ]
+    copy(Clearance, ("user_id", "amount", "reason", "marked_by", "date_added"), clearances)
+
+    # ---- Broadcasts: ~1 per company per week, ~1 to everyone per month
+    admin_id = db.session.query(User.id).filter(User.role == "admin").order_by(User.id).limit(1).scalar()
+    broadcasts = []  # (created_at, sender_id, company_id, target)
+    for cid in company_ids:
+        for _ in range(max(1, days // 7)):
+            shift = rng.choice([name for name, _, _ in SHIFTS])
+            target = rng.choices(("company", "shift", "supervisors_company"), (0.7, 0.2, 0.1))[0]
+            sender = admin_id if target == "supervisors_company" and admin_id else supervisor_of[(cid, shift)]
+            broadcasts.append((_at(rng.choice(dates), time(rng.randint(8, 20), rng.randint(0, 59))),
+                               sender, cid, target))
+    for _ in range(max(1, days // 30)):
+        sender = admin_id or supervisor_of[(company_ids[0], "morning")]
+        broadcasts.append((_at(rng.choice(dates), time(10, 0)), sender, None, "all"))
+    broadcasts.sort(key=lambda row: row[0])  # ids follow created_at, like live data
+
+    first_broadcast = _next_id(Broadcast)
+    copy(Broadcast, ("id", "sender_id", "company_id", "target", "title", "message", "created_at"), [
+        (first_broadcast + i, sender, cid, target, None, rng.choice(BROADCAST_MESSAGES), sent_at)
+        for i, (sent_at, sender, cid, target) in enumerate(broadcasts)
+    ])
+
+    # ---- Seen rows: most recipients open a broadcast within a day or two
+    by_company = {}
+    for uid, cid, shift, role, _ in users:
+        by_company.setdefault(cid, []).append((uid, role))
+
+    def seen_rows():
+        for i, (sent_at, _, cid, target) in enumerate(broadcasts):
+            if target == "all":
+                recipients = [(uid, role) for uid, _, _, role, _ in users]
+            else:
+                recipients = by_company[cid]
+                if target == "supervisors_company":
+                    recipients = [r for r in recipients if r[1] == "supervisor"]
+            for uid, _ in recipients:
+                if rng.random() < 0.85:
+                    yield (first_broadcast + i, uid, sent_at + timedelta(minutes=rng.randint(1, 2880)))
+
+    copy(BroadcastSeen, ("broadcast_id", "user_id", "seen_at"), seen_rows())
+
+    for model in (Company, User, Broadcast):
+        _sync_sequence(model)
+
+    # Dashboards read the monthly rollup, not the raw rows
+    counts["attendance_monthly_summary"] = rebuild_monthly_summaries()
+    return counts
@@ -0,0 +1,125 @@
+"""
+Write-behind buffer for BroadcastSeen.
+
+Popup dismissals arrive in bursts right after a company-wide broadcast. The
+mark-seen endpoints only queue (user_id, broadcast_id) pairs here; a
+background task writes them every ``SEEN_FLUSH_INTERVAL`` seconds, or as
+soon as ``SEEN_FLUSH_SIZE`` pairs are waiting, with one
+``INSERT ... ON CONFLICT DO NOTHING`` per chunk, then decrements the unread
+counters of the rows that were actually new. Pairs still buffered when a
+process dies are lost; those popups simply show again.
+
+Until a pair is written, ``pending_seen`` hands it to the unread paths of
+this process (``/broadcasts/unread``, the unread counter, the inbox), so a
+reload right after dismissing a popup doesn't show it again.
+
+The flush task needs the eventlet hub (main.py / gunicorn -k eventlet);
+without it ``record_seen`` writes through immediately.
+"""
+import threading
+from datetime import datetime
+
+from flask import current_app
+
+from app import db, socketio
+from app.models import Broadcast, BroadcastSeen, User
+from app.utils.bulk import bulk_insert_ignore
+from app.utils.green_db import running_under_eventlet
+from app.utils.inbox import note_seen
+from app.utils.metrics import register_metrics
+
+_pending = {}  # (user_id, broadcast_id) -> seen_at
+_in_flight = []  # batches taken by flush() and not committed yet
+_lock = threading.Lock()
+_wake = threading.Event()
+_started = False
+
+
+def record_seen(user_id, broadcast_ids):
+    """Queue ``broadcast_ids`` as seen by ``user_id``; returns the seen_at used."""
+    now = datetime.utcnow()
+    with _lock:
+        for b_id in broadcast_ids:
+            _pending.setdefault((user_id, b_id), now)
+        full = len(_pending) >= current_app.config.get("SEEN_FLUSH_SIZE", 500)
+    if not _started:
+        flush()
+    elif full:
+        _wake.set()
+    return now
+
+
+def pending_count():
+    with _lock:
+        return len(_pending)
+
+
+def pending_seen(user_id):
+    """``{broadcast_id: seen_at}`` marked seen by ``user_id`` and not written yet."""
+    with _lock:
+        return {
+            b_id: seen_at
+            for batch in (*_in_flight, _pending)
+            for (uid, b_id), seen_at in batch.items()
+            if uid == user_id
+        }
+
+
+def flush():
+    """Write everything buffered so far; returns the number of new seen rows."""
+    global _pending
+    with _lock:
+        batch, _pending = _pending, {}
+        if not batch:
+            return 0
+        _in_flight.append(batch)
+
+    try:
+        # Drop pairs whose broadcast or user is gone so one stale id can't fail the batch
+        broadcast_ids = {b_id for _, b_id in batch}
+        user_ids = {uid for uid, _ in batch}
+        live_broadcasts = {b_id for (b_id,) in db.session.query(Broadcast.id).filter(Broadcast.id.in_(broadcast_ids))}
+        live_users = {uid for (uid,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+        rows = [
+            {"user_id": uid, "broadcast_id": b_id, "seen_at": seen_at}
+            for (uid, b_id), seen_at in batch.items()
+            if uid in live_users and b_id in live_broadcasts
+        ]
+        inserted = bulk_insert_ignore(BroadcastSeen, rows, ("broadcast_id", "user_id"))
+        note_seen((uid, b_id) for b_id, uid in inserted)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        with _lock:
+            for key, seen_at in batch.items():
+                _pending.setdefault(key, seen_at)
+        raise
+    finally:
+        with _lock:
+            _in_flight.remove(batch)
+    return len(inserted)
+
+
+def _flusher(app):
+    while True:
+        _wake.wait(app.config.get("SEEN_FLUSH_INTERVAL", 1.0))
+        _wake.clear()
+        with app.app_context():
+            try:
+                flush()
+            except Exception:
+                app.logger.exception("Could not write buffered broadcast seen rows")
+            finally:
+                db.session.remove()
+
+
+def start_flusher(app):
+    """Start the flush task once per process (under eventlet only)."""
+    global _started
+    if _started or not running_under_eventlet():
+        return
+    _started = True
+    socketio.start_background_task(_flusher, app)
+
+
+register_metrics("seen_buffer", lambda: {"pending": pending_count()})
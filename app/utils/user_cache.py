@@ -0,0 +1,140 @@
+"""
+Identity cache behind the Flask-Login user loader.
+
+Every request and every Socket.IO event reloads ``current_user``. Loading
+the full ``User`` row pulls ~30 columns (addresses, CNIC, upload paths) that
+almost no request reads, so the loader returns a ``UserPrincipal`` instead:
+the handful of columns routes check on every request, kept in a per-process
+LRU cache for ``USER_CACHE_TTL`` seconds. Anything else asked of
+``current_user`` (profile fields, ``set_password``, relationships) loads the
+full row once for that request.
+
+Routes that change a user call ``invalidate_user``. That only reaches the
+current process; other workers pick the change up when the entry expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from app import db
+from app.models import User
+from app.utils.metrics import register_metrics
+
+_cache = OrderedDict()  # user id -> (expires_at, principal fields)
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+class UserPrincipal:
+    """Slim stand-in for ``User`` as ``current_user``."""
+
+    __slots__ = ("id", "role", "company_id", "shift", "username", "first_name", "last_name", "is_active", "_record")
+    FIELDS = __slots__[:-1]
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, *values):
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, value)
+        self._record = None
+
+    def get_id(self):
+        return str(self.id)
+
+    @property
+    def record(self):
+        """The full ``User`` row, loaded on first use in this request."""
+        if self._record is None:
+            self._record = db.session.get(User, self.id)
+        return self._record
+
+    def __getattr__(self, name):
+        # Only reached for names outside __slots__
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.record, name)
+
+    @property
+    def full_name(self):
+        return f"{self.first_name or ''} {self.last_name or ''}".strip()
+
+    def user_full_name(self):
+        return self.full_name
+
+    def __eq__(self, other):
+        if isinstance(other, (UserPrincipal, User)):
+            return self.id == other.id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<UserPrincipal {self.username} ({self.role})>"
+
+
+def _load_fields(user_id):
+    row = (
+        db.session.query(
+            User.id, User.role, User.company_id, User.shift, User.username,
+            User.first_name, User.last_name, User.is_active_db,
+        )
+        .filter(User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    # Same rule as User.is_active: the "admin" account can't be deactivated
+    is_active = row.username.lower() == "admin" or bool(row.is_active_db)
+    return tuple(row)[:-1] + (is_active,)
+
+
+def load_principal(user_id):
+    """``UserPrincipal`` for ``user_id`` (cached), or None if the user is gone."""
+    user_id = int(user_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(user_id)
+            _stats["hits"] += 1
+            return UserPrincipal(*entry[1])
+        _stats["misses"] += 1
+
+    fields = _load_fields(user_id)
+    if fields is None:
+        invalidate_user(user_id)
+        return None
+
+    ttl = current_app.config.get("USER_CACHE_TTL", 30)
+    size = current_app.config.get("USER_CACHE_SIZE", 2048)
+    with _lock:
+        _cache[user_id] = (now + ttl, fields)
+        _cache.move_to_end(user_id)
+        while len(_cache) > size:
+            _cache.popitem(last=False)
+    return UserPrincipal(*fields)
+
+
+def invalidate_user(user_id):
+    """Drop ``user_id`` from this process' cache after the user was changed."""
+    with _lock:
+        _cache.pop(int(user_id), None)
+
+
+def user_cache_stats():
+    with _lock:
+        hits, misses, size = _stats["hits"], _stats["misses"], len(_cache)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        "size": size,
+    }
+
+
+register_metrics("user_cache", user_cache_stats)
@@ -0,0 +1,90 @@
+"""
+Server-side filtering, sorting and keyset pages for the admin user lists
+(manage users, view users, salary management).
+
+Filters come from the query string: ``q`` (name, username or email),
+``company``, ``shift``, ``role`` and ``active`` (``yes``/``no``). ``sort``
+picks one of ``USER_SORTS``. Pages continue after ``cursor`` (the sort value
+and id of the last row shown), so every page costs one bounded query
+whatever the headcount. Callers add their own ``load_only`` projection.
+"""
+from sqlalchemy import func, or_, tuple_
+
+from app.models import User
+
+USERS_PAGE_SIZE = 50
+
+# name -> (sort expression or None for id only, attribute for the cursor, descending, parse)
+USER_SORTS = {
+    "newest": (None, None, True, None),
+    "oldest": (None, None, False, None),
+    "username": (User.username, "username", False, str),
+    "salary": (func.coalesce(User.salary, 0.0), "salary", True, float),
+}
+SORT_LABELS = {
+    "newest": "Newest first",
+    "oldest": "Oldest first",
+    "username": "Username (A-Z)",
+    "salary": "Salary (high to low)",
+}
+
+
+def filter_users(query, args):
+    """Apply the q/company/shift/role/active filters in ``args`` to a User query."""
+    search = (args.get("q") or "").strip()
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(
+            User.first_name.ilike(pattern), User.last_name.ilike(pattern),
+            User.username.ilike(pattern), User.email.ilike(pattern),
+        ))
+    company_id = args.get("company", type=int)
+    if company_id:
+        query = query.filter(User.company_id == company_id)
+    for column in ("shift", "role"):
+        value = (args.get(column) or "").strip()
+        if value:
+            query = query.filter(func.lower(getattr(User, column)) == value.lower())
+    active = args.get("active")
+    if active in ("yes", "no"):
+        query = query.filter(User.is_active_db.is_(active == "yes"))
+    return query
+
+
+def encode_user_cursor(user, sort):
+    _, attr, _, _ = USER_SORTS[sort]
+    if attr is None:
+        return str(user.id)
+    value = getattr(user, attr)
+    if attr == "salary":
+        value = float(value or 0.0)
+    return f"{value}_{user.id}"
+
+
+def decode_user_cursor(cursor, sort):
+    _, attr, _, parse = USER_SORTS[sort]
+    if attr is None:
+        return (int(cursor),)
+    value, user_id = cursor.rsplit("_", 1)
+    return parse(value), int(user_id)
+
+
+def user_page(query, args, limit=USERS_PAGE_SIZE):
+    """
+    One filtered, sorted page of ``query``. Returns (users, next_cursor, sort);
+    raises ValueError on a malformed cursor.
+    """
+    sort = args.get("sort") if args.get("sort") in USER_SORTS else "newest"
+    expression, _, descending, _ = USER_SORTS[sort]
+    columns = [User.id] if expression is None else [expression, User.id]
+
+    query = filter_users(query, args)
+    cursor = args.get("cursor")
+    if cursor:
+        key, values = tuple_(*columns), tuple_(*decode_user_cursor(cursor, sort))
+        query = query.filter(key < values if descending else key > values)
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    users = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = encode_user_cursor(users[limit - 1], sort) if len(users) > limit else None
+    return users[:limit], next_cursor, sort
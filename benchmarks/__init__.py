@@ -0,0 +1,7 @@
+"""
+Performance benchmarks.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_excel_report --users 1000 --days 31
+"""
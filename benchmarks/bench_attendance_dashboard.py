@@ -0,0 +1,119 @@
+"""
+Scaling of the supervisor attendance dashboard with team size.
+
+Seeds one shift of ``--users`` agents (for each size) with a full 31-day
+month of attendance and a penalty on roughly one day in ten, then requests
+``/supervisor/attendance_dashboard`` for that month as the shift's
+supervisor. Time per attendance row should stay flat as the team grows;
+the script exits with status 1 when the per-row cost at the largest size is
+more than ``--max-ratio`` times the cost at the smallest.
+
+    python -m benchmarks.bench_attendance_dashboard --users 50 100 250 500 1000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# config.Config reads DATABASE_URL at import time, so set it before importing app
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_dashboard.db"))
+
+from app import create_app, db
+from app.models import Attendance, Company, Penalty, User
+
+MONTH = date(2026, 1, 1)
+DAYS = 31
+SUPERVISOR = 1
+
+
+def seed(n_users, seed=22):
+    rnd = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+    db.session.add(Company(id=1, name="Company", created_by="bench"))
+    db.session.bulk_insert_mappings(User, [
+        {
+            "id": i, "username": f"user{i}", "email": f"user{i}@bench.local",
+            "first_name": "User", "last_name": str(i), "password_hash": "x",
+            "role": "supervisor" if i == SUPERVISOR else "agent", "company_id": 1,
+            "shift": "morning", "salary": 40000.0,
+        }
+        for i in range(1, n_users + 2)
+    ])
+    attendance, penalties = [], []
+    for uid in range(2, n_users + 2):
+        for d in range(DAYS):
+            day = MONTH + timedelta(days=d)
+            status = rnd.choice(["Present", "Present", "Present", "Late", "Absent", "Off"])
+            attendance.append({
+                "user_id": uid, "date": day, "time": datetime.min.time().replace(hour=9),
+                "status": status, "is_late": status == "Late", "bonus": 0.0, "penalty": 0.0,
+                "marked_by": SUPERVISOR,
+            })
+            if rnd.random() < 0.1:
+                penalties.append({
+                    "user_id": uid, "amount": 200.0, "reason": "Late", "marked_by": SUPERVISOR,
+                    "created_at": datetime.combine(day, datetime.min.time().replace(hour=10)),
+                })
+    db.session.bulk_insert_mappings(Attendance, attendance)
+    db.session.bulk_insert_mappings(Penalty, penalties)
+    db.session.commit()
+    return len(attendance)
+
+
+def client_for(app, user_id):
+    from flask import g
+
+    g.pop("_login_user", None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    return client
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[50, 100, 250, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ratio", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    url = f"/supervisor/attendance_dashboard?month={MONTH:%Y-%m}&shift=morning"
+    results = {}
+
+    with app.app_context():
+        for n_users in sorted(args.users):
+            rows = seed(n_users)
+            client = client_for(app, SUPERVISOR)
+            assert client.get(url).status_code == 200  # warm-up
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - started)
+                assert response.status_code == 200
+            median_ms = statistics.median(timings) * 1000
+            results[n_users] = {
+                "attendance_rows": rows,
+                "median_ms": round(median_ms, 1),
+                "us_per_row": round(median_ms * 1000 / rows, 1),
+            }
+
+    print(json.dumps(results, indent=2))
+    sizes = sorted(results)
+    ratio = results[sizes[-1]]["us_per_row"] / results[sizes[0]]["us_per_row"]
+    if ratio > args.max_ratio:
+        print(f"Per-row cost grew {ratio:.1f}x from {sizes[0]} to {sizes[-1]} users", file=sys.stderr)
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Broadcast fan-out: one emit per recipient vs one emit per room.
+
+Registers ``--clients`` connected Socket.IO clients (one per seeded user, in
+the rooms ``app.sockets.handle_connect`` joins) on the app's server, with the
+Engine.IO transport replaced by an in-memory sink so only server-side work is
+timed. For each broadcast target it measures the previous per-user loop
+(recipient query + one emit per user) against the room emit, and the full
+``POST /broadcasts/create`` latency.
+
+    python -m benchmarks.bench_broadcast_fanout --clients 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+# config.Config reads DATABASE_URL at import time, so set it before importing app
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_fanout.db"))
+
+from app import create_app, db, socketio
+from app.models import Broadcast, Company, User
+from app.sockets import broadcast_rooms, rooms_for
+
+COMPANIES = 20
+SHIFTS = ["morning", "evening", "night"]
+TARGETS = ["all", "company", "supervisors", "supervisors_company"]
+
+
+def seed(n_users):
+    db.drop_all()
+    db.create_all()
+    db.session.bulk_insert_mappings(Company, [
+        {"id": c, "name": f"Company {c}", "created_by": "bench"} for c in range(1, COMPANIES + 1)
+    ])
+    db.session.bulk_insert_mappings(User, [
+        {
+            "id": i, "username": f"user{i}", "email": f"user{i}@bench.local",
+            "first_name": "User", "last_name": str(i), "password_hash": "x",
+            "role": "admin" if i == 1 else ("supervisor" if i % 25 == 0 else "agent"),
+            "company_id": None if i == 1 else i % COMPANIES + 1,
+            "shift": SHIFTS[i % len(SHIFTS)],
+        }
+        for i in range(1, n_users + 1)
+    ])
+    db.session.commit()
+
+
+def connect_clients():
+    """Register one connected client per user in its rooms; returns the packet sink."""
+    server = socketio.server
+    manager = server.manager
+    sent = []
+    server.eio.send_packet = lambda eio_sid, pkt: sent.append(eio_sid)
+    for user in User.query.all():
+        sid = manager.connect(f"eio_{user.id}", "/")
+        for room in rooms_for(user):
+            manager.enter_room(sid, "/", room)
+    return sent
+
+
+def emit_per_user(target, company_id, payload):
+    """The fan-out as it was: query every recipient id, one emit each."""
+    if target == "all":
+        recipients_query = User.query
+    elif target == "company" and company_id:
+        recipients_query = User.query.filter(User.company_id == int(company_id))
+    elif target == "supervisors":
+        recipients_query = User.query.filter(User.role == "supervisor")
+    elif target == "supervisors_company" and company_id:
+        recipients_query = User.query.filter(User.role == "supervisor", User.company_id == int(company_id))
+    else:
+        recipients_query = User.query
+    recipient_ids = [r.id for r in recipients_query.with_entities(User.id).all()]
+    for uid in recipient_ids:
+        socketio.emit("new_broadcast", payload, room=f"user_{uid}")
+
+
+def emit_to_rooms(target, company_id, payload):
+    socketio.emit("new_broadcast", payload, to=broadcast_rooms(target, company_id))
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    results = {"clients": args.clients, "targets": {}}
+
+    with app.app_context():
+        seed(args.clients)
+        sent = connect_clients()
+        payload = {"id": 0, "title": "Benchmark", "message": "x" * 200, "sender_name": "Admin"}
+        admin = User.query.get(1)
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(admin.id)
+            session["_fresh"] = True
+
+        for target in TARGETS:
+            company_id = "1" if "company" in target else None
+            row = {}
+            for name, fn in (("per_user", emit_per_user), ("rooms", emit_to_rooms)):
+                sent.clear()
+                times = timed(lambda: fn(target, company_id, payload), args.repeat)
+                row[name] = {
+                    "emit_ms": round(statistics.median(times) * 1000, 2),
+                    "packets": len(sent) // args.repeat,
+                }
+
+            def post():
+                client.post("/broadcasts/create", data={
+                    "title": "Benchmark", "message": "x" * 200, "target": target, "company_id": company_id or "",
+                })
+
+            times = timed(post, args.repeat)
+            row["request_ms"] = round(statistics.median(times) * 1000, 2)
+            results["targets"][target] = row
+
+        Broadcast.query.delete()
+        db.session.commit()
+
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Excel attendance report: in-memory workbook vs write-only pipeline.
+
+Both writers receive the same synthetic company-month rows, so the numbers
+only reflect how the xlsx is built: the previous implementation (normal
+Workbook, append, then a second pass over ``ws.columns`` to autofit) against
+``app.utils.exports.write_attendance_report``.
+
+    python -m benchmarks.bench_excel_report --users 1000 --days 31
+"""
+import argparse
+import gc
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+
+from app.utils.exports import SUMMARY_COLUMNS, write_attendance_report
+
+
+def synthetic_report(users, days, seed=65):
+    rnd = random.Random(seed)
+    header = ["Sr No", "Full Name", "Role", "Shift"] + [f"{d:02d}" for d in range(1, days + 1)] + SUMMARY_COLUMNS
+    shifts = ["evening", "morning", "night"]
+    rows = []
+    sr = 1
+    for s, shift in enumerate(shifts):
+        for _ in range(users // len(shifts) + (1 if s < users % len(shifts) else 0)):
+            marks = [rnd.choice(["P", "P", "P", "L", "Off", "A", ""]) for _ in range(days)]
+            counts = [marks.count("P"), marks.count("L"), marks.count("A"), marks.count("Off")]
+            salary = float(rnd.randrange(25000, 90000, 500))
+            rows.append(
+                [sr, f"Agent {sr:05d}", "Agent", shift] + marks + counts + [sum(counts)]
+                + [salary, round(salary * 0.9, 2), 100.0, 50.0, 0.0, round(salary * 0.9 + 50, 2)]
+            )
+            sr += 1
+        rows.append(None)
+    return header, rows
+
+
+def write_in_memory(fileobj, title, header, rows):
+    """The report writer as it was before the write-only pipeline."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+    ws.append(header)
+
+    bold_font = Font(bold=True)
+    center_align = Alignment(horizontal="center", vertical="center")
+    for cell in ws[1]:
+        cell.font = bold_font
+        cell.alignment = center_align
+
+    black_fill = PatternFill(start_color="000000", end_color="000000", fill_type="solid")
+    for row in rows:
+        if row is None:
+            sep_idx = ws.max_row + 1
+            ws.append([""] * len(header))
+            for c in range(1, len(header) + 1):
+                ws.cell(row=sep_idx, column=c).fill = black_fill
+            continue
+        ws.append(row)
+
+    ws.freeze_panes = "E2"
+    for col in ws.columns:
+        max_len = 0
+        col_letter = col[0].column_letter
+        for cell in col:
+            val = str(cell.value) if cell.value else ""
+            if len(val) > max_len:
+                max_len = len(val)
+        ws.column_dimensions[col_letter].width = max_len + 2
+
+    wb.save(fileobj)
+
+
+def measure(writer, header, rows, repeat):
+    # Wall time is taken without tracing; peak memory from one traced run
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        with tempfile.TemporaryFile() as out:
+            started = time.perf_counter()
+            writer(out, "Benchmark", header, iter(rows))
+            times.append(time.perf_counter() - started)
+            size = out.tell()
+
+    gc.collect()
+    with tempfile.TemporaryFile() as out:
+        tracemalloc.start()
+        writer(out, "Benchmark", header, iter(rows))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "wall_time_s": round(min(times), 4),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "file_size_kb": round(size / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    header, rows = synthetic_report(args.users, args.days)
+    results = {
+        "users": args.users,
+        "days": args.days,
+        "in_memory": measure(write_in_memory, header, rows, args.repeat),
+        "write_only": measure(write_attendance_report, header, rows, args.repeat),
+    }
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
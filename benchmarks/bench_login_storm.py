@@ -0,0 +1,141 @@
+"""
+Login storm: p95 login latency and heartbeat jitter under concurrent logins.
+
+Serves the app with eventlet's WSGI server in this process and fires
+``--logins`` concurrent ``POST /auth/login`` requests from green threads.
+Meanwhile a heartbeat green thread ticks every 25 ms (the cadence a
+Socket.IO ping loop relies on) and records how late each tick fires. A
+password hash that runs on the hub delays every tick; one that runs on the
+thread pool does not. The storm is run once with hashing inline and once
+offloaded.
+
+    python -m benchmarks.bench_login_storm --logins 200
+
+Exits with status 1 when the offloaded run's p95 heartbeat jitter exceeds
+``--max-jitter-ms``.
+"""
+import eventlet
+eventlet.monkey_patch()  # must run before the app is imported
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from eventlet import wsgi
+from werkzeug.security import generate_password_hash
+
+# config.Config reads DATABASE_URL at import time, so set it before importing app
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_login.db"))
+
+from app import create_app, db
+from app.models import Company, User
+
+HEARTBEAT_S = 0.025
+PASSWORD = "Storm@1234"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def seed(n_users):
+    db.drop_all()
+    db.create_all()
+    db.session.add(Company(id=1, name="Company", created_by="bench"))
+    password_hash = generate_password_hash(PASSWORD)
+    db.session.bulk_insert_mappings(User, [
+        {
+            "id": i, "username": f"user{i}", "email": f"user{i}@bench.local",
+            "first_name": "User", "last_name": str(i), "password_hash": password_hash,
+            "role": "agent", "company_id": 1, "shift": "morning", "is_active_db": True,
+        }
+        for i in range(1, n_users + 1)
+    ])
+    db.session.commit()
+
+
+def login(port, user_id):
+    body = urlencode({"username": f"user{user_id}", "password": PASSWORD})
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    conn.request("POST", "/auth/login", body, {"Content-Type": "application/x-www-form-urlencoded"})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    elapsed = time.perf_counter() - started
+    ok = response.status == 302 and "/agent/dashboard" in (response.getheader("Location") or "")
+    return elapsed, ok
+
+
+def storm(port, n_logins):
+    lateness = []
+    finished = []
+
+    def heartbeat():
+        expected = time.perf_counter() + HEARTBEAT_S
+        while not finished:
+            eventlet.sleep(max(0.0, expected - time.perf_counter()))
+            now = time.perf_counter()
+            lateness.append(now - expected)
+            expected = now + HEARTBEAT_S
+
+    beat = eventlet.spawn(heartbeat)
+    eventlet.sleep(HEARTBEAT_S * 4)  # settle before the storm
+
+    started = time.perf_counter()
+    pool = eventlet.GreenPool(n_logins)
+    results = list(pool.imap(lambda uid: login(port, uid), range(1, n_logins + 1)))
+    total = time.perf_counter() - started
+    finished.append(True)
+    beat.wait()
+
+    latencies = [elapsed for elapsed, _ in results]
+    return {
+        "logins": n_logins,
+        "failed": sum(1 for _, ok in results if not ok),
+        "total_s": round(total, 2),
+        "login_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "login_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "heartbeat_jitter_p50_ms": round(percentile(lateness, 50) * 1000, 1),
+        "heartbeat_jitter_p95_ms": round(percentile(lateness, 95) * 1000, 1),
+        "heartbeat_jitter_max_ms": round(max(lateness) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--max-jitter-ms", type=float, default=100.0)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    with app.app_context():
+        seed(args.logins)
+
+    listener = eventlet.listen(("127.0.0.1", 0), backlog=args.logins * 2)
+    port = listener.getsockname()[1]
+    eventlet.spawn(wsgi.server, listener, app, log_output=False)
+
+    results = {}
+    for mode, offload in (("inline", False), ("thread_pool", True)):
+        app.config["PASSWORD_HASH_OFFLOAD"] = offload
+        results[mode] = storm(port, args.logins)
+
+    print(json.dumps(results, indent=2))
+    if results["thread_pool"]["failed"] or results["thread_pool"]["heartbeat_jitter_p95_ms"] > args.max_jitter_ms:
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
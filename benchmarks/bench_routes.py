@@ -0,0 +1,225 @@
+"""
+Latency, query count and peak memory of the heavy routes at several data sizes.
+
+For each size (``COMPANIESxUSERSxDAYS``) a scratch database is seeded with
+``app.utils.seed.seed_data`` and every route in ``routes()`` is driven through
+the Flask test client as the role that uses it: one warm-up request,
+``--repeat`` timed requests (statements counted on the engine), then one
+request under ``tracemalloc`` for peak Python memory.
+
+    python -m benchmarks.bench_routes --sizes 3x20x30 5x50x60 10x100x90
+
+Results go to ``--output`` (default ``benchmarks/results/routes-<commit>.json``)
+so runs can be compared between commits. With ``--compare OLD.json`` it exits
+with status 1 when a route's median latency grew by more than
+``--tolerance`` or its query count grew at all.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+# config.Config reads these at import time, so set them before importing app
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_routes.db"))
+os.environ.setdefault("ACCESS_LOG", os.path.join(tempfile.gettempdir(), "bench_routes_access.log"))
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User
+from app.utils.seed import seed_data
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def parse_size(value):
+    try:
+        companies, users, days = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected COMPANIESxUSERSxDAYS, got {value!r}")
+    return value, companies, users, days
+
+
+def seed(companies, users, days):
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(
+        id=1, username="admin", email="admin@bench.local", first_name="System", last_name="Admin",
+        role="admin", password_hash=generate_password_hash("admin123"), is_active_db=True,
+    ))
+    db.session.commit()
+    seed_data(companies=companies, users_per_company=users, days=days, seed=1)
+
+
+def actors():
+    """Admin, a morning supervisor and one of their agents, from the seeded data."""
+    supervisor = User.query.filter_by(role="supervisor", shift="morning").order_by(User.id).first()
+    agent = User.query.filter_by(role="agent", company_id=supervisor.company_id).order_by(User.id).first()
+    team = [
+        uid for (uid,) in db.session.query(User.id).filter(
+            User.company_id == supervisor.company_id,
+            User.role.in_(["agent", "supervisor"]),
+            User.shift == "morning",
+        )
+    ]
+    return {"admin": 1, "supervisor": supervisor.id, "agent": agent.id}, supervisor.company_id, team
+
+
+def routes(company_id, team):
+    month = date.today().strftime("%Y-%m")
+    statuses = ["Present", "Late"]
+
+    def mark_attendance_form(i):
+        # Alternate statuses so every repetition writes every row
+        return {f"status_{uid}": statuses[i % 2] for uid in team}
+
+    # name -> (role, method, url, form builder or None, expected status)
+    return {
+        "admin.attendance": ("admin", "GET", f"/admin/attendance?month={month}", None, 200),
+        "admin.download_attendance_report": (
+            "admin", "GET", f"/admin/download_attendance_report/{company_id}/{month}", None, 200,
+        ),
+        "admin.manage_users": ("admin", "GET", "/admin/manage-users", None, 200),
+        "admin.view_users": ("admin", "GET", "/admin/view-users?sort=username", None, 200),
+        "admin.salary_management": ("admin", "GET", "/admin/salary-management", None, 200),
+        "supervisor.attendance_dashboard": (
+            "supervisor", "GET", f"/supervisor/attendance_dashboard?month={month}", None, 200,
+        ),
+        "supervisor.team_members": ("supervisor", "GET", "/supervisor/team-members", None, 200),
+        "agent.agent_reports": ("agent", "GET", "/agent/reports", None, 200),
+        "broadcasts.view_broadcasts": ("admin", "GET", "/broadcasts/broadcasts", None, 200),
+        "supervisor.mark_attendance[POST]": (
+            "supervisor", "POST", "/supervisor/mark_attendance?shift=morning", mark_attendance_form, 302,
+        ),
+    }
+
+
+def client_for(app, user_id):
+    from flask import g
+
+    g.pop("_login_user", None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    return client
+
+
+def measure(app, user_id, method, url, form, expected, repeat):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def request(i):
+        client = client_for(app, user_id)
+        data = form(i) if form else None
+        response = client.open(url, method=method, data=data)
+        response.get_data()  # drain streamed bodies
+        assert response.status_code == expected, (url, response.status_code)
+        db.session.remove()
+
+    request(0)  # warm-up: template compile, first-request setup
+    timings, queries = [], []
+    for i in range(1, repeat + 1):
+        statements.clear()
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            started = time.perf_counter()
+            request(i)
+            timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+        queries.append(len(statements))
+
+    tracemalloc.start()
+    try:
+        request(repeat + 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(sorted(timings)[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))], 2),
+        "queries": max(queries),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def regressions(old, new, tolerance):
+    found = []
+    for size, routes_new in new["sizes"].items():
+        for name, stats in routes_new.items():
+            before = old.get("sizes", {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            if stats["median_ms"] > before["median_ms"] * (1 + tolerance):
+                found.append(f"{size} {name}: median {before['median_ms']} -> {stats['median_ms']} ms")
+            if stats["queries"] > before["queries"]:
+                found.append(f"{size} {name}: queries {before['queries']} -> {stats['queries']}")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=parse_size, nargs="+",
+                        default=[parse_size(s) for s in ("3x20x30", "5x50x60", "10x100x90")])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed median latency growth")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+
+    with app.app_context():
+        for label, companies, users, days in args.sizes:
+            seed(companies, users, days)
+            ids, company_id, team = actors()
+            row = results["sizes"][label] = {}
+            for name, (role, method, url, form, expected) in routes(company_id, team).items():
+                row[name] = measure(app, ids[role], method, url, form, expected, args.repeat)
+                print(f"{label:>12} {name:<36} {row[name]}", file=sys.stderr)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"routes-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as fh:
+            found = regressions(json.load(fh), results, args.tolerance)
+        for line in found:
+            print(f"Regression: {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
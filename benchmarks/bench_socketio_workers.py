@@ -0,0 +1,180 @@
+"""
+Socket.IO fan-out throughput against the number of server workers.
+
+For each worker count the load test starts that many app processes sharing
+one message queue, connects ``--clients`` Socket.IO clients spread over them,
+and publishes ``--messages`` events from a separate process through the queue
+(as a background job would). Throughput is deliveries per second until the
+last client has received every message.
+
+Without ``--message-queue`` a local stand-in (benchmarks.queue_standin) is
+spawned, so no Redis server is needed:
+
+    python -m benchmarks.bench_socketio_workers --workers 1 2 4 --clients 200 --messages 50
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_PORT = 5600
+STANDIN_PORT = 6390
+EVENT = "bench"
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def _spawn(args, env=None):
+    return subprocess.Popen(
+        [sys.executable, "-m", *args], env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+
+
+# ==========================================================
+# Roles: app server worker / client group
+# ==========================================================
+def serve(port):
+    import eventlet
+    eventlet.monkey_patch()
+    from app import create_app, socketio
+
+    app = create_app()
+    socketio.run(app, host="127.0.0.1", port=port, log_output=False)
+
+
+def clients(ports, count, messages, timeout):
+    import threading
+    import socketio
+
+    received = [0]
+    lock = threading.Lock()
+    finished = threading.Event()
+    expected = count * messages
+    last = [None]
+
+    def on_event(data):
+        with lock:
+            received[0] += 1
+            if received[0] == expected:
+                last[0] = time.time()
+                finished.set()
+
+    sios = []
+    for i in range(count):
+        sio = socketio.Client(reconnection=False)
+        sio.on(EVENT, on_event)
+        sio.connect(f"http://127.0.0.1:{ports[i % len(ports)]}", transports=["websocket"])
+        sios.append(sio)
+
+    print("ready", flush=True)
+    finished.wait(timeout)
+    print(json.dumps({"received": received[0], "expected": expected, "last": last[0]}), flush=True)
+    for sio in sios:
+        sio.disconnect()
+
+
+# ==========================================================
+# Driver
+# ==========================================================
+def run(workers, n_clients, messages, queue_url, channel, client_procs, timeout):
+    from flask_socketio import SocketIO
+
+    env = dict(os.environ, SOCKETIO_MESSAGE_QUEUE=queue_url, SOCKETIO_CHANNEL=channel)
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_socketio.db"))
+    ports = [BASE_PORT + i for i in range(workers)]
+    servers = [_spawn(["benchmarks.bench_socketio_workers", "--serve", str(p)], env) for p in ports]
+    groups = []
+    try:
+        for port in ports:
+            _wait_for_port(port)
+
+        per_group = [n_clients // client_procs + (1 if i < n_clients % client_procs else 0) for i in range(client_procs)]
+        port_args = ",".join(map(str, ports))
+        for count in filter(None, per_group):
+            groups.append(_spawn([
+                "benchmarks.bench_socketio_workers", "--client-group", port_args,
+                "--clients", str(count), "--messages", str(messages), "--timeout", str(timeout),
+            ], env))
+        for group in groups:
+            assert group.stdout.readline().strip() == "ready"
+
+        emitter = SocketIO(message_queue=queue_url, channel=channel)  # write-only, like a job process
+        started = time.time()
+        for i in range(messages):
+            emitter.emit(EVENT, {"n": i})
+
+        results = [json.loads(group.stdout.readline()) for group in groups]
+    finally:
+        for proc in groups + servers:
+            proc.kill()
+            proc.wait()
+
+    received = sum(r["received"] for r in results)
+    complete = all(r["last"] for r in results)
+    elapsed = max(r["last"] for r in results) - started if complete else None
+    return {
+        "workers": workers,
+        "clients": n_clients,
+        "messages": messages,
+        "delivered": received,
+        "expected": n_clients * messages,
+        "elapsed_s": round(elapsed, 3) if elapsed else None,
+        "deliveries_per_s": round(received / elapsed) if elapsed else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--client-procs", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--message-queue", help="e.g. redis://localhost:6379/0 (default: local stand-in)")
+    parser.add_argument("--channel", default="officeconnect-bench")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--client-group", metavar="PORTS", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve(args.serve)
+    if args.client_group:
+        ports = [int(p) for p in args.client_group.split(",")]
+        return clients(ports, args.clients, args.messages, args.timeout)
+
+    standin = None
+    queue_url = args.message_queue
+    if not queue_url:
+        standin = _spawn(["benchmarks.queue_standin", "--port", str(STANDIN_PORT)])
+        _wait_for_port(STANDIN_PORT)
+        queue_url = f"redis://127.0.0.1:{STANDIN_PORT}/0"
+
+    try:
+        results = [
+            run(w, args.clients, args.messages, queue_url, args.channel, args.client_procs, args.timeout)
+            for w in args.workers
+        ]
+    finally:
+        if standin:
+            standin.kill()
+            standin.wait()
+
+    print(json.dumps({"cpus": os.cpu_count(), "message_queue": queue_url, "runs": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Minimal Redis pub/sub stand-in for local Socket.IO message-queue tests.
+
+Speaks just enough of the Redis protocol (HELLO, PING, SELECT, CLIENT,
+SUBSCRIBE, UNSUBSCRIBE, PUBLISH; RESP2 and RESP3) for python-socketio's
+RedisManager, so a multi-worker setup can be exercised without a Redis
+server. Not for production use.
+
+    python -m benchmarks.queue_standin --port 6390
+    SOCKETIO_MESSAGE_QUEUE=redis://127.0.0.1:6390/0 ...
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+
+_channels = defaultdict(set)  # channel -> writers
+_push_kind = {}  # writer -> b"*" (RESP2) or b">" (RESP3 push)
+
+
+def _bulk(value):
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(*items, kind=b"*"):
+    out = kind + b"%d\r\n" % len(items)
+    for item in items:
+        out += b":%d\r\n" % item if isinstance(item, int) else _bulk(item)
+    return out
+
+
+async def _read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+async def _handle(reader, writer):
+    subscribed = set()
+    _push_kind[writer] = b"*"
+
+    def push(*items):
+        return _array(*items, kind=_push_kind[writer])
+
+    try:
+        while True:
+            args = await _read_command(reader)
+            if args is None:
+                break
+            if not args:
+                continue
+            cmd = args[0].upper()
+            if cmd == b"HELLO":
+                proto = int(args[1]) if len(args) > 1 else 2
+                _push_kind[writer] = b">" if proto == 3 else b"*"
+                head = b"%1\r\n" if proto == 3 else b"*2\r\n"
+                writer.write(head + _bulk(b"proto") + b":%d\r\n" % proto)
+            elif cmd == b"PING":
+                writer.write(b"+PONG\r\n" if not subscribed else push(b"pong", b""))
+            elif cmd == b"SUBSCRIBE":
+                for channel in args[1:]:
+                    subscribed.add(channel)
+                    _channels[channel].add(writer)
+                    writer.write(push(b"subscribe", channel, len(subscribed)))
+            elif cmd == b"UNSUBSCRIBE":
+                for channel in args[1:] or list(subscribed):
+                    subscribed.discard(channel)
+                    _channels[channel].discard(writer)
+                    writer.write(push(b"unsubscribe", channel, len(subscribed)))
+            elif cmd == b"PUBLISH":
+                channel, message = args[1], args[2]
+                receivers = list(_channels[channel])
+                for sub in receivers:
+                    sub.write(_array(b"message", channel, message, kind=_push_kind[sub]))
+                writer.write(b":%d\r\n" % len(receivers))
+            else:  # SELECT, CLIENT SETINFO, ...
+                writer.write(b"+OK\r\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        for channel in subscribed:
+            _channels[channel].discard(writer)
+        _push_kind.pop(writer, None)
+        writer.close()
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(_handle, host, port)
+    print(f"queue stand-in listening on {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
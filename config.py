@@ -1,5 +1,7 @@
 import os
 
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'MK65technologies'
 
@@ -16,3 +18,54 @@ class Config:
         SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///attendance.db'
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Background exports: number of worker tasks and where finished files are kept
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_DIR = os.environ.get('EXPORT_DIR')  # defaults to <instance>/exports
+    # A running job whose worker hasn't sent a heartbeat (every
+    # EXPORT_HEARTBEAT_INTERVAL seconds) for EXPORT_STALE_AFTER seconds is
+    # assumed dead and queued again
+    EXPORT_HEARTBEAT_INTERVAL = float(os.environ.get('EXPORT_HEARTBEAT_INTERVAL', 30))
+    EXPORT_STALE_AFTER = float(os.environ.get('EXPORT_STALE_AFTER', 300))
+    # Finished export files and their jobs are deleted after this many hours
+    EXPORT_RETENTION_HOURS = float(os.environ.get('EXPORT_RETENTION_HOURS', 24))
+
+    # Broadcast "seen" rows are buffered and written in batches: every
+    # SEEN_FLUSH_INTERVAL seconds or once SEEN_FLUSH_SIZE are waiting
+    SEEN_FLUSH_INTERVAL = float(os.environ.get('SEEN_FLUSH_INTERVAL', 1.0))
+    SEEN_FLUSH_SIZE = int(os.environ.get('SEEN_FLUSH_SIZE', 500))
+
+    # current_user is served from a per-process cache of slim principals;
+    # other workers see a user change after at most USER_CACHE_TTL seconds
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 2048))
+
+    # Password hashing runs on eventlet's OS thread pool: at most
+    # PASSWORD_HASH_THREADS at once, PASSWORD_HASH_QUEUE more waiting
+    PASSWORD_HASH_OFFLOAD = os.environ.get('PASSWORD_HASH_OFFLOAD', '1') != '0'
+    PASSWORD_HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', 4))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 200))
+
+    # Request profiling: one JSON line per request in ACCESS_LOG and rolling
+    # per-endpoint percentiles over the last PROFILE_WINDOW requests
+    PROFILING = os.environ.get('PROFILING', '1') != '0'
+    PROFILE_WINDOW = int(os.environ.get('PROFILE_WINDOW', 500))
+    ACCESS_LOG = os.environ.get('ACCESS_LOG', os.path.join(BASE_DIR, 'logs', 'access.log'))
+    SYSTEM_LOG = os.environ.get('SYSTEM_LOG', os.path.join(BASE_DIR, 'logs', 'system.log'))
+    # Bearer token that lets a Prometheus scraper read /admin/metrics/prometheus
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # N+1 detection: "raise", "log" or "off". Unset means raise when testing,
+    # log when debugging, off otherwise. A relationship lazy-loaded
+    # N_PLUS_ONE_THRESHOLD times in one request counts as N+1.
+    N_PLUS_ONE = os.environ.get('N_PLUS_ONE')
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 3))
+
+    # Yield to the eventlet hub while psycopg2 waits on the server (no effect
+    # unless eventlet has monkey patched the process)
+    GREEN_DB = os.environ.get('GREEN_DB', '1') != '0'
+
+    # Socket.IO message queue (e.g. redis://localhost:6379/0). Needed as soon as
+    # more than one worker or process emits to clients; see Procfile.
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'officeconnect')
@@ -0,0 +1,32 @@
+"""Unique attendance mark per user and date
+
+Revision ID: 9d3a6c0e71b2
+Revises: 5b8e1f2a9c47
+Create Date: 2026-10-18 10:02:11.547093
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3a6c0e71b2'
+down_revision = '5b8e1f2a9c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep only the latest mark when a user was marked twice on the same day
+    op.execute(
+        "DELETE FROM attendance WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM attendance GROUP BY user_id, date) AS latest"
+        ")"
+    )
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_attendance_user_date', ['user_id', 'date'])
+
+
+def downgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_attendance_user_date', type_='unique')
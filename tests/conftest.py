@@ -0,0 +1,108 @@
+"""
+Shared fixtures: one SQLite database seeded with ``seed_data`` for the whole
+session, the N+1 detector raising, and test clients logged in per role.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+
+# A PostgreSQL DATABASE_URL from the environment is kept for the tests that need one
+_postgres_url = os.environ.get("DATABASE_URL", "")
+_tmp = tempfile.mkdtemp(prefix="officeconnect-tests-")
+# config.Config reads these at import time, so set them before importing app
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "test.db")
+os.environ["ACCESS_LOG"] = os.path.join(_tmp, "access.log")
+os.environ["SYSTEM_LOG"] = os.path.join(_tmp, "system.log")
+os.environ["EXPORT_DIR"] = os.path.join(_tmp, "exports")
+
+import pytest
+from flask import g
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User
+from app.utils.seed import seed_data
+
+ADMIN_ID = 1
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config.update(TESTING=True, N_PLUS_ONE="raise", N_PLUS_ONE_THRESHOLD=3)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(
+            id=ADMIN_ID, username="admin", email="admin@test.local", first_name="System", last_name="Admin",
+            role="admin", password_hash=generate_password_hash("admin123"), is_active_db=True,
+        ))
+        db.session.commit()
+        seed_data(companies=2, users_per_company=15, days=20, seed=1, end_date=date.today())
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture(scope="session")
+def actors(app):
+    """Ids of the admin, a morning supervisor and one of their agents."""
+    supervisor = User.query.filter_by(role="supervisor", shift="morning").order_by(User.id).first()
+    agent = (
+        User.query
+        .filter_by(role="agent", company_id=supervisor.company_id, shift="morning")
+        .order_by(User.id)
+        .first()
+    )
+    return {
+        "admin": ADMIN_ID,
+        "supervisor": supervisor.id,
+        "agent": agent.id,
+        "company": supervisor.company_id,
+    }
+
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    """The DATABASE_URL the suite was started with; skips unless it is PostgreSQL."""
+    if not _postgres_url.startswith("postgresql"):
+        pytest.skip("needs a PostgreSQL DATABASE_URL")
+    return _postgres_url
+
+
+@pytest.fixture
+def client_for(app):
+    """``client_for(user_id)``: a test client logged in as that user (anonymous for None)."""
+
+    def make(user_id):
+        g.pop("_login_user", None)
+        client = app.test_client()
+        if user_id is not None:
+            with client.session_transaction() as session:
+                session["_user_id"] = str(user_id)
+                session["_fresh"] = True
+        return client
+
+    yield make
+    db.session.rollback()
+
+
+@pytest.fixture
+def count_queries(app):
+    """``with count_queries() as statements:`` collects the SQL run inside the block."""
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    return counting
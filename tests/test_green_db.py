@@ -0,0 +1,94 @@
+"""
+The psycopg2 wait callback (``app.utils.green_db``): it parks the green
+thread on the connection socket until psycopg2 reports the query done, so
+a slow query doesn't freeze the eventlet hub.
+"""
+import time
+
+import eventlet
+import pytest
+from psycopg2 import OperationalError, extensions
+from sqlalchemy import create_engine, text
+
+from app.utils.green_db import disable_green_psycopg2, enable_green_psycopg2, eventlet_wait_callback
+
+
+class FakeConn:
+    def __init__(self, states):
+        self.states = list(states)
+        self.polls = 0
+
+    def poll(self):
+        self.polls += 1
+        return self.states.pop(0)
+
+    def fileno(self):
+        return 42
+
+
+@pytest.fixture
+def trampolines(monkeypatch):
+    calls = []
+    monkeypatch.setattr("eventlet.hubs.trampoline", lambda fd, **kwargs: calls.append((fd, kwargs)))
+    return calls
+
+
+def test_wait_callback_waits_on_the_socket_until_poll_ok(trampolines):
+    conn = FakeConn([extensions.POLL_READ, extensions.POLL_WRITE, extensions.POLL_OK])
+    eventlet_wait_callback(conn)
+    assert conn.polls == 3
+    assert trampolines == [(42, {"read": True}), (42, {"write": True})]
+
+
+def test_wait_callback_returns_at_once_when_ready(trampolines):
+    conn = FakeConn([extensions.POLL_OK])
+    eventlet_wait_callback(conn)
+    assert conn.polls == 1
+    assert trampolines == []
+
+
+def test_wait_callback_raises_on_an_unknown_poll_state(trampolines):
+    conn = FakeConn([extensions.POLL_READ, 99])
+    with pytest.raises(OperationalError, match="Bad result from poll: 99"):
+        eventlet_wait_callback(conn)
+    assert trampolines == [(42, {"read": True})]
+
+
+def test_enable_and_disable_install_the_callback():
+    try:
+        assert enable_green_psycopg2()
+        assert extensions.get_wait_callback() is eventlet_wait_callback
+    finally:
+        disable_green_psycopg2()
+    assert extensions.get_wait_callback() is None
+
+
+def test_pg_sleep_does_not_block_the_hub(postgres_url):
+    engine = create_engine(postgres_url)
+    gaps, done = [], []
+
+    def slow_query():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_sleep(1)"))
+        done.append(True)
+
+    def heartbeat():
+        last = time.perf_counter()
+        while not done:
+            eventlet.sleep(0.05)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    enable_green_psycopg2()
+    try:
+        pool = eventlet.GreenPool()
+        pool.spawn(slow_query)
+        pool.spawn(heartbeat)
+        pool.waitall()
+    finally:
+        disable_green_psycopg2()
+        engine.dispose()
+
+    assert len(gaps) >= 10
+    assert max(gaps) < 0.5
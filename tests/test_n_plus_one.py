@@ -0,0 +1,84 @@
+"""
+Every GET page of every blueprint renders with the N+1 detector raising
+(``N_PLUS_ONE = "raise"``): a page that lazy-loads one relationship per row
+fails with the relationship and the line that loaded it.
+"""
+from datetime import date
+
+import pytest
+from flask import g
+
+from app import db
+from app.models import Attendance
+from app.utils.nplusone import NPlusOneError, detect_n_plus_one
+
+MONTH = date.today().strftime("%Y-%m")
+
+# (blueprint, role, url); {agent} and {company} are filled in from the seeded data.
+# Not listed: /supervisor/attendance, whose template doesn't exist.
+PAGES = [
+    ("auth", None, "/auth/login"),
+    ("admin", "admin", "/admin/dashboard"),
+    ("admin", "admin", "/admin/manage-users"),
+    ("admin", "admin", "/admin/view-users"),
+    ("admin", "admin", "/admin/view-user/{agent}"),
+    ("admin", "admin", "/admin/manage-companies"),
+    ("admin", "admin", "/admin/salary-management"),
+    ("admin", "admin", "/admin/increment-history/{agent}"),
+    ("admin", "admin", f"/admin/attendance?month={MONTH}"),
+    ("admin", "admin", f"/admin/attendance/days?company_id={{company}}&month={MONTH}"),
+    ("admin", "admin", f"/admin/attendance/filter?company_id={{company}}&month={MONTH}"),
+    ("admin", "admin", f"/admin/attendance/records?company_id={{company}}&month={MONTH}"),
+    ("admin", "admin", "/admin/get_company_users_json/{company}"),
+    ("admin", "admin", "/admin/metrics"),
+    ("supervisor", "supervisor", "/supervisor/dashboard"),
+    ("supervisor", "supervisor", "/supervisor/team-members"),
+    ("supervisor", "supervisor", "/supervisor/user/{agent}"),
+    ("supervisor", "supervisor", f"/supervisor/attendance_dashboard?month={MONTH}"),
+    ("supervisor", "supervisor", "/supervisor/mark_attendance"),
+    ("supervisor", "supervisor", "/supervisor/reports"),
+    ("supervisor", "supervisor", "/supervisor/salaries"),
+    ("supervisor", "supervisor", "/supervisor/broadcast"),
+    ("supervisor", "supervisor", "/supervisor/supervisor/broadcasts"),
+    ("supervisor", "supervisor", "/supervisor/search_agents?q=a"),
+    ("agent", "agent", "/agent/dashboard"),
+    ("agent", "agent", "/agent/reports"),
+    ("agent", "agent", "/agent/salaries"),
+    ("agent", "agent", "/agent/broadcasts"),
+    ("broadcasts", "admin", "/broadcasts/broadcasts"),
+    ("broadcasts", "agent", "/broadcasts/inbox"),
+    ("broadcasts", "agent", "/broadcasts/unread"),
+    ("broadcasts", "admin", "/broadcasts/1/viewers"),
+]
+
+
+@pytest.mark.parametrize("blueprint, role, url", PAGES, ids=[url for _, _, url in PAGES])
+def test_page_has_no_n_plus_one(client_for, actors, blueprint, role, url):
+    response = client_for(actors[role] if role else None).get(url.format(**actors))
+    assert response.status_code == 200
+
+
+def _lazy_load_users():
+    db.session.expunge_all()
+    records = Attendance.query.filter(Attendance.date == date.today()).order_by(Attendance.user_id).limit(5).all()
+    for record in records:
+        record.user
+
+
+def test_detector_raises_on_row_by_row_loads(app):
+    with app.test_request_context(), detect_n_plus_one("raise"):
+        with pytest.raises(NPlusOneError, match="Attendance.user"):
+            _lazy_load_users()
+
+
+def test_detector_logs_once_per_relationship(app, caplog):
+    with app.test_request_context(), detect_n_plus_one("log"):
+        _lazy_load_users()
+        _lazy_load_users()
+        assert len(g._nplusone.flagged) == 1
+    assert sum("Attendance.user" in r.getMessage() for r in caplog.records) == 1
+
+
+def test_detector_ignores_loads_below_threshold(app):
+    with app.test_request_context(), detect_n_plus_one("raise", threshold=50):
+        _lazy_load_users()
@@ -0,0 +1,50 @@
+"""
+Per-request SQL profiling (``app.utils.profiling``): statement count, SQL
+time and rows written, as the access log and /admin/metrics report them.
+"""
+import time
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import User
+from app.utils.profiling import _start_request
+
+
+@pytest.fixture
+def profile(app):
+    with app.test_request_context():
+        _start_request()
+        yield g._profile
+    db.session.rollback()
+
+
+def test_selects_are_counted_but_write_no_rows(profile):
+    users = User.query.limit(10).all()
+    assert len(users) == 10
+    assert profile["sql_count"] == 1
+    assert profile["rows_written"] == 0
+
+
+def test_rows_written_counts_dml_rows(profile):
+    agents = User.query.filter_by(role="agent").count()
+    updated = User.query.filter_by(role="agent").update({User.salary: User.salary}, synchronize_session=False)
+    assert updated == agents
+    assert profile["sql_count"] == 2
+    assert profile["rows_written"] == agents
+
+
+def test_a_failing_statement_leaves_no_timing_behind(profile):
+    connection = db.session.connection()
+    with pytest.raises(OperationalError):
+        connection.execute(text("SELECT * FROM no_such_table"))
+    assert not connection.info.get("_profile_started")
+    db.session.rollback()
+
+    time.sleep(0.2)
+    before = profile["sql_ms"]
+    db.session.execute(text("SELECT 1"))
+    assert profile["sql_ms"] - before < 100
@@ -0,0 +1,142 @@
+"""
+Query budgets for the pages reworked to run a fixed number of queries
+whatever the number of rows: the user lists, admin attendance, the
+supervisor team and attendance dashboard, and the broadcast views.
+
+Each page is requested once to warm up (login, start-up work), then counted.
+A page going over budget is loading something per row again.
+"""
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Broadcast, BroadcastSeen, User
+
+MONTH = date.today().strftime("%Y-%m")
+
+# (role, url, budget)
+BUDGETS = [
+    ("admin", "/admin/dashboard", 3),
+    ("admin", "/admin/manage-users", 2),
+    ("admin", "/admin/manage-users?sort=salary&shift=morning", 2),
+    ("admin", "/admin/view-users", 2),
+    ("admin", "/admin/view-user/{agent}", 4),
+    ("admin", "/admin/manage-companies", 3),
+    ("admin", "/admin/salary-management", 3),
+    ("admin", "/admin/increment-history/{agent}", 2),
+    ("admin", f"/admin/attendance?month={MONTH}", 2),
+    ("admin", f"/admin/attendance/days?company_id={{company}}&month={MONTH}", 1),
+    ("admin", f"/admin/attendance/filter?company_id={{company}}&month={MONTH}", 1),
+    ("admin", f"/admin/attendance/records?company_id={{company}}&month={MONTH}", 1),
+    ("admin", "/admin/get_company_users_json/{company}", 2),
+    ("supervisor", "/supervisor/dashboard", 1),
+    ("supervisor", "/supervisor/team-members", 1),
+    ("supervisor", "/supervisor/user/{agent}", 4),
+    ("supervisor", f"/supervisor/attendance_dashboard?month={MONTH}", 4),
+    ("supervisor", "/supervisor/mark_attendance", 2),
+    ("supervisor", "/supervisor/reports", 2),
+    ("supervisor", "/supervisor/search_agents?q=a", 1),
+    ("agent", "/agent/dashboard", 2),
+    ("agent", "/agent/reports", 3),
+    ("admin", "/broadcasts/broadcasts", 3),
+    ("supervisor", "/supervisor/supervisor/broadcasts", 1),
+    ("agent", "/agent/broadcasts", 1),
+    ("agent", "/broadcasts/inbox", 2),
+    ("agent", "/broadcasts/unread", 1),
+    ("admin", "/broadcasts/1/viewers", 2),
+]
+
+BROADCAST_PAGES = [
+    ("admin", "/broadcasts/broadcasts"),
+    ("supervisor", "/supervisor/supervisor/broadcasts"),
+    ("agent", "/agent/broadcasts"),
+]
+
+
+@pytest.mark.parametrize("role, url, budget", BUDGETS, ids=[url for _, url, _ in BUDGETS])
+def test_page_query_budget(client_for, actors, count_queries, role, url, budget):
+    client = client_for(actors[role])
+    url = url.format(**actors)
+    assert client.get(url).status_code == 200
+    with count_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(statements) <= budget, "\n".join([f"{url}: {len(statements)} queries"] + statements)
+
+
+def test_mark_attendance_writes_the_team_in_one_batch(client_for, actors, count_queries):
+    supervisor = User.query.get(actors["supervisor"])
+    team = [
+        user_id for (user_id,) in User.query
+        .filter_by(company_id=supervisor.company_id, shift=supervisor.shift)
+        .filter(User.role.in_(["agent", "supervisor"]))
+        .with_entities(User.id)
+    ]
+    client = client_for(supervisor.id)
+    url = f"/supervisor/mark_attendance?shift={supervisor.shift}"
+    assert client.get(url).status_code == 200
+    with count_queries() as statements:
+        response = client.post(url, data={f"status_{user_id}": "Present" for user_id in team})
+    assert response.status_code in (200, 302)
+    writes = [s for s in statements if s.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))]
+    assert len(team) > 3
+    assert len(statements) <= 10, "\n".join(statements)
+    assert len(writes) <= 3, "\n".join(writes)
+
+
+def test_attendance_records_pages_cost_one_query_each(client_for, actors, count_queries):
+    client = client_for(actors["admin"])
+    url = f"/admin/attendance/records?company_id={actors['company']}&month={MONTH}&limit=20"
+    assert client.get(url).status_code == 200
+
+    seen, cursor, pages = set(), None, 0
+    while pages < 4:
+        with count_queries() as statements:
+            response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        assert len(statements) == 1, "\n".join(statements)
+        page = response.get_json()
+        ids = {item["id"] for item in page["items"]}
+        assert ids and not ids & seen
+        seen |= ids
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert pages > 1
+
+@pytest.fixture
+def more_broadcasts(app, actors):
+    """Adds 40 broadcasts to everyone, from several senders and seen by the agent."""
+    senders = [actors["admin"], actors["supervisor"]]
+    broadcasts = [
+        Broadcast(sender_id=senders[i % len(senders)], target="all", message=f"Extra {i}")
+        for i in range(40)
+    ]
+    db.session.add_all(broadcasts)
+    db.session.flush()
+    db.session.add_all([BroadcastSeen(broadcast_id=b.id, user_id=actors["agent"]) for b in broadcasts])
+    db.session.commit()
+    ids = [b.id for b in broadcasts]
+    yield
+    BroadcastSeen.query.filter(BroadcastSeen.broadcast_id.in_(ids)).delete(synchronize_session=False)
+    Broadcast.query.filter(Broadcast.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _broadcast_page_counts(client_for, actors, count_queries):
+    counts = {}
+    for role, url in BROADCAST_PAGES:
+        client = client_for(actors[role])
+        assert client.get(url).status_code == 200
+        with count_queries() as statements:
+            assert client.get(url).status_code == 200
+        counts[url] = len(statements)
+    return counts
+
+
+def test_broadcast_views_do_not_grow_with_history(client_for, actors, count_queries, request):
+    before = _broadcast_page_counts(client_for, actors, count_queries)
+    request.getfixturevalue("more_broadcasts")
+    assert _broadcast_page_counts(client_for, actors, count_queries) == before
@@ -0,0 +1,64 @@
+"""
+EXPLAIN checks for the report queries (``app.utils.query_plans``): each one
+must be answered from an index, never a full scan of a hot table.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Attendance
+from app.utils.query_plans import REPORT_QUERIES, check_query_plans, explain, is_sequential
+
+
+@pytest.mark.parametrize("name", sorted(REPORT_QUERIES))
+def test_report_query_uses_an_index(app, name):
+    steps = explain(REPORT_QUERIES[name]())
+    assert steps
+    assert not [step for step in steps if is_sequential(step)], steps
+
+
+def test_check_query_plans_passes(app):
+    assert check_query_plans() == {}
+
+
+def test_check_query_plans_flags_a_full_scan(app):
+    failures = check_query_plans({"unindexed": lambda: Attendance.query.filter(Attendance.status == "Late")})
+    assert list(failures) == ["unindexed"]
+    assert failures["unindexed"][0][0] == "attendance"
+
+
+def test_index_scans_are_not_sequential(app):
+    covering = db.session.query(Attendance.user_id, Attendance.date).order_by(Attendance.user_id, Attendance.date)
+    steps = explain(covering)
+    assert any("USING COVERING INDEX" in detail for _, detail in steps), steps
+    assert not [step for step in steps if is_sequential(step)]
+    assert not is_sequential(("attendance", "SCAN attendance USING INDEX ix_attendance_date_user"))
+    assert is_sequential(("attendance", "SCAN attendance"))
+    assert is_sequential(("attendance", "Seq Scan"))
+    db.session.rollback()
+
+
+def test_admin_attendance_records_query_uses_an_index(app, client_for, actors):
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM attendance" in statement:
+            executed.append((statement, parameters))
+
+    month = date.today().strftime("%Y-%m")
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client_for(actors["admin"]).get(f"/admin/attendance/records?company_id={actors['company']}&month={month}")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    assert len(executed) == 1
+
+    statement, parameters = executed[0]
+    rows = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    steps = [(detail.split()[1], detail) for *_, detail in rows if detail.startswith(("SCAN ", "SEARCH "))]
+    assert "attendance" in {table for table, _ in steps}, rows
+    assert not [step for step in steps if is_sequential(step)], rows
+    db.session.rollback()
@@ -0,0 +1,68 @@
+"""
+The attendance_monthly_summary rollup: what its penalty total counts, and
+that every penalty write path keeps it current.
+"""
+from datetime import date, datetime, time
+
+import pytest
+
+from app import db
+from app.models import Attendance, AttendanceMonthlySummary, Penalty, User
+from app.utils.rollups import refresh_monthly_summary, team_totals
+
+
+@pytest.fixture
+def member(app, actors):
+    """A fresh agent on the supervisor's team, removed with its rows afterwards."""
+    supervisor = db.session.get(User, actors["supervisor"])
+    user = User(
+        username="rollup-agent", email="rollup-agent@test.local", first_name="Rollup", last_name="Agent",
+        role="agent", password_hash="x", company_id=supervisor.company_id, shift=supervisor.shift,
+        salary=30000.0, is_active_db=True,
+    )
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    db.session.rollback()
+    for model in (Attendance, Penalty, AttendanceMonthlySummary):
+        model.query.filter_by(user_id=user.id).delete()
+    User.query.filter_by(id=user.id).delete()
+    db.session.commit()
+
+
+def _summary(user_id, when):
+    db.session.expire_all()
+    return db.session.get(AttendanceMonthlySummary, (user_id, when.year, when.month))
+
+
+def test_penalties_add_attendance_and_penalty_rows(member, actors):
+    today = date.today()
+    db.session.add_all([
+        Attendance(user_id=member.id, date=today, time=time(9, 0), status="Late", is_late=True,
+                   bonus=20.0, penalty=100.0, marked_by=actors["supervisor"]),
+        Penalty(user_id=member.id, amount=250.0, reason="Test", marked_by=actors["supervisor"],
+                created_at=datetime.combine(today, time(12, 0))),
+    ])
+    refresh_monthly_summary([member.id], today.year, today.month)
+    db.session.commit()
+
+    summary = _summary(member.id, today)
+    assert (summary.lates, summary.bonuses, summary.penalties) == (1, 20.0, 350.0)
+
+    [(_, totals)] = team_totals(User.id == member.id)
+    assert totals["penalties"] == 350.0
+    [(_, totals)] = team_totals(User.id == member.id, start=today, end=today)
+    assert totals["penalties"] == 350.0
+
+
+@pytest.mark.parametrize("role", ["admin", "supervisor"])
+def test_adding_a_penalty_refreshes_the_rollup(member, actors, client_for, role):
+    client = client_for(actors[role])
+    if role == "admin":
+        response = client.post("/admin/penalties/add", data={"user_id": member.id, "amount": "75", "reason": "Test"})
+    else:
+        response = client.post("/supervisor/add_penalty", json={"agent_id": member.id, "amount": "75", "reason": "Test"})
+    assert response.status_code in (200, 302)
+
+    penalty = Penalty.query.filter_by(user_id=member.id).one()
+    assert _summary(member.id, penalty.created_at).penalties == 75.0
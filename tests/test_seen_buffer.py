@@ -0,0 +1,63 @@
+"""
+Buffered seen marks (``app.utils.seen_buffer``): a broadcast marked seen is
+off the user's unread list and counter right away, before the flush task
+writes it, and the flush doesn't count it twice.
+"""
+import pytest
+
+from app import db
+from app.models import Broadcast, BroadcastSeen
+from app.utils import seen_buffer
+
+
+@pytest.fixture
+def buffered(monkeypatch):
+    """Pretend the flush task runs, so record_seen only queues."""
+    monkeypatch.setattr(seen_buffer, "_started", True)
+    yield
+    seen_buffer.flush()
+
+
+@pytest.fixture
+def broadcast(app, actors):
+    broadcast = Broadcast(sender_id=actors["admin"], target="all", message="Read after write")
+    db.session.add(broadcast)
+    db.session.commit()
+    broadcast_id = broadcast.id
+    yield broadcast_id
+    BroadcastSeen.query.filter_by(broadcast_id=broadcast_id).delete()
+    Broadcast.query.filter_by(id=broadcast_id).delete()
+    db.session.commit()
+
+
+def _unread(client):
+    ids = {item["id"] for item in client.get("/broadcasts/unread").get_json()}
+    return ids, client.get("/broadcasts/unread/count").get_json()["unread"]
+
+
+def test_pending_seen_marks_are_read_back_before_the_flush(client_for, actors, broadcast, buffered):
+    client = client_for(actors["agent"])
+    ids, count = _unread(client)
+    assert broadcast in ids
+
+    assert client.post("/broadcasts/mark_seen", json={"broadcast_id": broadcast}).get_json() == {"ok": True}
+    assert seen_buffer.pending_seen(actors["agent"]).keys() == {broadcast}
+    assert BroadcastSeen.query.filter_by(broadcast_id=broadcast).count() == 0
+
+    ids, pending_count = _unread(client)
+    assert broadcast not in ids
+    assert pending_count == count - 1
+    inbox = {item["id"]: item for item in client.get("/broadcasts/inbox").get_json()["items"]}
+    assert inbox[broadcast]["seen_at"] is not None
+
+    assert seen_buffer.flush() == 1
+    assert seen_buffer.pending_seen(actors["agent"]) == {}
+    ids, flushed_count = _unread(client)
+    assert broadcast not in ids
+    assert flushed_count == count - 1
+
+
+def test_other_users_still_see_it_as_unread(client_for, actors, broadcast, buffered):
+    client_for(actors["agent"]).post("/broadcasts/mark_seen", json={"broadcast_id": broadcast})
+    ids, _ = _unread(client_for(actors["supervisor"]))
+    assert broadcast in ids